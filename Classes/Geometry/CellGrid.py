@@ -0,0 +1,349 @@
+from typing import Dict, Iterator, Tuple
+import random
+import numpy as np
+import shapely
+from shapely.geometry import Polygon, box
+
+# Offsets of the 8 neighbours in the order the planner has always visited them
+NEIGHBOR_OFFSETS = [(-1, 0), (1, 0), (0, -1), (0, 1), (1, 1), (-1, -1), (-1, 1), (1, -1)]
+
+
+class Cell:
+    """Dict-like view of a single cell stored in a CellGrid.
+
+    Supports the keys the planner used with plain cell dicts ('polygon', 'assigned',
+    'neighbors', 'id', 'on_perimeter', 'is_corner'), but keeps no state of its own.
+    """
+    __slots__ = ('grid', 'index')
+
+    _FLAGS = ('assigned', 'on_perimeter', 'is_corner')
+
+    def __init__(self, grid: 'CellGrid', index: int):
+        self.grid = grid
+        self.index = index
+
+    def __getitem__(self, key):
+        if key in Cell._FLAGS:
+            return bool(getattr(self.grid, key)[self.index])
+        if key == 'polygon':
+            return self.grid.polygon(self.index)
+        if key == 'id':
+            return self.grid.cell_id(self.index)
+        if key == 'neighbors':
+            cells = self.grid.cells
+            return [cells[k] for k in self.grid.neighbors(self.index)]
+        raise KeyError(key)
+
+    def __setitem__(self, key, value):
+        if key not in Cell._FLAGS:
+            raise KeyError(key)
+        if key == 'assigned':
+            self.grid.set_assigned(self.index, value)
+        elif key == 'is_corner':
+            self.grid.set_corner(self.index, value)
+        else:
+            getattr(self.grid, key)[self.index] = value
+
+    def __repr__(self):
+        return f"Cell(id={self.grid.cell_id(self.index)}, assigned={self['assigned']})"
+
+
+class FreeCellSet:
+    """Sparse set of cell indices with O(1) add, discard, membership test and random sampling.
+
+    Members are packed at the front of ``dense``; ``position`` maps a cell index to its
+    slot there, so removing a member just moves the last member into its slot.
+    """
+    __slots__ = ('dense', 'position', 'size')
+
+    def __init__(self, capacity: int):
+        self.dense = [0] * capacity
+        self.position = [-1] * capacity
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def __contains__(self, index: int) -> bool:
+        return self.position[index] >= 0
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(self.dense[:self.size])
+
+    def add(self, index: int):
+        if self.position[index] >= 0:
+            return
+        self.dense[self.size] = index
+        self.position[index] = self.size
+        self.size += 1
+
+    def discard(self, index: int):
+        slot = self.position[index]
+        if slot < 0:
+            return
+        self.size -= 1
+        last = self.dense[self.size]
+        self.dense[slot] = last
+        self.position[last] = slot
+        self.position[index] = -1
+
+    def fill(self, indices):
+        """Replaces the members with the given distinct indices (a list or an integer array)."""
+        indices = np.asarray(indices, dtype=np.int64)
+        position = np.full(len(self.position), -1, dtype=np.int64)
+        position[indices] = np.arange(len(indices))
+        # The lists are rebuilt in bulk; per-cell updates stay O(1) list operations
+        self.position = position.tolist()
+        self.size = len(indices)
+        self.dense[:self.size] = indices.tolist()
+
+    def sample(self, rng: random.Random) -> int:
+        """Returns a uniformly chosen member; the set must not be empty.
+
+        Args:
+            rng: generator of the planned object; there is no default so that a seeded plan
+                never silently draws from the global random state.
+        """
+        return self.dense[rng.randrange(self.size)]
+
+    def to_array(self) -> np.ndarray:
+        return np.array(self.dense[:self.size], dtype=np.int64)
+
+
+class CellGrid:
+    """Struct-of-arrays storage of the planning grid.
+
+    Cells are kept as integer (i, j) indices plus boolean masks; shapely boxes are
+    only created when a caller asks for the geometry of a cell. Neighbours are stored
+    once per grid in CSR form (offsets + indices) for 8- and 4-connectivity, and the
+    number of free 8-neighbours of every cell is kept up to date in ``free_degree``.
+
+    The free cells are also kept in ``free_sets``, one FreeCellSet per category
+    ('all', 'perimeter', 'interior', 'corner' and any added with add_free_category),
+    so that the planner can sample a free cell of a category without scanning the grid.
+
+    ``assigned`` and ``is_corner`` may be read directly, but must be changed through
+    ``set_assigned`` and ``set_corner`` so that ``free_degree`` and ``free_sets`` stay
+    consistent. After changing ``on_perimeter`` call ``refresh_free_sets``.
+    """
+
+    def __init__(self, x_coords: np.ndarray, y_coords: np.ndarray, cell_size: float, mask: np.ndarray):
+        """
+        Args:
+            x_coords, y_coords: lower-left coordinates of the grid columns and rows.
+            cell_size: the size of each cell.
+            mask: boolean array of shape (len(y_coords), len(x_coords)) with the cells to keep.
+        """
+        self.x_coords = np.asarray(x_coords, dtype=float)
+        self.y_coords = np.asarray(y_coords, dtype=float)
+        self.cell_size = cell_size
+        self.shape = (len(self.x_coords), len(self.y_coords))
+
+        j, i = np.nonzero(mask)  # row by row, as the cells were always enumerated
+        self.ij = np.column_stack((i, j)).astype(np.int32)
+        size = len(self.ij)
+
+        self.index_map = np.full(self.shape, -1, dtype=np.int32)
+        self.index_map[self.ij[:, 0], self.ij[:, 1]] = np.arange(size, dtype=np.int32)
+
+        self.assigned = np.zeros(size, dtype=bool)
+        self.on_perimeter = np.zeros(size, dtype=bool)
+        self.is_corner = np.zeros(size, dtype=bool)
+
+        self.neighbor_offsets, self.neighbor_indices = self._build_adjacency(NEIGHBOR_OFFSETS)
+        self.neighbor_offsets4, self.neighbor_indices4 = self._build_adjacency(NEIGHBOR_OFFSETS[:4])
+        self.degree = np.diff(self.neighbor_offsets).astype(np.int32)
+        self.free_degree = self.degree.copy()
+
+        self._polygons = [None] * size
+        self.cells = [Cell(self, k) for k in range(size)]
+
+        # Категория свободных клеток: маска принадлежности и множество свободных клеток из нее
+        self._categories: Dict[str, np.ndarray] = {}
+        self.free_sets: Dict[str, FreeCellSet] = {}
+        self.refresh_free_sets()
+
+    def __len__(self):
+        return len(self.ij)
+
+    def cell_id(self, index: int) -> Tuple[int, int]:
+        i, j = self.ij[index]
+        return int(i), int(j)
+
+    def index(self, i: int, j: int) -> int:
+        """Returns the index of the cell (i, j) or -1 if the grid has no such cell."""
+        if 0 <= i < self.shape[0] and 0 <= j < self.shape[1]:
+            return int(self.index_map[i, j])
+        return -1
+
+    @property
+    def cell_dict(self) -> Dict[Tuple[int, int], Cell]:
+        return {self.cell_id(k): cell for k, cell in enumerate(self.cells)}
+
+    def bounds(self, indices=None) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """Returns (minx, miny, maxx, maxy) arrays of the given cells (all cells by default)."""
+        ij = self.ij if indices is None else self.ij[indices]
+        x0 = self.x_coords[ij[:, 0]]
+        y0 = self.y_coords[ij[:, 1]]
+        return x0, y0, x0 + self.cell_size, y0 + self.cell_size
+
+    def polygon(self, index: int) -> Polygon:
+        """Returns the box of a single cell, creating it on first use."""
+        polygon = self._polygons[index]
+        if polygon is None:
+            i, j = self.ij[index]
+            x, y = self.x_coords[i], self.y_coords[j]
+            polygon = box(x, y, x + self.cell_size, y + self.cell_size)
+            self._polygons[index] = polygon
+        return polygon
+
+    def polygons(self, indices=None) -> np.ndarray:
+        """Returns an array of cell boxes for vectorized shapely predicates."""
+        return shapely.box(*self.bounds(indices))
+
+    def _build_adjacency(self, offsets) -> Tuple[np.ndarray, np.ndarray]:
+        """Builds the CSR adjacency (row offsets, neighbour indices) for the given offsets."""
+        nx, ny = self.shape
+        padded = np.full((nx + 2, ny + 2), -1, dtype=np.int32)
+        padded[1:-1, 1:-1] = self.index_map
+        table = np.stack([padded[self.ij[:, 0] + 1 + dx, self.ij[:, 1] + 1 + dy] for dx, dy in offsets], axis=1)
+        exists = table >= 0
+        row_offsets = np.zeros(len(self) + 1, dtype=np.int64)
+        np.cumsum(exists.sum(axis=1), out=row_offsets[1:])
+        return row_offsets, table[exists]
+
+    def neighbors(self, index: int) -> np.ndarray:
+        """Returns indices of the existing 8-neighbours of a cell."""
+        return self.neighbor_indices[self.neighbor_offsets[index]:self.neighbor_offsets[index + 1]]
+
+    def neighbors4(self, index: int) -> np.ndarray:
+        """Returns indices of the existing side neighbours of a cell."""
+        return self.neighbor_indices4[self.neighbor_offsets4[index]:self.neighbor_offsets4[index + 1]]
+
+    def free_neighbors(self, index: int) -> np.ndarray:
+        """Returns indices of the unassigned 8-neighbours of a cell."""
+        neighbors = self.neighbors(index)
+        return neighbors[~self.assigned[neighbors]]
+
+    def set_assigned(self, indices, value: bool = True):
+        """Assigns or frees cells, updating the free neighbour counts of their neighbours."""
+        indices = np.unique(np.asarray(indices, dtype=np.int64))
+        changed = indices[self.assigned[indices] != bool(value)]
+        if not len(changed):
+            return
+        self.assigned[changed] = value
+        np.add.at(self.free_degree, self.gather_neighbors(changed), -1 if value else 1)
+        changed = changed.tolist()
+        for name, free_set in self.free_sets.items():
+            if value:
+                for index in changed:
+                    free_set.discard(index)
+            else:
+                members = self._categories[name]
+                for index in changed:
+                    if members[index]:
+                        free_set.add(index)
+
+    def assign_cell(self, index: int):
+        """Fast path of set_assigned for a single free cell, used by region growing."""
+        self.assigned[index] = True
+        # The neighbours of one cell are distinct, so plain fancy indexing is enough
+        self.free_degree[self.neighbor_indices[self.neighbor_offsets[index]:self.neighbor_offsets[index + 1]]] -= 1
+        for free_set in self.free_sets.values():
+            free_set.discard(index)
+
+    def set_corner(self, indices, value: bool = True):
+        """Marks or unmarks cells as corners, keeping the set of free corner cells up to date."""
+        indices = np.atleast_1d(np.asarray(indices, dtype=np.int64))
+        self.is_corner[indices] = value
+        corners = self.free_sets['corner']
+        for index in indices.tolist():
+            if value and not self.assigned[index]:
+                corners.add(index)
+            else:
+                corners.discard(index)
+
+    def add_free_category(self, name: str, mask: np.ndarray):
+        """Adds (or replaces) a category of cells whose free members are tracked in free_sets[name]."""
+        self._categories[name] = np.asarray(mask, dtype=bool).copy()
+        self.free_sets.setdefault(name, FreeCellSet(len(self)))
+        self.free_sets[name].fill(np.flatnonzero(self._categories[name] & ~self.assigned))
+
+    def refresh_free_sets(self):
+        """Rebuilds all free sets from the masks, e.g. after on_perimeter was recomputed."""
+        self._categories['all'] = np.ones(len(self), dtype=bool)
+        self._categories['perimeter'] = self.on_perimeter
+        self._categories['interior'] = ~self.on_perimeter
+        self._categories['corner'] = self.is_corner
+        for name in self._categories:
+            self.free_sets.setdefault(name, FreeCellSet(len(self)))
+        self._fill_free_sets()
+
+    def _fill_free_sets(self):
+        """Refills every free set from its category mask and the assigned mask."""
+        free = ~self.assigned
+        for name, members in self._categories.items():
+            self.free_sets[name].fill(np.flatnonzero(members & free))
+
+    def gather_neighbors(self, indices, connectivity: int = 8) -> np.ndarray:
+        """Concatenates the neighbour lists of the given cells (with repetitions)."""
+        offsets, neighbor_indices = ((self.neighbor_offsets, self.neighbor_indices) if connectivity == 8
+                                     else (self.neighbor_offsets4, self.neighbor_indices4))
+        indices = np.asarray(indices, dtype=np.int64)
+        starts = offsets[indices]
+        counts = offsets[indices + 1] - starts
+        positions = np.repeat(starts - np.cumsum(counts) + counts, counts) + np.arange(counts.sum())
+        return neighbor_indices[positions]
+
+    def label_components(self, mask: np.ndarray) -> np.ndarray:
+        """Labels the side-connected components of the masked cells with vectorized union-find.
+
+        Returns:
+            np.ndarray: for every cell the smallest index of its component, -1 outside the mask.
+        """
+        labels = np.arange(len(self), dtype=np.int64)
+        rows = np.repeat(np.arange(len(self)), np.diff(self.neighbor_offsets4))
+        inside = mask[rows] & mask[self.neighbor_indices4] & (rows < self.neighbor_indices4)
+        u, v = rows[inside], self.neighbor_indices4[inside]
+        while len(u):
+            lu, lv = labels[u], labels[v]
+            if (lu == lv).all():
+                break
+            # Hook the larger root onto the smaller one, then compress the paths
+            np.minimum.at(labels, np.maximum(lu, lv), np.minimum(lu, lv))
+            while True:
+                compressed = labels[labels]
+                if (compressed == labels).all():
+                    break
+                labels = compressed
+        labels[~mask] = -1
+        return labels
+
+    def neighbor_count(self, mask: np.ndarray) -> np.ndarray:
+        """For every cell counts its 8-neighbours for which the mask is True."""
+        nx, ny = self.shape
+        dense = np.zeros((nx + 2, ny + 2), dtype=np.int32)
+        dense[self.ij[:, 0] + 1, self.ij[:, 1] + 1] = mask
+        counts = np.zeros(len(self), dtype=np.int32)
+        for dx, dy in NEIGHBOR_OFFSETS:
+            counts += dense[self.ij[:, 0] + 1 + dx, self.ij[:, 1] + 1 + dy]
+        return counts
+
+    def snapshot(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Copies the mutable state of the grid (assigned, corner and free-degree arrays)."""
+        return self.assigned.copy(), self.is_corner.copy(), self.free_degree.copy()
+
+    def restore(self, state: Tuple[np.ndarray, np.ndarray, np.ndarray]):
+        """Restores the state saved by snapshot in place."""
+        assigned, is_corner, free_degree = state
+        # Slice copies keep the arrays (and the category masks referring to them) in place
+        self.assigned[:] = assigned
+        self.is_corner[:] = is_corner
+        self.free_degree[:] = free_degree
+        self._fill_free_sets()
+
+    def reset(self):
+        """Marks every cell as free."""
+        self.assigned[:] = False
+        self.free_degree[:] = self.degree
+        self._fill_free_sets()
@@ -0,0 +1,170 @@
+from typing import Dict, List, Tuple, Union
+import numpy as np
+from shapely.geometry import Polygon, MultiPolygon, GeometryCollection, Point
+
+# Directions of the lattice edges: right, up, left, down (counter-clockwise order)
+_DIRECTIONS = [(1, 0), (0, 1), (-1, 0), (0, -1)]
+
+
+def cells_outline(cells) -> Union[Polygon, MultiPolygon, GeometryCollection]:
+    """Outline of a list of cell views of one grid, see trace_outline."""
+    if not cells:
+        return GeometryCollection()
+    return trace_outline(cells[0].grid, [cell.index for cell in cells])
+
+
+def trace_outline(grid, indices) -> Union[Polygon, MultiPolygon, GeometryCollection]:
+    """Traces the boundary of a set of grid cells into orthogonal polygons.
+
+    Gives the same geometry as ``union_all(boxes).simplify(0.01)`` over the cell boxes:
+    collinear vertices are dropped, holes are kept, and cells touching only at a corner
+    end up in different parts of a MultiPolygon.
+
+    Args:
+        grid: the CellGrid the cells belong to.
+        indices: grid indices of the cells.
+
+    Returns:
+        Polygon, MultiPolygon, or an empty GeometryCollection for no cells.
+    """
+    indices = np.unique(np.asarray(indices, dtype=np.int64))
+    if not len(indices):
+        return GeometryCollection()
+
+    rings = _trace_rings(grid.ij[indices])
+    loops = [loop for ring in rings for loop in _split_ring(ring)]
+    shells = [loop for loop in loops if _signed_area(loop) > 0]
+    holes = [loop for loop in loops if _signed_area(loop) < 0]
+
+    xs = np.append(grid.x_coords, grid.x_coords[-1] + grid.cell_size)
+    ys = np.append(grid.y_coords, grid.y_coords[-1] + grid.cell_size)
+
+    def to_world(loop):
+        # Shells clockwise and holes counter-clockwise, as shapely's union returns them
+        return [(xs[i], ys[j]) for i, j in reversed(loop)]
+
+    shell_holes = [[] for _ in shells]
+    for hole in holes:
+        shell_holes[_owner(hole, shells)].append(to_world(hole))
+    polygons = [Polygon(to_world(shell), holes) for shell, holes in zip(shells, shell_holes)]
+    if len(polygons) == 1:
+        return polygons[0]
+    return MultiPolygon(polygons)
+
+
+def count_parts(grid, indices) -> int:
+    """Counts the side-connected parts of a set of cells without building any geometry.
+
+    This is the number of polygons trace_outline (or a union of the cell boxes) yields.
+    """
+    indices = np.asarray(indices, dtype=np.int64)
+    member = np.zeros(len(grid), dtype=bool)
+    member[indices] = True
+    seen = np.zeros(len(grid), dtype=bool)
+    parts = 0
+    for start in indices:
+        if seen[start]:
+            continue
+        parts += 1
+        seen[start] = True
+        stack = [start]
+        while stack:
+            neighbors = grid.neighbors4(stack.pop())
+            neighbors = neighbors[member[neighbors] & ~seen[neighbors]]
+            seen[neighbors] = True
+            stack.extend(neighbors.tolist())
+    return parts
+
+
+def _trace_rings(ij: np.ndarray) -> List[List[Tuple[int, int]]]:
+    """Links the boundary edges of the cells into closed rings of lattice vertices.
+
+    Edges are directed with the cells on their left; at a vertex shared by two diagonal
+    cells the left-most turn is taken, so cells touching by a corner are never joined.
+    """
+    i, j = ij[:, 0] - ij[:, 0].min() + 1, ij[:, 1] - ij[:, 1].min() + 1
+    mask = np.zeros((i.max() + 2, j.max() + 2), dtype=bool)
+    mask[i, j] = True
+
+    # (start x, start y, direction) of every boundary edge
+    sides = [
+        (~mask[i, j - 1], i, j, 0),          # bottom, to the right
+        (~mask[i + 1, j], i + 1, j, 1),      # right, upwards
+        (~mask[i, j + 1], i + 1, j + 1, 2),  # top, to the left
+        (~mask[i - 1, j], i, j + 1, 3),      # left, downwards
+    ]
+    offset_i, offset_j = ij[:, 0].min() - 1, ij[:, 1].min() - 1
+    outgoing: Dict[Tuple[int, int], List[int]] = {}
+    for free, x, y, direction in sides:
+        for vx, vy in zip((x[free] + offset_i).tolist(), (y[free] + offset_j).tolist()):
+            outgoing.setdefault((vx, vy), []).append(direction)
+
+    rings = []
+    while outgoing:
+        start = next(iter(outgoing))
+        vertex, direction = start, None
+        ring = []
+        while True:
+            choices = outgoing.get(vertex)
+            if not choices:
+                break
+            if direction is None or len(choices) == 1:
+                chosen = choices[0]
+            else:
+                # Prefer turning left, then straight, then right
+                chosen = min(choices, key=lambda d: (direction - d + 1) % 4)
+            choices.remove(chosen)
+            if not choices:
+                del outgoing[vertex]
+            ring.append(vertex)
+            dx, dy = _DIRECTIONS[chosen]
+            vertex, direction = (vertex[0] + dx, vertex[1] + dy), chosen
+        rings.append(ring)
+    return rings
+
+
+def _split_ring(ring: List[Tuple[int, int]]) -> List[List[Tuple[int, int]]]:
+    """Splits a ring touching itself at a vertex into simple loops without collinear vertices."""
+    loops = []
+    stack = []
+    positions = {}
+    for vertex in ring:
+        if vertex in positions:
+            p = positions[vertex]
+            loops.append(stack[p:])
+            for removed in stack[p + 1:]:
+                del positions[removed]
+            del stack[p + 1:]
+        else:
+            positions[vertex] = len(stack)
+            stack.append(vertex)
+    if stack:
+        loops.append(stack)
+    return [_drop_collinear(loop) for loop in loops if len(loop) >= 4]
+
+
+def _drop_collinear(loop: List[Tuple[int, int]]) -> List[Tuple[int, int]]:
+    n = len(loop)
+    kept = []
+    for k in range(n):
+        (px, py), (x, y), (nx, ny) = loop[k - 1], loop[k], loop[(k + 1) % n]
+        if (x - px) * (ny - y) - (y - py) * (nx - x) != 0:
+            kept.append(loop[k])
+    return kept
+
+
+def _signed_area(loop: List[Tuple[int, int]]) -> float:
+    return sum(x1 * y2 - x2 * y1 for (x1, y1), (x2, y2) in zip(loop, loop[1:] + loop[:1])) / 2
+
+
+def _owner(hole: List[Tuple[int, int]], shells: List[List[Tuple[int, int]]]) -> int:
+    """Index of the shell that surrounds the hole."""
+    if len(shells) == 1:
+        return 0
+    # A point just inside the hole: the middle of its first edge, shifted to the right of it
+    (x1, y1), (x2, y2) = hole[0], hole[1]
+    dx, dy = np.sign(x2 - x1), np.sign(y2 - y1)
+    probe = Point((x1 + x2) / 2 + dy * 0.5, (y1 + y2) / 2 - dx * 0.5)
+    candidates = [k for k, shell in enumerate(shells) if Polygon(shell).contains(probe)]
+    # The innermost surrounding shell is the one with the smallest area
+    return min(candidates, key=lambda k: _signed_area(shells[k]))
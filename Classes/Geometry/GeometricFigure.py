@@ -1,16 +1,21 @@
 import math
 from typing import List, Tuple
 import numpy as np
-from shapely.geometry import Polygon, box, LineString
-from shapely.prepared import prep
-from shapely.vectorized import contains
+import shapely
+from shapely.geometry import Polygon, LineString
+from shapely.strtree import STRtree
+
+from Classes.Geometry.CellGrid import CellGrid
+import Classes.Instrumentation as instrumentation
 
 class GeometricFigure:
     def __init__(self, points: List[Tuple[float, float]]):
         self.points = points  # List of points defining the geometry
         self.polygon = Polygon(self.points)
+        self.grid = None         # CellGrid with the cell arrays after grid creation
         self.cells = None        # Will store the list of cells after grid creation
         self.cell_dict = None    # Optional dictionary for quick cell lookup
+        self._initial_cell_state = None  # Cell state right after grid creation
 
     def area(self) -> float:
         """Calculates the area of the polygon using the Shoelace formula."""
@@ -41,6 +46,7 @@ class GeometricFigure:
     def set_cells(self, cells):
         self.cells = cells
 
+    @instrumentation.timed('grid.build')
     def check_and_create_cell_grid(self, cell_size: float, polygon_to_check: Polygon = None):
         """Creates a grid of cells covering the polygon and stores it in the object.
 
@@ -54,88 +60,46 @@ class GeometricFigure:
             # Create arrays of x and y coordinates
             x_coords = np.arange(minx, maxx, cell_size)
             y_coords = np.arange(miny, maxy, cell_size)
-            x_grid, y_grid = np.meshgrid(x_coords, y_coords)
-
-            # Flatten the grid arrays
-            x_flat = x_grid.ravel()
-            y_flat = y_grid.ravel()
-
-            # Use shapely prepared polygon for faster checks
-            prepared_polygon = prep(self.polygon)
-
-            cells = []
-            cell_dict = {}
-
-            for x, y in zip(x_flat, y_flat):
-                x1, y1 = x, y
-                x2, y2 = x + cell_size, y + cell_size
-                cell_polygon = box(x1, y1, x2, y2)
-
-                # Include cell if it intersects with the polygon
-                if prepared_polygon.intersects(cell_polygon):
-                    if polygon_to_check is not None:
-                        if not polygon_to_check.contains(cell_polygon):
-                            continue
-                    cell = {
-                        'polygon': cell_polygon,
-                        'assigned': False,
-                        'neighbors': [],
-                        'id': (int((x - minx) / cell_size), int((y - miny) / cell_size)),
-                        'on_perimeter': False,
-                        'is_corner': False
-                    }
-                    cells.append(cell)
-                    cell_dict[cell['id']] = cell
-
-            # Store the cells and cell_dict in the object
-            self.cells = cells
-            self.cell_dict = cell_dict
 
-            # Optionally, process cells to find neighbors and perimeter cells
-            self._process_cells()
+            # Include cell if it intersects with the polygon
+            inside = _cell_mask(self.polygon, x_coords, y_coords, cell_size, strict=False)
+            if polygon_to_check is not None:
+                inside &= _cell_mask(polygon_to_check, x_coords, y_coords, cell_size, strict=True)
 
-    def _process_cells(self):
-        """Determines neighbors of cells and marks cells on the perimeter."""
-        # Prepare the polygon for faster operations
-        polygon_prepared = prep(self.polygon)
-        exterior = self.polygon.simplify(tolerance=1, preserve_topology=True).exterior
+            # Store the grid, its cells and cell_dict in the object
+            self.grid = CellGrid(x_coords, y_coords, cell_size, inside)
+            self.cells = self.grid.cells
+            self.cell_dict = self.grid.cell_dict
 
-        for cell in self.cells:
-            i, j = cell['id']
-            cell_polygon = cell['polygon']
-
-            # Check if the cell touches the exterior boundary
-            if cell_polygon.exterior.intersects(exterior):
-                cell['on_perimeter'] = True
-                # Проверяем угловые клетки
-                edges = list(exterior.coords)
-                intersection_count = 0
-
-                for k in range(len(edges) - 1):
-                    # Получаем координаты рёбер
-                    x1, y1 = edges[k]
-                    x2, y2 = edges[k + 1]
+            # Optionally, process cells to find neighbors and perimeter cells
+            self._process_cells()
+            self._initial_cell_state = self.grid.snapshot()
 
-                    # Проверяем пересечение с ребром
-                    if cell_polygon.intersects(LineString([(x1, y1), (x2, y2)])):
-                        intersection_count += 1
+    def snapshot_cell_state(self):
+        """Saves the mutable cell state (assigned and corner flags) of the grid.
 
-                # Если пересекает два или более рёбер, помечаем как угловую
-                cell['is_corner'] = intersection_count >= 2
-            else:
-                cell['is_corner'] = False
+        Returns:
+            An opaque state object for restore_cell_state.
+        """
+        return self.grid.snapshot()
 
+    def restore_cell_state(self, state=None):
+        """Restores the cell state without rebuilding the grid.
 
-            # Find neighbors, including diagonal neighbors
-            neighbors = []
-            for dx, dy in [(-1, 0), (1, 0), (0, -1), (0, 1), (1, 1), (-1, -1), (-1, 1), (1, -1)]:
-                ni, nj = i + dx, j + dy
-                if (ni, nj) in self.cell_dict:
-                    neighbor = self.cell_dict[(ni, nj)]
-                    neighbors.append(neighbor)
-            cell['neighbors'] = neighbors
+        Args:
+            state: a state saved by snapshot_cell_state, by default the state right after grid creation
+        """
+        self.grid.restore(state if state is not None else self._initial_cell_state)
 
+    @instrumentation.timed('grid.process_cells')
+    def _process_cells(self):
+        """Marks cells on the perimeter and in the corners of the polygon.
 
+        Neighbors are not stored per cell, the grid looks them up by index.
+        """
+        exterior = self.polygon.simplify(tolerance=1, preserve_topology=True).exterior
+        self.grid.on_perimeter[:], self.grid.is_corner[:] = _classify_boundary_cells(self.grid, exterior)
+        self.grid.refresh_free_sets()
 
         # corner_cells = [cell for cell in self.cells if cell['is_corner']]
         # corners_to_delete = []
@@ -147,3 +111,107 @@ class GeometricFigure:
         #         corner['is_corner'] = False
 
 
+def _classify_boundary_cells(grid: CellGrid, exterior: LineString) -> Tuple[np.ndarray, np.ndarray]:
+    """Finds perimeter and corner cells of the grid in one pass.
+
+    A cell is on the perimeter if its boundary touches the exterior, and it is a corner
+    if it touches two or more edges of the exterior.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: the on_perimeter and is_corner masks.
+    """
+    on_perimeter = np.zeros(len(grid), dtype=bool)
+    is_corner = np.zeros(len(grid), dtype=bool)
+    if not len(grid):
+        return on_perimeter, is_corner
+
+    # Only cells crossed by the exterior (and their neighbours, against rounding) are tested exactly
+    crossed = _boundary_hit_mask(Polygon(exterior), grid.x_coords, grid.y_coords, grid.cell_size, strict=False)
+    crossed = crossed[grid.ij[:, 1], grid.ij[:, 0]]
+    candidates = np.flatnonzero(crossed | (grid.neighbor_count(crossed) > 0))
+    candidate_polygons = grid.polygons(candidates)
+    touching = shapely.intersects(shapely.boundary(candidate_polygons), exterior)
+    boundary_indices = candidates[touching]
+    on_perimeter[boundary_indices] = True
+
+    # Count the edges crossed by every boundary cell with a single tree query
+    coords = np.asarray(exterior.coords)
+    edges = shapely.linestrings(np.stack((coords[:-1], coords[1:]), axis=1))
+    cell_hits, _ = STRtree(edges).query(candidate_polygons[touching], predicate='intersects')
+    edge_counts = np.bincount(cell_hits, minlength=len(boundary_indices))
+    is_corner[boundary_indices] = edge_counts >= 2
+    return on_perimeter, is_corner
+
+
+def _cell_mask(polygon: Polygon, x_coords: np.ndarray, y_coords: np.ndarray,
+               cell_size: float, strict: bool) -> np.ndarray:
+    """Classifies every grid cell against the polygon without building cell geometries.
+
+    Args:
+        polygon: the polygon to classify against.
+        x_coords, y_coords: lower-left coordinates of the grid columns and rows.
+        cell_size: the size of each cell.
+        strict: if False, returns cells intersecting the polygon (``polygon.intersects(cell)``),
+            if True, returns cells lying inside the polygon (``polygon.contains(cell)``).
+
+    Returns:
+        np.ndarray: boolean mask of shape (len(y_coords), len(x_coords)).
+    """
+    x0, y0 = np.meshgrid(x_coords, y_coords)
+    x1, y1 = x0 + cell_size, y0 + cell_size
+    corners = [shapely.intersects_xy(polygon, x, y) for x, y in ((x0, y0), (x1, y0), (x0, y1), (x1, y1))]
+    boundary_hits = _boundary_hit_mask(polygon, x_coords, y_coords, cell_size, strict)
+    if strict:
+        # The cell lies inside if all corners are inside and the boundary never enters the cell
+        return corners[0] & corners[1] & corners[2] & corners[3] & ~boundary_hits
+    # The cell intersects if a corner is inside or the boundary passes through the cell
+    return corners[0] | corners[1] | corners[2] | corners[3] | boundary_hits
+
+
+def _boundary_hit_mask(polygon: Polygon, x_coords: np.ndarray, y_coords: np.ndarray,
+                       cell_size: float, strict: bool) -> np.ndarray:
+    """Marks grid cells touched by the polygon boundary using Liang-Barsky clipping.
+
+    With ``strict=True`` only segments passing through the open interior of a cell count.
+    """
+    hits = np.zeros((len(y_coords), len(x_coords)), dtype=bool)
+    if not len(x_coords) or not len(y_coords):
+        return hits
+    minx, miny = x_coords[0], y_coords[0]
+    rings = [polygon.exterior, *polygon.interiors]
+    for ring in rings:
+        coords = np.asarray(ring.coords)
+        for (ax, ay), (bx, by) in zip(coords[:-1], coords[1:]):
+            # Only the cells inside the segment's bounding box can be touched
+            i0 = max(int(np.floor((min(ax, bx) - minx) / cell_size)) - 1, 0)
+            i1 = min(int(np.floor((max(ax, bx) - minx) / cell_size)) + 1, len(x_coords) - 1)
+            j0 = max(int(np.floor((min(ay, by) - miny) / cell_size)) - 1, 0)
+            j1 = min(int(np.floor((max(ay, by) - miny) / cell_size)) + 1, len(y_coords) - 1)
+            if i0 > i1 or j0 > j1:
+                continue
+            cx0 = x_coords[i0:i1 + 1][np.newaxis, :]
+            cy0 = y_coords[j0:j1 + 1][:, np.newaxis]
+            cx1, cy1 = cx0 + cell_size, cy0 + cell_size
+            dx, dy = bx - ax, by - ay
+
+            shape = (j1 - j0 + 1, i1 - i0 + 1)
+            t0 = np.zeros(shape)
+            t1 = np.ones(shape)
+            valid = np.ones(shape, dtype=bool)
+            for p, q in ((-dx, ax - cx0), (dx, cx1 - ax), (-dy, ay - cy0), (dy, cy1 - ay)):
+                q = np.broadcast_to(q, shape)
+                if p == 0:
+                    valid &= q >= 0
+                elif p < 0:
+                    t0 = np.maximum(t0, q / p)
+                else:
+                    t1 = np.minimum(t1, q / p)
+            valid &= t0 <= t1
+            if strict:
+                # The clipped part enters the open cell only if its midpoint does
+                t_mid = (t0 + t1) / 2
+                mx, my = ax + t_mid * dx, ay + t_mid * dy
+                valid &= (mx > cx0) & (mx < cx1) & (my > cy0) & (my < cy1)
+            hits[j0:j1 + 1, i0:i1 + 1] |= valid
+    return hits
+
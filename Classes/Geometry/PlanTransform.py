@@ -0,0 +1,36 @@
+from typing import Tuple
+
+
+class PlanTransform:
+    """Moves points into a canonical pose: a rotation by quarter turns and a translation.
+
+    Rotations by multiples of 90 degrees map an axis-aligned cell grid onto an axis-aligned
+    grid, so plans built on cells stay valid in both poses.
+    """
+
+    def __init__(self, quarter_turns: int, offset: Tuple[float, float]):
+        """
+        Args:
+            quarter_turns: number of counterclockwise quarter turns about the origin.
+            offset: translation subtracted after the rotation.
+        """
+        self.quarter_turns = quarter_turns
+        self.offset = offset
+
+    def forward(self, point: Tuple[float, float]) -> Tuple[float, float]:
+        """Maps a point into the canonical pose."""
+        x, y = rotate_quarter_turns(point, self.quarter_turns)
+        return x - self.offset[0], y - self.offset[1]
+
+    def inverse(self, point: Tuple[float, float]) -> Tuple[float, float]:
+        """Maps a point from the canonical pose back."""
+        x, y = point
+        return rotate_quarter_turns((x + self.offset[0], y + self.offset[1]), -self.quarter_turns)
+
+
+def rotate_quarter_turns(point: Tuple[float, float], quarter_turns: int) -> Tuple[float, float]:
+    """Rotates a point counterclockwise about the origin by the given number of quarter turns."""
+    x, y = point
+    for _ in range(quarter_turns % 4):
+        x, y = -y, x
+    return x, y
@@ -0,0 +1,66 @@
+from collections import deque
+from typing import Callable, List, Optional, Union
+import numpy as np
+
+from Classes.Geometry.ShapeTracker import ShapeTracker
+
+
+def fewest_free_neighbors(grid, neighbors: np.ndarray) -> np.ndarray:
+    """Priority policy: enqueue the neighbours with the fewest free neighbours first."""
+    return neighbors[np.argsort(grid.free_degree[neighbors], kind='stable')]
+
+
+def most_free_neighbors(grid, neighbors: np.ndarray) -> np.ndarray:
+    """Priority policy: enqueue the neighbours with the most free neighbours first."""
+    return neighbors[np.argsort(-grid.free_degree[neighbors], kind='stable')]
+
+
+def grow_region(grid,
+                start: Union[int, Callable[[], Optional[int]], None],
+                max_cells: int,
+                min_cells: Optional[int] = None,
+                priority: Callable[[object, np.ndarray], np.ndarray] = fewest_free_neighbors,
+                stop_when_rectangular: bool = False) -> List[int]:
+    """Grows a contiguous region of free cells from a start cell, assigning the cells it takes.
+
+    This is the breadth-first growth shared by apartment and room allocation: cells are
+    taken from a FIFO frontier, and the free 8-neighbours of every taken cell are appended
+    in the order given by the priority policy, which ranks them by the cached
+    ``grid.free_degree``.
+
+    Args:
+        grid: the CellGrid to grow in.
+        start: index of the start cell, or a start policy returning one (None for no start).
+        max_cells: the region never grows beyond this number of cells.
+        min_cells: together with stop_when_rectangular, the smallest acceptable region.
+        priority: orders the free neighbours of a taken cell before they are enqueued.
+        stop_when_rectangular: stop as soon as the region is an exact rectangle of at least
+            min_cells cells.
+
+    Returns:
+        List[int]: indices of the taken cells in the order they were taken.
+    """
+    if callable(start):
+        start = start()
+    if start is None:
+        return []
+    min_cells = max_cells if min_cells is None else min_cells
+
+    region = []
+    shape = ShapeTracker(grid) if stop_when_rectangular else None
+    assigned = grid.assigned
+    frontier = deque([int(start)])
+    while frontier and len(region) < max_cells:
+        current = frontier.popleft()
+        if assigned[current]:
+            continue
+        region.append(current)
+        grid.assign_cell(current)
+        neighbors = grid.free_neighbors(current)
+        if len(neighbors):
+            frontier.extend(priority(grid, neighbors).tolist())
+        if shape is not None:
+            shape.add(current)
+            if min_cells <= len(region) <= max_cells and shape.rectangularity() == 0:
+                break
+    return region
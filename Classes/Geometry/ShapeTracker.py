@@ -0,0 +1,78 @@
+from typing import Iterable, Tuple
+from shapely.geometry import Polygon, box
+
+
+class ShapeTracker:
+    """Tracks the shape of a growing set of grid cells in O(1) per added cell.
+
+    Keeps the integer bounding box and the cell count, which is all that is needed for
+    rectangularity and aspect-ratio checks of a union of equal square cells.
+    """
+
+    def __init__(self, grid):
+        self.grid = grid
+        self.count = 0
+        self.min_i = self.min_j = None
+        self.max_i = self.max_j = None
+
+    @classmethod
+    def from_cells(cls, cells) -> 'ShapeTracker':
+        """Builds a tracker for a list of cell views of one grid."""
+        cells = list(cells)
+        tracker = cls(cells[0].grid if cells else None)
+        tracker.extend(cell.index for cell in cells)
+        return tracker
+
+    def add(self, index: int):
+        """Adds a cell (by its grid index) to the shape."""
+        i, j = self.grid.ij[index]
+        if self.count == 0:
+            self.min_i = self.max_i = i
+            self.min_j = self.max_j = j
+        else:
+            if i < self.min_i:
+                self.min_i = i
+            elif i > self.max_i:
+                self.max_i = i
+            if j < self.min_j:
+                self.min_j = j
+            elif j > self.max_j:
+                self.max_j = j
+        self.count += 1
+
+    def extend(self, indices: Iterable[int]):
+        for index in indices:
+            self.add(index)
+
+    @property
+    def width(self) -> int:
+        """Width of the bounding box in cells."""
+        return int(self.max_i - self.min_i + 1) if self.count else 0
+
+    @property
+    def height(self) -> int:
+        """Height of the bounding box in cells."""
+        return int(self.max_j - self.min_j + 1) if self.count else 0
+
+    def rectangularity(self) -> float:
+        """Same value as Section._rectangularity_score of the cell union (0 for a rectangle)."""
+        if not self.count:
+            return float('inf')
+        return abs(self.width * self.height - self.count) / self.count
+
+    def aspect_ratio(self) -> float:
+        """Ratio of the longer side of the bounding box to the shorter one."""
+        shorter, longer = sorted((self.width, self.height))
+        cell_size = self.grid.cell_size
+        return longer * cell_size / (shorter * cell_size + 1e-9)
+
+    def bounds(self) -> Tuple[float, float, float, float]:
+        """Bounding box of the shape in world coordinates."""
+        cell_size = self.grid.cell_size
+        minx = self.grid.x_coords[self.min_i]
+        miny = self.grid.y_coords[self.min_j]
+        return minx, miny, self.grid.x_coords[self.max_i] + cell_size, self.grid.y_coords[self.max_j] + cell_size
+
+    def envelope(self) -> Polygon:
+        """The bounding box as a polygon, built only on request."""
+        return box(*self.bounds())
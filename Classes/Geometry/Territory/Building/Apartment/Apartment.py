@@ -1,15 +1,21 @@
 
 
 from Classes.Geometry.GeometricFigure import GeometricFigure
+from Classes.Geometry.ShapeTracker import ShapeTracker
+from Classes.Geometry.CellOutline import cells_outline
+from Classes.Geometry.RegionGrowing import grow_region, fewest_free_neighbors, most_free_neighbors
 from Classes.Geometry.Territory.Building.Apartment.Room import Room
+from Classes.Geometry.Territory.Building.Apartment.RoomLayoutMemo import RoomLayoutMemo
 from Classes.Geometry.Territory.Building.Apartment.Window import Window
+import Classes.Instrumentation as instrumentation
 from typing import List, Tuple
 import random
-import time
 from shapely.geometry import Polygon, MultiPolygon, LineString, MultiLineString, Point
-from shapely.ops import unary_union
-import math
-from shapely import union_all
+import numpy as np
+import shapely
+import logging
+
+logger = logging.getLogger(__name__)
 
 
 # Класс для квартиры, содержащей комнаты, мокрые зоны и балконы
@@ -18,8 +24,11 @@ class Apartment(GeometricFigure):
                  apt_type: str,
                  building_polygon: Polygon,
                  rooms: List['Room'] = None,
-                 cell_size: float = 1.0):
+                 cell_size: float = 1.0,
+                 rng: random.Random = None,
+                 room_layouts: RoomLayoutMemo = None):
         super().__init__(points)
+        self.rng = rng if rng is not None else random.Random(random.getrandbits(64))  # Генератор случайных чисел планировки
         self.type = apt_type  # Тип квартиры
         self.area = self.polygon.area  # Площадь квартиры, вычисленная из геометрии
         self.rooms = rooms if rooms is not None else []  # Список комнат в квартире
@@ -31,9 +40,11 @@ class Apartment(GeometricFigure):
         self.section_polygon = None
         self.building_polygon = building_polygon
         self.messages = []
+        self.room_layouts = room_layouts  # Память планировок комнат по форме квартиры (None - без нее)
 
+    @instrumentation.timed('apartment.plan_rooms')
     def generate_apartment_planning(self):
-        print(self.free_sides)
+        logger.debug("Свободные стороны квартиры: %s", self.free_sides)
         self.points = list(Polygon(self.points).simplify(tolerance=0.01,preserve_topology=True).exterior.coords)
         max_iterations = 60
         best_plan = None
@@ -42,6 +53,16 @@ class Apartment(GeometricFigure):
         simple_plan = False
         very_simple_plan = False
         hall_validation = True
+        self.cells = None
+        self.check_and_create_cell_grid(cell_size=1, polygon_to_check=Polygon(self.points))
+        # Квартира той же формы уже планировалась: берем ее комнаты, если они подходят и этой квартире
+        if self.room_layouts is not None:
+            layout_key, layout_transform = self.room_layouts.key(self)
+            rooms = self.room_layouts.get(layout_key, layout_transform, self)
+            if rooms:
+                instrumentation.count('apartment.layout_memo_hits')
+                self.rooms = rooms
+                return
         for i in range(max_iterations):
             if i % 9 == 0 and best_plan:
                 break
@@ -53,22 +74,20 @@ class Apartment(GeometricFigure):
                 very_simple_plan = True
             rooms = []
             room_number = 0
-            self.cells = None
-            self.check_and_create_cell_grid(cell_size=1, polygon_to_check=Polygon(self.points))
+            self.restore_cell_state()
             room_table = self.get_room_types_by_apartment_type(self.type)
-            self.starting_corner_cells = [cell for cell in self.cells if cell['is_corner']]
-            remaining_cells = [cell for cell in self.cells if not cell['assigned']]  # Все доступные ячейки
+            self.starting_corner_cells = [self.cells[k] for k in np.flatnonzero(self.grid.is_corner)]
             # Распределение комнат, учитывая последнее условие
             for index, (room_type, count) in enumerate(room_table):
                 for _ in range(count):
                     stop = False
                     if index == len(room_table) - 1 and _ == count - 1:
-                        room_cells = [cell for cell in self.cells if not cell['assigned']]
+                        room_cells = [self.cells[k] for k in np.flatnonzero(~self.grid.assigned)]
                     else:
                         if self.type == 'studio':
                             min_cells = 6
                             max_cells = 10
-                            room_cells = self._allocate_room_cells(remaining_cells, min_cells, max_cells, room_type)
+                            room_cells = self._allocate_room_cells(min_cells, max_cells, room_type)
 
                         else:
                             min_cells, max_cells = self._get_rooms_cell_range(room_table=room_table, room_number=room_number,
@@ -76,7 +95,7 @@ class Apartment(GeometricFigure):
                                                                               room_type=room_type, rooms=rooms)
 
                             # Выделяем ячейки для комнаты
-                            room_cells = self._allocate_room_cells(remaining_cells, min_cells, max_cells, room_type)
+                            room_cells = self._allocate_room_cells(min_cells, max_cells, room_type)
                     if not min_cells <= len(room_cells) <= max_cells and room_type in ['living room', 'bedroom'] and not very_simple_plan:
                         continue
                     if len(room_cells) <= 4 and room_type != 'hall' and not simple_plan:
@@ -85,7 +104,7 @@ class Apartment(GeometricFigure):
                         failure = True
                         break
                     if room_type == 'hall' and hall_validation and self.free_sides:
-                        room_polygon = union_all([cell['polygon'] for cell in room_cells])
+                        room_polygon = cells_outline(room_cells)
                         if isinstance(room_polygon, MultiPolygon):
                             failure = True
                             break
@@ -105,7 +124,7 @@ class Apartment(GeometricFigure):
                         rooms.append(room)
                         continue
                     if room_type == 'hall' and not hall_validation and self.free_sides and not very_simple_plan:
-                        room_polygon = union_all([cell['polygon'] for cell in room_cells])
+                        room_polygon = cells_outline(room_cells)
                         if not isinstance(room_polygon, Polygon):
                             failure = True
                             break
@@ -126,14 +145,14 @@ class Apartment(GeometricFigure):
                         failure = True
                         break
 
-                    room_polygon = union_all([cell['polygon'] for cell in room_cells])
+                    room_polygon = cells_outline(room_cells)
                     rectangular_room_polygon = room_polygon.envelope
                     if rectangular_room_polygon.area <= max_cells:
-                        for cell in self.cells:
-                            if not cell['assigned'] and rectangular_room_polygon.contains(cell['polygon']):
-                                room_cells.append(cell)
-                                cell['assigned'] = True
-                        rectangular_room_polygon = union_all([cell['polygon'] for cell in room_cells])
+                        free_indices = np.flatnonzero(~self.grid.assigned)
+                        inside = shapely.contains(rectangular_room_polygon, self.grid.polygons(free_indices))
+                        room_cells.extend(self.cells[k] for k in free_indices[inside])
+                        self.grid.set_assigned(free_indices[inside])
+                        rectangular_room_polygon = cells_outline(room_cells)
                         if isinstance(rectangular_room_polygon, Polygon):
                             points = list(rectangular_room_polygon.exterior.coords)
                         elif isinstance(rectangular_room_polygon, MultiPolygon):
@@ -142,12 +161,12 @@ class Apartment(GeometricFigure):
                             continue
                     else:
                         for i in range(3):
-                            new_room_polygon = union_all([cell['polygon'] for cell in room_cells[:(-1-i)]])
+                            new_room_polygon = cells_outline(room_cells[:(-1-i)])
                             if new_room_polygon.area == room_polygon.envelope.area:
                                 room_polygon = new_room_polygon.copy()
                                 for cell in room_cells[(-1-i):]:
                                     cell['assigned'] = False
-                                room_cells = room_cells[(-1-i):]
+                                room_cells = room_cells[:(-1-i)]
                                 break
                         if isinstance(room_polygon, Polygon):
                             points = list(room_polygon.exterior.coords)
@@ -165,6 +184,7 @@ class Apartment(GeometricFigure):
                 if failure:
                     break
             if failure:
+                instrumentation.count('apartment.rejected.room_shape')
                 continue
             total_error = self._calc_total_error(rooms[:-1])
             if total_error < best_score and sum(room.area for room in rooms) == self.area:
@@ -173,11 +193,15 @@ class Apartment(GeometricFigure):
 
         self.rooms = best_plan if best_plan is not None else []  # Save the best generated plan
         if self.rooms:
+            if self.room_layouts is not None:
+                self.room_layouts.put(layout_key, layout_transform, self)
             return
         if not self.rooms:
+            instrumentation.count('apartment.rejected.no_plan')
             self.messages.append('Не нашел планировку на уровне квартир. Пожалуйста, увеличьте площади квартир')
 
 
+    @instrumentation.timed('apartment.windows')
     def _generate_windows(self):
         """Генерирует окна для комнат на внешних сторонах здания."""
         buffer_tolerance = 0.01  # Буфер для корректировки угловых пересечений
@@ -240,13 +264,15 @@ class Apartment(GeometricFigure):
                     break  # Переходим к следующей комнате
 
     def _calc_total_error(self, rooms):
-        def rectangularity_score(poly):
-            extended_area = poly.envelope.area
-            area = poly.area
-            return abs(extended_area - area) / area
+        def rectangularity_score(room):
+            if room.cells:
+                return ShapeTracker.from_cells(room.cells).rectangularity()
+            minx, miny, maxx, maxy = room.polygon.bounds
+            area = room.polygon.area
+            return abs((maxx - minx) * (maxy - miny) - area) / area
         score = 0
         for room in rooms:
-            score += rectangularity_score(room.polygon)
+            score += rectangularity_score(room)
         return score
 
 
@@ -271,54 +297,34 @@ class Apartment(GeometricFigure):
 
         return room_table
 
-    def _allocate_room_cells(self, remaining_cells, min_cells, max_cells, room_type):
+    def _allocate_room_cells(self, min_cells, max_cells, room_type):
         """Выделяет ячейки для одной комнаты, гарантируя, что все ячейки будут заполнены."""
-        room_cells = []
-        visited_cells = set()
-        room_cell_count = random.randint(min_cells, max_cells)
-        if len([c for c in self.cells if c['assigned']]) > 0:
+        room_cell_count = self.rng.randint(min_cells, max_cells)
+        if self.grid.assigned.any():
             start_cell = self._get_next_start_cell(room_type)
             if not start_cell:
                 # Если стартовая ячейка не найдена, выходим из текущей итерации
                 return []
         elif self.type != 'studio':
-            return_cells = []
-            return_cells.extend([cell for cell in self.starting_corner_cells if cell['polygon'].intersects(self.building_polygon.exterior)])
+            corner_polygons = [cell['polygon'] for cell in self.starting_corner_cells]
+            touches_building = shapely.intersects(corner_polygons, self.building_polygon.exterior)
+            return_cells = [cell for cell, touches in zip(self.starting_corner_cells, touches_building) if touches]
             if len(return_cells) > 0:
-                start_cell = random.choice(return_cells)
+                start_cell = self.rng.choice(return_cells)
             else:
-                start_cell = random.choice(self.starting_corner_cells)
+                start_cell = self.rng.choice(self.starting_corner_cells)
         else:
-            start_cell = random.choice(self.starting_corner_cells)
+            start_cell = self.rng.choice(self.starting_corner_cells)
         # if self.starting_corner_cells and len(self.starting_corner_cells) >= 1:
         #     start_cell = self.starting_corner_cells.pop()
         # else:
         #     start_cell = random.choice(remaining_cells)
-        queue = [start_cell]
+        # Случайно выбираем, растет ли комната в сторону клеток с большим или меньшим числом свободных соседей
         bool_variants = [True, False]
-        growing_method = random.choice(bool_variants)
-        while queue and len(room_cells) < room_cell_count:
-            current_cell = queue.pop(0)
-            if current_cell['assigned']:
-                continue
-            visited_cells.add(current_cell['id'])
-            room_cells.append(current_cell)
-
-            current_cell['assigned'] = True
-
-            # Получаем не назначенные соседние клетки
-            neighbors = [neighbor for neighbor in current_cell['neighbors'] if not neighbor['assigned']]
-
-            # Сортируем соседей по убыванию количества их свободных соседей
-            neighbors_sorted = sorted(
-                neighbors,
-                key=lambda cell: len([n for n in cell['neighbors'] if not n['assigned']]),
-                reverse=growing_method
-            )
-
-            # Добавляем отсортированных соседей в очередь
-            queue.extend(neighbors_sorted)
-        return room_cells
+        growing_method = self.rng.choice(bool_variants)
+        priority = most_free_neighbors if growing_method else fewest_free_neighbors
+        region = grow_region(self.grid, start_cell.index, max_cells=room_cell_count, priority=priority)
+        return [self.cells[k] for k in region]
 
 
 
@@ -341,75 +347,36 @@ class Apartment(GeometricFigure):
                 return min_cells, max_cells
 
     def _get_next_start_cell(self, room_type):
-        corner_cells = []
-        for cell in [cell for cell in self.cells if cell['assigned'] and cell['on_perimeter']]:
-            perimeter_neighbors_for_new_corner = [neighbor for neighbor in cell['neighbors'] if
-                                                  neighbor['assigned'] == False and neighbor['on_perimeter']]
-            if len(perimeter_neighbors_for_new_corner) > 0:
-                for cell_for_new_corner in perimeter_neighbors_for_new_corner:
-                    cell_for_new_corner['is_corner'] = True  # Reset is_corner before checking
-                    corner_cells.append(cell_for_new_corner)
-
-        if room_type in ['living room', 'bedroom']:
-            return_cells = []
-            return_cells.extend([cell for cell in corner_cells if cell['polygon'].overlaps(self.building_polygon.exterior)])
-            return_cells.extend([cell for cell in corner_cells if cell['polygon'].intersects(self.building_polygon.exterior)])
-
-            if return_cells:
-                return random.choice(return_cells)
-            elif corner_cells:
-                return random.choice(corner_cells)
-
-        elif room_type == 'kitchen':
-            return_cells = []
-            return_cells.extend(
-                [cell for cell in corner_cells if cell['polygon'].overlaps(self.building_polygon.exterior)])
-            return_cells.extend(
-                [cell for cell in corner_cells if cell['polygon'].intersects(self.building_polygon.exterior)])
-            if return_cells:
-                return random.choice(return_cells)
-            elif corner_cells:
-                return random.choice(corner_cells)
-
-        elif room_type == 'bathroom':
-            return_cells = []
-            return_cells.extend(
-                [cell for cell in corner_cells if cell['polygon'].overlaps(self.building_polygon.exterior)])
-            return_cells.extend(
-                [cell for cell in corner_cells if cell['polygon'].intersects(self.building_polygon.exterior)])
-            if return_cells:
-                return random.choice(return_cells)
-            elif corner_cells:
-                return random.choice(corner_cells)
+        grid = self.grid
+        # Свободные клетки периметра рядом с занятыми клетками периметра становятся новыми углами
+        free_perimeter = grid.on_perimeter & ~grid.assigned
+        assigned_perimeter_neighbors = grid.neighbor_count(grid.assigned & grid.on_perimeter)
+        new_corner_indices = np.flatnonzero(free_perimeter & (assigned_perimeter_neighbors > 0))
+        grid.set_corner(new_corner_indices)
+        # Клетка учитывается столько раз, сколько у нее занятых соседей на периметре
+        corner_indices = np.repeat(new_corner_indices, assigned_perimeter_neighbors[new_corner_indices])
+
+        if room_type in ['living room', 'bedroom', 'kitchen', 'bathroom'] and len(corner_indices) > 0:
+            corner_polygons = grid.polygons(corner_indices)
+            exterior = self.building_polygon.exterior
+            return_indices = np.concatenate((corner_indices[shapely.overlaps(corner_polygons, exterior)],
+                                             corner_indices[shapely.intersects(corner_polygons, exterior)]))
+            if len(return_indices) > 0:
+                return self.cells[self.rng.choice(return_indices)]
+            return self.cells[self.rng.choice(corner_indices)]
+
         # Если corner_cells пуст, используем любые свободные клетки на периметре
-        if not corner_cells:
-            available_cells = [cell for cell in self.cells if cell['on_perimeter'] and not cell['assigned']]
-            if available_cells:
-                return random.choice(available_cells)
+        if len(corner_indices) == 0 and grid.free_sets['perimeter']:
+            return self.cells[grid.free_sets['perimeter'].sample(self.rng)]
 
         # Если ничего не найдено, возвращаем None
         return None
 
     def aspect_ratio_ok(self, cells, max_aspect_ratio=1.5):
-        # Проверка соотношения сторон комнаты
-        polys = [c['polygon'] for c in cells]
-        union_poly = unary_union(polys)
-        bbox = union_poly.envelope
-
-        # Если bbox - это точка, соотношение сторон не имеет смысла
-        if isinstance(bbox, Point):
+        # Проверка соотношения сторон комнаты по индексам клеток
+        if not cells:
             return False, 0  # Соотношение невозможно вычислить
-
-        coords = list(bbox.exterior.coords)
-        side_lengths = []
-        for i in range(4):
-            x1, y1 = coords[i]
-            x2, y2 = coords[(i + 1) % 4]
-            dist = math.sqrt((x2 - x1) ** 2 + (y2 - y1) ** 2)
-            side_lengths.append(dist)
-        side_lengths.sort()
-        shorter, longer = side_lengths[0], side_lengths[2]
-        ratio = longer / (shorter + 1e-9)
+        ratio = ShapeTracker.from_cells(cells).aspect_ratio()
         return ratio <= max_aspect_ratio, ratio
 
 
@@ -0,0 +1,128 @@
+from Classes.Geometry.PlanTransform import PlanTransform, rotate_quarter_turns
+from Classes.Geometry.Territory.Building.Apartment.Room import Room
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+import numpy as np
+import shapely
+
+# Точность координат в ключе (знаков после запятой)
+_KEY_PRECISION = 6
+# Направления сторон клетки: вправо, вверх, влево, вниз
+_SIDE_DIRECTIONS = ((1, 0), (0, 1), (-1, 0), (0, -1))
+# Комнаты, которым нужны окна на периметре здания
+_WINDOW_ROOM_TYPES = ('living room', 'bedroom', 'kitchen')
+
+
+class RoomLayout:
+    """Планировка комнат квартиры в каноническом положении ее формы."""
+
+    def __init__(self, rooms: List[Tuple[str, list]], window_rooms: int, hall_on_free_side: bool):
+        self.rooms = rooms  # (тип комнаты, контур)
+        self.window_rooms = window_rooms  # число жилых комнат и кухонь на периметре здания
+        self.hall_on_free_side = hall_on_free_side  # выходит ли прихожая на свободную сторону
+
+
+class RoomLayoutMemo:
+    """
+    Память планировок комнат по форме квартиры: одинаковые с точностью до сдвига и поворота
+    на кратный 90° угол квартиры получают уже найденное разбиение на комнаты вместо
+    повторной случайной планировки.
+
+    Ключ - тип и площадь квартиры, ее маска клеток и сигнатура сторон (какие стороны клеток
+    контура лежат на свободных сторонах квартиры и на периметре здания) в каноническом положении.
+    Разбиение из памяти переводится в координаты квартиры и проверяется по ее свободным сторонам
+    и периметру здания; не прошедшее проверку разбиение не используется.
+
+    Хранится не больше max_size планировок, давно не использовавшиеся вытесняются.
+    """
+
+    def __init__(self, max_size: int = 1024):
+        self.max_size = max_size
+        self._layouts = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._layouts)
+
+    def key(self, apartment) -> Tuple[tuple, PlanTransform]:
+        """Возвращает ключ формы квартиры (по ее сетке клеток) и перевод ее координат в каноническое положение."""
+        grid = apartment.grid
+        half = grid.cell_size / 2
+        minx, miny, _, _ = grid.bounds()
+        centers = np.column_stack((minx + half, miny + half))
+
+        # Стороны клеток на контуре квартиры: середина стороны и ее класс
+        midpoints = []
+        for di, dj in _SIDE_DIRECTIONS:
+            neighbors = grid.ij + (di, dj)
+            inside = ((neighbors[:, 0] >= 0) & (neighbors[:, 0] < grid.shape[0])
+                      & (neighbors[:, 1] >= 0) & (neighbors[:, 1] < grid.shape[1]))
+            outer = np.ones(len(grid), dtype=bool)
+            outer[inside] = grid.index_map[neighbors[inside, 0], neighbors[inside, 1]] < 0
+            midpoints.append(centers[outer] + (di * half, dj * half))
+        midpoints = np.concatenate(midpoints)
+        side_classes = np.zeros(len(midpoints), dtype=np.int8)
+        points = shapely.points(midpoints)
+        if apartment.building_polygon is not None:
+            side_classes[shapely.distance(points, apartment.building_polygon.exterior) < 1e-6] = 1
+        if apartment.free_sides:
+            side_classes[shapely.distance(points, shapely.union_all(apartment.free_sides)) < 1e-6] = 2
+
+        best = None
+        for quarter_turns in range(4):
+            rotated = [rotate_quarter_turns(center, quarter_turns) for center in centers.tolist()]
+            offset = (min(x for x, _ in rotated) - half, min(y for _, y in rotated) - half)
+            transform = PlanTransform(quarter_turns, offset)
+            shape = (tuple(sorted(_rounded(transform.forward(center)) for center in centers.tolist())),
+                     tuple(sorted(_rounded(transform.forward(midpoint)) + (int(side_class),)
+                                  for midpoint, side_class in zip(midpoints.tolist(), side_classes))))
+            if best is None or shape < best[0]:
+                best = (shape, transform)
+        shape, transform = best
+        return (apartment.type, round(apartment.area, _KEY_PRECISION), grid.cell_size) + shape, transform
+
+    def get(self, key, transform: PlanTransform, apartment) -> Optional[List[Room]]:
+        """Возвращает комнаты из памяти в координатах квартиры или None, если их нет или они не прошли проверку."""
+        layout = self._layouts.get(key)
+        if layout is None:
+            self.misses += 1
+            return None
+        rooms = [Room(points=[transform.inverse(point) for point in points], room_type=room_type)
+                 for room_type, points in layout.rooms]
+        if (abs(sum(room.area for room in rooms) - apartment.area) > 1e-6
+                or _window_rooms(rooms, apartment) != layout.window_rooms
+                or (layout.hall_on_free_side and not _hall_on_free_side(rooms, apartment))):
+            self.misses += 1
+            return None
+        self._layouts.move_to_end(key)
+        self.hits += 1
+        return rooms
+
+    def put(self, key, transform: PlanTransform, apartment):
+        """Запоминает комнаты квартиры под ключом ее формы."""
+        rooms = [(room.type, [transform.forward(point) for point in room.points]) for room in apartment.rooms]
+        self._layouts[key] = RoomLayout(rooms, _window_rooms(apartment.rooms, apartment),
+                                        _hall_on_free_side(apartment.rooms, apartment))
+        self._layouts.move_to_end(key)
+        while len(self._layouts) > self.max_size:
+            self._layouts.popitem(last=False)
+
+    def clear(self):
+        self._layouts.clear()
+
+
+def _rounded(point: Tuple[float, float]) -> Tuple[float, float]:
+    return round(point[0], _KEY_PRECISION) + 0.0, round(point[1], _KEY_PRECISION) + 0.0
+
+
+def _window_rooms(rooms: List[Room], apartment) -> int:
+    if apartment.building_polygon is None:
+        return 0
+    exterior = apartment.building_polygon.exterior
+    return sum(1 for room in rooms if room.type in _WINDOW_ROOM_TYPES and room.polygon.intersects(exterior))
+
+
+def _hall_on_free_side(rooms: List[Room], apartment) -> bool:
+    return any(room.type == 'hall' and any(room.polygon.intersects(side) for side in apartment.free_sides)
+               for room in rooms)
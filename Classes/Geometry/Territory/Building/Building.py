@@ -3,8 +3,11 @@ from copy import deepcopy
 from Classes.Geometry.GeometricFigure import GeometricFigure
 from Classes.Geometry.Territory.Building.Floor.Floor import Floor
 from Classes.Geometry.Territory.Building.Floor.Section import Section
+from Classes.Geometry.Territory.Building.Floor.PlanCache import PlanCache
 from Classes.Geometry.Territory.Building.Elevator import Elevator
 from Classes.Geometry.Territory.Building.Stair import Stair
+from Classes.Geometry.Territory.RLAgent import RLAgent
+import Classes.Instrumentation as instrumentation
 from typing import List, Tuple, Dict
 import copy
 from shapely import Polygon
@@ -17,8 +20,12 @@ class Building(GeometricFigure):
                  sections: List[List[Tuple[float, float]]],
                  num_floors: int,
                  apartment_table: Dict,
-                 to_adjust=False):
+                 to_adjust=False,
+                 agent: RLAgent = None,
+                 plan_cache: PlanCache = None,
+                 rng: random.Random = None):
         super().__init__(points)
+        self.rng = rng if rng is not None else random.Random(random.getrandbits(64))  # Генератор случайных чисел этажей
         self.floors = []  # Список этажей в здании
         self.num_floors = num_floors  # Количество этажей
         self.sections = sections
@@ -29,6 +36,8 @@ class Building(GeometricFigure):
         self.apartment_table_copy = deepcopy(self.apartment_table)
         self.to_adjust = to_adjust
         self.adjusted_table = {}
+        self.agent = agent  # Общий RL-агент секций всех этажей (None - у каждой секции свой)
+        self.plan_cache = plan_cache  # Кэш готовых планов секций (None - без кэша)
 
     def _clean_apartment_table(self, apartment_table: Dict) -> Dict:
         """
@@ -42,6 +51,7 @@ class Building(GeometricFigure):
         """
         return {apt_type: data for apt_type, data in apartment_table.items() if data['number'] > 0}
 
+    @instrumentation.timed('building.generate_floors')
     def generate_floors(self):
         """Генерирует этажи, добавляя их в список floors."""
         if not self.to_adjust:
@@ -71,7 +81,10 @@ class Building(GeometricFigure):
                           apartment_table=adjusted_table,
                           building_polygon=self.polygon,
                           single_floor=True,
-                          to_adjust=self.to_adjust)
+                          to_adjust=self.to_adjust,
+                          agent=self.agent,
+                          plan_cache=self.plan_cache,
+                          rng=self.rng)
             floor.generate_floor_planning()
             if self.num_floors > 1:
                 for _ in range(self.num_floors - 1):
@@ -90,7 +103,10 @@ class Building(GeometricFigure):
                       apartment_table=self.apartment_table,
                       building_polygon=self.polygon,
                       single_floor=True,
-                      to_adjust=self.to_adjust)
+                      to_adjust=self.to_adjust,
+                      agent=self.agent,
+                      plan_cache=self.plan_cache,
+                      rng=self.rng)
         floor.generate_floor_planning()
         self.floors.append(floor)
 
@@ -138,7 +154,10 @@ class Building(GeometricFigure):
                             sections_list=self.sections,
                             apartment_table=empty_pattern,
                             building_polygon=self.polygon,
-                            to_adjust=self.to_adjust)
+                            to_adjust=self.to_adjust,
+                            agent=self.agent,
+                            plan_cache=self.plan_cache,
+                            rng=self.rng)
         first_floor.generate_floor_planning()
         # Ставим этот этаж первым
         self.floors.insert(0, first_floor)
@@ -304,7 +323,10 @@ class Building(GeometricFigure):
             points=self.points,
             sections_list=self.sections,
             apartment_table=floor_pattern,
-            building_polygon=self.polygon
+            building_polygon=self.polygon,
+            agent=self.agent,
+            plan_cache=self.plan_cache,
+            rng=self.rng
         )
         floor.generate_floor_planning()
         return floor
@@ -326,7 +348,10 @@ class Building(GeometricFigure):
             points=self.points,
             sections_list=self.sections,
             apartment_table=apartment_table,
-            building_polygon=self.polygon  # Копия полигона здания
+            building_polygon=self.polygon,  # Копия полигона здания
+            agent=self.agent,
+            plan_cache=self.plan_cache,
+            rng=self.rng
         )
         new_floor.generate_floor_planning(is_copy=True)
         for i, section in enumerate(new_floor.sections):
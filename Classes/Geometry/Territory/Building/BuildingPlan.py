@@ -0,0 +1,118 @@
+from Classes.Geometry.Territory.Building.Building import Building
+from Classes.Geometry.Territory.Building.Floor.Floor import Floor
+from Classes.Geometry.Territory.Building.Floor.Section import Section
+from Classes.Geometry.Territory.Building.Floor.SectionPlan import SectionPlan, table_from_json, PLAN_FORMAT_VERSION
+from typing import Dict, List
+import json
+import random
+import struct
+
+_HEADER_LENGTH = struct.Struct('<I')
+
+
+class BuildingPlan:
+    """
+    Компактное представление сгенерированного здания: уникальные этажи (таблица квартир и планы секций),
+    порядок этажей, сообщения и скорректированная таблица. Повторяющиеся этажи хранятся один раз.
+    """
+
+    def __init__(self, floors: List[Dict],
+                 floor_order: List[int],
+                 message: List = None,
+                 adjusted_table: Dict = None):
+        self.floors = floors  # {'apartment_table', 'single_floor', 'to_adjust', 'sections': [SectionPlan]}
+        self.floor_order = floor_order
+        self.message = message if message is not None else []
+        self.adjusted_table = adjusted_table if adjusted_table is not None else {}
+
+    @classmethod
+    def from_building(cls, building: Building) -> 'BuildingPlan':
+        floors = []
+        floor_order = []
+        floor_indices = {}
+        for floor in building.floors:
+            if id(floor) not in floor_indices:
+                floor_indices[id(floor)] = len(floors)
+                floors.append({'apartment_table': floor.apartment_table,
+                               'single_floor': floor.single_floor,
+                               'to_adjust': floor.to_adjust,
+                               'sections': [SectionPlan.from_section(section) for section in floor.sections]})
+            floor_order.append(floor_indices[id(floor)])
+        return cls(floors, floor_order, list(building.message), building.adjusted_table)
+
+    def to_building(self, points, sections, num_floors, apartment_table, to_adjust=False) -> Building:
+        """Восстанавливает здание с теми же параметрами, с которыми оно генерировалось."""
+        # Готовое здание больше не планируется, поэтому генераторы не берут состояние из модуля random
+        building = Building(points=points, sections=sections, num_floors=num_floors,
+                            apartment_table=apartment_table, to_adjust=to_adjust, rng=random.Random(0))
+        floors = []
+        for info in self.floors:
+            floor = Floor(points=building.points,
+                          sections_list=building.sections,
+                          apartment_table=info['apartment_table'],
+                          building_polygon=building.polygon,
+                          single_floor=info['single_floor'],
+                          to_adjust=info['to_adjust'],
+                          rng=building.rng)
+            for section_points, section_plan in zip(building.sections, info['sections']):
+                section = Section(points=section_points,
+                                  apartment_table=section_plan.apartment_table,
+                                  building_polygon=building.polygon,
+                                  to_adjust=info['to_adjust'],
+                                  rng=building.rng)
+                section_plan.apply_to(section)
+                floor.sections.append(section)
+            floors.append(floor)
+        building.floors = [floors[index] for index in self.floor_order]
+        building.message = list(self.message)
+        building.adjusted_table = self.adjusted_table
+        return building
+
+    def to_dict(self) -> Dict:
+        """План здания в виде словаря для JSON: уникальные этажи с планами секций и порядок этажей."""
+        return {'floors': [{'apartment_table': info['apartment_table'],
+                            'single_floor': info['single_floor'],
+                            'to_adjust': info['to_adjust'],
+                            'sections': [section.to_dict() for section in info['sections']]}
+                           for info in self.floors],
+                'floor_order': self.floor_order,
+                'message': self.message,
+                'adjusted_table': self.adjusted_table}
+
+    def to_bytes(self) -> bytes:
+        blobs = []
+        floors = []
+        for info in self.floors:
+            section_blobs = [section.to_bytes() for section in info['sections']]
+            blobs.extend(section_blobs)
+            floors.append({'apartment_table': info['apartment_table'],
+                           'single_floor': info['single_floor'],
+                           'to_adjust': info['to_adjust'],
+                           'sections': [len(blob) for blob in section_blobs]})
+        header = {'version': PLAN_FORMAT_VERSION,
+                  'floors': floors,
+                  'floor_order': self.floor_order,
+                  'message': self.message,
+                  'adjusted_table': self.adjusted_table}
+        head = json.dumps(header, ensure_ascii=False).encode('utf-8')
+        return _HEADER_LENGTH.pack(len(head)) + head + b''.join(blobs)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> 'BuildingPlan':
+        (head_length,) = _HEADER_LENGTH.unpack_from(data)
+        position = _HEADER_LENGTH.size
+        header = json.loads(data[position:position + head_length].decode('utf-8'))
+        if header['version'] != PLAN_FORMAT_VERSION:
+            raise ValueError(f"Неподдерживаемая версия плана: {header['version']}")
+        position += head_length
+        floors = []
+        for info in header['floors']:
+            section_plans = []
+            for length in info['sections']:
+                section_plans.append(SectionPlan.from_bytes(data[position:position + length]))
+                position += length
+            floors.append({'apartment_table': table_from_json(info['apartment_table']),
+                           'single_floor': info['single_floor'],
+                           'to_adjust': info['to_adjust'],
+                           'sections': section_plans})
+        return cls(floors, header['floor_order'], header['message'], table_from_json(header['adjusted_table']))
@@ -1,9 +1,17 @@
 from Classes.Geometry.GeometricFigure import GeometricFigure
 from Classes.Geometry.Territory.Building.Floor.Section import Section
+from Classes.Geometry.Territory.Building.Floor.SectionPlan import SectionPlan
+from Classes.Geometry.Territory.Building.Floor.PlanCache import PlanCache
+from Classes.Geometry.Territory.RLAgent import RLAgent
+import Classes.Instrumentation as instrumentation
+from concurrent.futures import Executor
 from shapely.geometry import Polygon
 from typing import List, Tuple, Dict
 import random
 from math import floor
+import logging
+
+logger = logging.getLogger(__name__)
 
 class Floor(GeometricFigure):
     def __init__(self, points: List[Tuple[float, float]],
@@ -11,7 +19,10 @@ class Floor(GeometricFigure):
                  apartment_table: Dict,
                  building_polygon: Polygon = None,
                  single_floor: bool = False,
-                 to_adjust: bool = False):
+                 to_adjust: bool = False,
+                 agent: RLAgent = None,
+                 plan_cache: PlanCache = None,
+                 rng: random.Random = None):
         super().__init__(points)  # Передаем points в конструктор родительского класса
         self.apartment_table = self._clean_apartment_table(apartment_table)  # Таблица квартир, переданная в класс
 
@@ -21,38 +32,67 @@ class Floor(GeometricFigure):
         self.building_polygon = building_polygon
         self.single_floor = single_floor
         self.to_adjust = to_adjust
+        self.agent = agent  # Общий RL-агент секций (None - у каждой секции свой)
+        self.plan_cache = plan_cache  # Кэш готовых планов секций (None - без кэша)
+        # Генератор, из которого секции получают свои генераторы и seed (общий для этажей здания)
+        self.rng = rng if rng is not None else random.Random(random.getrandbits(64))
 
-    def generate_floor_planning(self, cell_size=1, is_copy=False):
+    @instrumentation.timed('floor.plan')
+    def generate_floor_planning(self, cell_size=1, is_copy=False, executor: Executor = None, seed=None):
         """
         Генерирует планировку этажа, распределяя квартиры по секциям.
+
+        Args:
+            executor: пул процессов (concurrent.futures.Executor); если задан, секции планируются
+                в нем одновременно, и результаты возвращаются в self.sections в исходном порядке.
+            seed: если задан, секция i планируется с seed + i, поэтому результат одинаков
+                с пулом и без него (если у секций нет общего агента: в пуле каждая секция
+                получает копию self.agent, и ее обучение не возвращается).
         """
-        print(self.apartment_table)
+        logger.debug("Таблица квартир этажа: %s", self.apartment_table)
         self.cells = None
         self.check_and_create_cell_grid(cell_size=cell_size)
         if len(self.sections_list) == 1:
             # Если секция одна, таблица остаётся неизменной
-            section = Section(points=self.sections_list[0],
-                              apartment_table=self.apartment_table,
+            section_tables = [self.apartment_table]
+            max_iterations = 50
+        else:
+            # Распределение квартир по секциям
+            section_tables = self._distribute_apartment_table_among_sections()
+            max_iterations = 20
+        if seed is not None:
+            section_seeds = [seed + i for i in range(len(self.sections_list))]
+        elif executor is not None:
+            section_seeds = [self.rng.getrandbits(32) for _ in self.sections_list]
+        else:
+            section_seeds = [None] * len(self.sections_list)
+
+        futures = []
+        recording = instrumentation.active() is not None
+        for points, section_table, section_seed in zip(self.sections_list, section_tables, section_seeds):
+            section = Section(points=points,
+                              apartment_table=section_table,
                               building_polygon=self.building_polygon,
-                              to_adjust=self.to_adjust)
+                              to_adjust=self.to_adjust,
+                              agent=self.agent,
+                              rng=random.Random(self.rng.getrandbits(64)),
+                              plan_cache=self.plan_cache)
             self.sections.append(section)
-            if not is_copy:
+            if is_copy:
+                continue
+            if executor is not None:
+                # Сетку секции строит процесс-исполнитель
+                futures.append((section, executor.submit(_plan_section, points, section_table, self.building_polygon,
+                                                         self.to_adjust, max_iterations, section_seed, self.agent,
+                                                         self.plan_cache, recording)))
+            else:
                 section.cells = None
                 section.check_and_create_cell_grid(cell_size=1, polygon_to_check=section.polygon)
-                section.generate_section_planning(max_iterations=50)
-        else:
-            # Распределение квартир по секциям
-            section_tables = self._distribute_apartment_table_among_sections()
-            for i, (points, section_table) in enumerate(zip(self.sections_list, section_tables)):
-                section = Section(points=points,
-                                  apartment_table=section_table,
-                                  building_polygon=self.building_polygon,
-                                  to_adjust=self.to_adjust)
-                self.sections.append(section)
-                if not is_copy:
-                    section.cells = None
-                    section.check_and_create_cell_grid(cell_size=1, polygon_to_check=section.polygon)
-                    section.generate_section_planning(max_iterations=20)
+                section.generate_section_planning(max_iterations=max_iterations, seed=section_seed)
+        for section, future in futures:
+            data, recorded = future.result()
+            instrumentation.merge(recorded)
+            SectionPlan.from_bytes(data).apply_to(section)
 
     def _distribute_apartment_table_among_sections(self):
         """
@@ -61,7 +101,7 @@ class Floor(GeometricFigure):
         """
         # Проверка на пустые секции
         if not self.sections_list:
-            print("Ошибка: Список секций пуст. Невозможно распределить квартиры.")
+            logger.error("Список секций пуст. Невозможно распределить квартиры.")
             return None
         total_area = sum(Polygon(points).area for points in self.sections_list)
         section_areas = [Polygon(points).area for points in self.sections_list]
@@ -97,4 +137,32 @@ class Floor(GeometricFigure):
         """
         Удаляет из apartment_table типы квартир, у которых number = 0.
         """
-        return {apt_type: data for apt_type, data in apartment_table.items() if data['number'] > 0}
\ No newline at end of file
+        return {apt_type: data for apt_type, data in apartment_table.items() if data['number'] > 0}
+
+
+def _plan_section(points, apartment_table, building_polygon, to_adjust, max_iterations, seed, agent=None,
+                  plan_cache=None, recording=False):
+    """
+    Планирует секцию в процессе-исполнителе и возвращает ее упакованный SectionPlan
+    и данные инструментирования процесса (None, если recording=False).
+    """
+    return instrumentation.run_recorded(recording, _plan_section_to_bytes, points, apartment_table, building_polygon,
+                                        to_adjust, max_iterations, seed, agent, plan_cache)
+
+
+def _plan_section_to_bytes(points, apartment_table, building_polygon, to_adjust, max_iterations, seed, agent,
+                           plan_cache):
+    rng = random.Random(seed)
+    if agent is None:
+        agent = RLAgent(rng=rng)
+    else:
+        agent.rng = rng  # Агент - копия, полученная из основного процесса
+    section = Section(points=points,
+                      apartment_table=apartment_table,
+                      building_polygon=building_polygon,
+                      to_adjust=to_adjust,
+                      agent=agent,
+                      rng=rng,
+                      plan_cache=plan_cache)
+    section.generate_section_planning(max_iterations=max_iterations, seed=seed)
+    return SectionPlan.from_section(section).to_bytes()
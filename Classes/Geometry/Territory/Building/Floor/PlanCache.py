@@ -0,0 +1,170 @@
+from Classes.Geometry.PlanTransform import PlanTransform, rotate_quarter_turns
+from Classes.Geometry.Territory.Building.Floor.SectionPlan import SectionPlan, PLAN_FORMAT_VERSION
+from shapely.geometry import Polygon
+from typing import Dict, List, Optional, Tuple
+import hashlib
+import json
+import sqlite3
+import time
+
+# Точность координат в ключе кэша (знаков после запятой)
+_KEY_PRECISION = 6
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS plan_keys (
+    key TEXT PRIMARY KEY,
+    last_used INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS plans (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    key TEXT NOT NULL,
+    score REAL NOT NULL,
+    plan BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS plans_by_key ON plans (key, score);
+"""
+
+
+class PlanCache:
+    """
+    Постоянный кэш планов секций в базе SQLite.
+
+    Ключ - хэш канонического описания входа планировки: контур секции и контур здания, приведенные
+    к общему каноническому положению (сдвиг и поворот на кратный 90° угол), очищенная таблица квартир,
+    размер клетки, to_adjust, число перезапусков и seed. Поэтому одинаковые секции в разных местах
+    и зданиях получают один ключ, а план из кэша переводится обратно в координаты секции.
+
+    Для каждого ключа хранятся plans_per_key лучших по прямоугольности квартир планов (упакованные
+    SectionPlan); ключей хранится не больше max_keys, давно не использовавшиеся вытесняются (LRU).
+
+    Объект можно передавать в другие процессы: соединение с базой открывается заново в каждом из них.
+    """
+
+    def __init__(self, path: str, plans_per_key: int = 4, max_keys: int = 1024):
+        self.path = path
+        self.plans_per_key = plans_per_key
+        self.max_keys = max_keys
+        self._connection = None
+
+    def load(self, section, max_iterations: int, seed=None) -> bool:
+        """
+        Применяет к секции план из кэша. Возвращает False, если подходящего плана нет.
+
+        С заданным seed берется лучший план ключа. Без seed план выбирается случайно (section.rng)
+        среди сохраненных, но только когда их набралось plans_per_key - до этого генерируются новые варианты.
+        """
+        key, transform = self.key(section, max_iterations, seed)
+        plans = self._plans(key)
+        if not plans or (seed is None and len(plans) < self.plans_per_key):
+            return False
+        data = plans[0] if seed is not None else section.rng.choice(plans)
+        SectionPlan.from_bytes(data).transformed(transform.inverse).apply_to(section)
+        self._touch(key)
+        return True
+
+    def store(self, section, max_iterations: int, seed=None):
+        """Сохраняет план секции в кэш с оценкой - суммарной прямоугольностью квартир (чем меньше, тем лучше)."""
+        if not section.apartments:
+            return
+        key, transform = self.key(section, max_iterations, seed)
+        score = sum(section._rectangularity_score(apartment.polygon) for apartment in section.apartments)
+        data = SectionPlan.from_section(section).transformed(transform.forward).to_bytes()
+        connection = self._connect()
+        with connection:
+            connection.execute("INSERT INTO plans (key, score, plan) VALUES (?, ?, ?)", (key, score, data))
+            # Оставляем plans_per_key лучших планов ключа
+            connection.execute("DELETE FROM plans WHERE key = ? AND id NOT IN "
+                               "(SELECT id FROM plans WHERE key = ? ORDER BY score, id LIMIT ?)",
+                               (key, key, self.plans_per_key))
+            connection.execute("INSERT OR REPLACE INTO plan_keys (key, last_used) VALUES (?, ?)",
+                               (key, time.time_ns()))
+            # Вытесняем давно не использовавшиеся ключи
+            evicted = connection.execute("SELECT key FROM plan_keys ORDER BY last_used DESC LIMIT -1 OFFSET ?",
+                                         (self.max_keys,)).fetchall()
+            connection.executemany("DELETE FROM plans WHERE key = ?", evicted)
+            connection.executemany("DELETE FROM plan_keys WHERE key = ?", evicted)
+
+    def key(self, section, max_iterations: int, seed=None) -> Tuple[str, PlanTransform]:
+        """Возвращает ключ кэша для входа планировки секции и перевод ее координат в каноническое положение."""
+        best = None
+        for quarter_turns in range(4):
+            rotated = [rotate_quarter_turns(point, quarter_turns) for point in _ring(section.points)]
+            offset = (min(x for x, _ in rotated), min(y for _, y in rotated))
+            transform = PlanTransform(quarter_turns, offset)
+            shape = (_canonical_ring([transform.forward(point) for point in _ring(section.points)]),
+                     _canonical_polygon(section.building_polygon, transform))
+            if best is None or shape < best[0]:
+                best = (shape, transform)
+        (section_ring, building_rings), transform = best
+        description = {'version': PLAN_FORMAT_VERSION,
+                       'section': section_ring,
+                       'building': building_rings,
+                       'apartment_table': _canonical_table(section.apartment_table),
+                       'cell_size': getattr(section, 'cell_size', 1),
+                       'to_adjust': section.to_adjust,
+                       'max_iterations': max_iterations,
+                       'seed': seed}
+        encoded = json.dumps(description, sort_keys=True, separators=(',', ':')).encode('utf-8')
+        return hashlib.sha256(encoded).hexdigest(), transform
+
+    def clear(self):
+        connection = self._connect()
+        with connection:
+            connection.execute("DELETE FROM plans")
+            connection.execute("DELETE FROM plan_keys")
+
+    def close(self):
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+    def __getstate__(self):
+        # Соединение с базой не передается между процессами
+        state = self.__dict__.copy()
+        state['_connection'] = None
+        return state
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._connection is None:
+            self._connection = sqlite3.connect(self.path, timeout=30)
+            self._connection.executescript(_SCHEMA)
+        return self._connection
+
+    def _plans(self, key: str) -> List[bytes]:
+        rows = self._connect().execute("SELECT plan FROM plans WHERE key = ? ORDER BY score, id", (key,)).fetchall()
+        return [row[0] for row in rows]
+
+    def _touch(self, key: str):
+        connection = self._connect()
+        with connection:
+            connection.execute("UPDATE plan_keys SET last_used = ? WHERE key = ?", (time.time_ns(), key))
+
+
+def _ring(points) -> List[Tuple[float, float]]:
+    """Точки контура без замыкающей точки."""
+    points = [tuple(point) for point in points]
+    if len(points) > 1 and points[0] == points[-1]:
+        points = points[:-1]
+    return points
+
+
+def _canonical_ring(points: List[Tuple[float, float]]) -> List[List[float]]:
+    """Контур с округленными координатами, обходом против часовой стрелки и началом в наименьшей вершине."""
+    ring = [[round(x, _KEY_PRECISION) + 0.0, round(y, _KEY_PRECISION) + 0.0] for x, y in _ring(points)]
+    signed_area = sum(x1 * y2 - x2 * y1 for (x1, y1), (x2, y2) in zip(ring, ring[1:] + ring[:1]))
+    if signed_area < 0:
+        ring.reverse()
+    start = ring.index(min(ring))
+    return ring[start:] + ring[:start]
+
+
+def _canonical_polygon(polygon: Optional[Polygon], transform: PlanTransform) -> List:
+    if polygon is None:
+        return []
+    rings = [polygon.exterior] + list(polygon.interiors)
+    return [_canonical_ring([transform.forward(point) for point in ring.coords]) for ring in rings]
+
+
+def _canonical_table(apartment_table: Dict) -> List:
+    return [[apt_type, list(info['area_range']), info['percent'], info['number']]
+            for apt_type, info in sorted(apartment_table.items())]
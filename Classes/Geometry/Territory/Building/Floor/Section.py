@@ -2,18 +2,36 @@ from shapely.geometry.multilinestring import MultiLineString
 from shapely.set_operations import intersection
 
 from Classes.Geometry.GeometricFigure import GeometricFigure
+from Classes.Geometry.RegionGrowing import grow_region, fewest_free_neighbors
+from Classes.Geometry.CellOutline import cells_outline, count_parts
 from Classes.Geometry.Territory.Building.Apartment.Apartment import Apartment
+from Classes.Geometry.Territory.Building.Apartment.RoomLayoutMemo import RoomLayoutMemo
 from Classes.Geometry.Territory.Building.Elevator import Elevator
+from Classes.Geometry.Territory.Building.Floor.PlanCache import PlanCache
 from Classes.Geometry.Territory.Building.Stair import Stair
 from Classes.Geometry.Territory.RLAgent import RLAgent
-from shapely.geometry import Polygon, LineString, MultiPolygon, Point
-from shapely import union_all
+import Classes.Instrumentation as instrumentation
+from shapely.geometry import Polygon, LineString, MultiPolygon, Point, GeometryCollection
 import random
 from typing import List, Tuple, Dict
 import time
 import copy
 from shapely.affinity import translate
 import math
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import shapely
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Перезапуски разбираются пакетами по 4 (лучший план берется на каждой 4-й итерации)
+RESTARTS_PER_BATCH = 4
+# Итерация, на которой при отсутствии плана берется альтернативный план (to_adjust)
+ALTERNATIVE_PLAN_ITERATION = 12
+# Итерация, начиная с которой допускаются квартиры без выхода к свободной области
+SIMPLE_PLAN_ITERATION = 16
 
 
 class Section(GeometricFigure):
@@ -21,8 +39,12 @@ class Section(GeometricFigure):
                  apartment_table: Dict,
                  apartments: List['Apartment'] = None,
                  building_polygon: Polygon = None,
-                 to_adjust: bool = False):
+                 to_adjust: bool = False,
+                 agent: RLAgent = None,
+                 rng: random.Random = None,
+                 plan_cache: PlanCache = None):
         super().__init__(points)
+        self.rng = rng if rng is not None else random.Random(random.getrandbits(64))  # Генератор случайных чисел планировки
         self.apartments = apartments if apartments is not None else []  # List of Apartment objects
         self.queue_corners_to_allocate = []
         self.free_cells = []
@@ -30,101 +52,98 @@ class Section(GeometricFigure):
         self.building_polygon = building_polygon
         self.messages = []
         self.total_apartment_number = self._calc_total_apartment_number()
-        self.agent = RLAgent()
+        self.agent = agent if agent is not None else RLAgent(rng=self.rng)
         self.initial_corner_cells = []
         self.otladka = []
         self.simple_plan = False
         self.temporary_cells = []
         self.to_adjust = to_adjust
         self.plan_done = False
+        self.plan_cache = plan_cache  # Постоянный кэш готовых планов секций (None - без кэша)
+        # Память планировок комнат квартир одной формы; общая только для квартир секции,
+        # поэтому план секции не зависит от того, в каком процессе она планировалась
+        self.room_layouts = RoomLayoutMemo()
+
+
+    @instrumentation.timed('section.plan')
+    def generate_section_planning(self, max_iterations=30, cell_size=1, workers=1, seed=None):
+        """Generates a floor plan by allocating apartments according to the given apartment table.
 
+        The RL agent (self.agent, possibly shared between sections and warm-started with
+        RLAgent.load) keeps learning across the restarts; in the parallel mode every batch
+        starts from a copy of it and its learning is not merged back.
 
-    def generate_section_planning(self, max_iterations=30, cell_size=1):
+        With a plan cache (self.plan_cache) a cached plan for the same input is transformed into
+        the section's coordinates and applied without planning; new plans are added to the cache.
+
+        Args:
+            max_iterations: number of random restarts.
+            cell_size: size of the planning cells.
+            workers: with more than one worker the restarts run in a process pool,
+                see _generate_section_planning_parallel.
+            seed: seed of the random number generator; the same seed gives the same plan.
+        """
         self.cell_size = cell_size
-        """Generates a floor plan by allocating apartments according to the given apartment table."""
         self.apartments = []  # Initialize as empty list
+        if seed is not None:
+            self.rng.seed(seed)
+        if not self.apartment_table:
+            return
+        if self.plan_cache is not None and self.plan_cache.load(self, max_iterations, seed):
+            instrumentation.count('section.cache_hits')
+            return self.apartments
+        # Create the cell grid once
+        self.cells = None
+        self.check_and_create_cell_grid(cell_size=1.0)
+        if workers and workers > 1:
+            self._generate_section_planning_parallel(max_iterations, workers, seed)
+        else:
+            self._generate_section_planning_sequential(max_iterations)
+        if self.plan_cache is not None:
+            self.plan_cache.store(self, max_iterations, seed)
+        return self.apartments
+
+    def _generate_section_planning_sequential(self, max_iterations):
+        """Последовательный режим generate_section_planning: перезапуски по очереди в этом процессе."""
+
         best_plan = None
         best_score = float('inf')  # The lower, the better
+        # Лучшая прямоугольность за все перезапуски, как в параллельном режиме
+        best_rectangularity = float('inf')
         start_time = time.time()
         skip_number_validation = False
         alternative_plan = []
-        if not self.apartment_table:
-            return
-        # Create the cell grid once
+        best_state = None
+        best_iteration = None
+        restarts = 0
         for iteration in range(max_iterations):
-            print(f"Итерация {iteration}")
-            if best_plan and iteration % 4 == 0:
+            logger.debug("Итерация %d", iteration)
+            if best_plan and iteration % RESTARTS_PER_BATCH == 0:
                 self.apartments = best_plan
                 if not self.apartments:
-                    print("Не нашел планировку")
-                for apt in self.apartments:
-                    apt.section_polygon = self.polygon
-                    apt.cells = None
-                    apt.check_and_create_cell_grid(cell_size=1.0, polygon_to_check=Polygon(apt.points))
-                    apt._process_cells()
-                    apt.generate_apartment_planning()
-                for apt in self.apartments:
-                    cutted_polygon = Polygon(apt.points).simplify(tolerance=0.01,
-                                                                  preserve_topology=True).intersection(
-                        self.polygon.simplify(tolerance=0.01, preserve_topology=True))
-                    if isinstance(cutted_polygon, MultiPolygon):
-                        cutted_polygon = max(cutted_polygon.geoms, key=lambda a: a.area)
-                    apt.points = list(cutted_polygon.exterior.coords)
-                    apt.polygon = Polygon(apt.points)
-                    for room in apt.rooms:
-                        cutted_polygon = Polygon(room.points).simplify(tolerance=0.01,
-                                                                       preserve_topology=True).intersection(
-                            self.polygon.simplify(tolerance=0.01, preserve_topology=True))
-                        if isinstance(cutted_polygon, Polygon):
-                            room.points = list(cutted_polygon.exterior.coords)
-                            room.polygon = Polygon(room.points)
-                    apt._generate_windows()
+                    logger.warning("Не нашел планировку")
+                self._plan_apartment_interiors()
                 self.plan_done = True
                 break
-            if not best_plan and iteration == 12 and alternative_plan:
+            if not best_plan and iteration == ALTERNATIVE_PLAN_ITERATION and alternative_plan:
                 if self.to_adjust:
                     self.apartments = alternative_plan
                     if not self.apartments:
-                        print("Не нашел планировку")
-                    for apt in self.apartments:
-                        apt.section_polygon = self.polygon
-                        apt.cells = None
-                        apt.check_and_create_cell_grid(cell_size=1.0, polygon_to_check=Polygon(apt.points))
-                        apt._process_cells()
-                        apt.generate_apartment_planning()
-                    for apt in self.apartments:
-                        cutted_polygon = Polygon(apt.points).simplify(tolerance=0.01,
-                                                                      preserve_topology=True).intersection(
-                            self.polygon.simplify(tolerance=0.01, preserve_topology=True))
-                        if isinstance(cutted_polygon, MultiPolygon):
-                            cutted_polygon = max(cutted_polygon.geoms, key=lambda a: a.area)
-                        apt.points = list(cutted_polygon.exterior.coords)
-                        apt.polygon = Polygon(apt.points)
-                        for room in apt.rooms:
-                            cutted_polygon = Polygon(room.points).simplify(tolerance=0.01,
-                                                                           preserve_topology=True).intersection(
-                                self.polygon.simplify(tolerance=0.01, preserve_topology=True))
-                            if isinstance(cutted_polygon, Polygon):
-                                room.points = list(cutted_polygon.exterior.coords)
-                                room.polygon = Polygon(room.points)
-                        apt._generate_windows()
+                        logger.warning("Не нашел планировку")
+                    self._plan_apartment_interiors()
                     skip_number_validation = True
                     self.plan_done = True
                     break
 
-            if not best_plan and iteration == 16:
+            if not best_plan and iteration == SIMPLE_PLAN_ITERATION:
                 self.simple_plan = True
-            # Reset the cell assignments between iterations
-            self.cells = None
-            self.check_and_create_cell_grid(cell_size=1.0)
-            self.queue_corners_to_allocate = []
-            # self._reset_cell_assignments()
             # Allocate apartments using the cell grid
-            apartments = self._allocate_apartments(self.cells)
-            best_rectangularity = float('inf')
+            apartments = self._plan_restart()
+            restarts += 1
 
             # **Validation**: Validate apartments for free sides
             if not apartments:
+                instrumentation.count('section.rejected.no_apartments')
                 for apart in apartments:
                     apart._reset_cell_assignments()
                     self._process_cells()
@@ -132,6 +151,7 @@ class Section(GeometricFigure):
             if self.to_adjust and len(apartments) > len(alternative_plan):
                 alternative_plan = apartments
             if not self._validate_apartment_number(apartments) and not skip_number_validation:
+                instrumentation.count('section.rejected.apartment_number')
                 # Если неверное кол-во, откатываемся
                 for apt in apartments:
                     apt._reset_cell_assignments()
@@ -143,6 +163,8 @@ class Section(GeometricFigure):
             if total_rectangularity_error < best_rectangularity:
                 best_rectangularity = total_rectangularity_error
                 best_plan = apartments
+                best_state = self.snapshot_cell_state()
+                best_iteration = iteration
             if best_rectangularity < 0.01:
                 break
 
@@ -154,36 +176,176 @@ class Section(GeometricFigure):
         if not self.apartments:
             self.apartments = best_plan if best_plan is not None else []  # Save the best generated plan
             if not self.apartments:
-                print("Не нашел планировку")
+                logger.warning("Не нашел планировку")
+            if best_state is not None:
+                self.restore_cell_state(best_state)
             self.validate_apartment_connectivity(self.apartments, last_validation=True)
             if not self.plan_done and self.apartments:
-                for apt in self.apartments:
-                    apt.section_polygon = self.polygon
-                    apt.cells = None
-                    apt.check_and_create_cell_grid(cell_size=1.0, polygon_to_check=Polygon(apt.points))
-                    apt._process_cells()
-                    apt.generate_apartment_planning()
-                for apt in self.apartments:
-                    cutted_polygon = Polygon(apt.points).simplify(tolerance=0.01,
-                                                                  preserve_topology=True).intersection(
-                        self.polygon.simplify(tolerance=0.01, preserve_topology=True))
-                    if isinstance(cutted_polygon, MultiPolygon):
-                        cutted_polygon = max(cutted_polygon.geoms, key=lambda a: a.area)
-                    apt.points = list(cutted_polygon.exterior.coords)
-                    apt.polygon = Polygon(apt.points)
-                    for room in apt.rooms:
-                        cutted_polygon = Polygon(room.points).simplify(tolerance=0.01,
-                                                                       preserve_topology=True).intersection(
-                            self.polygon.simplify(tolerance=0.01, preserve_topology=True))
-                        if isinstance(cutted_polygon, Polygon):
-                            room.points = list(cutted_polygon.exterior.coords)
-                            room.polygon = Polygon(room.points)
-                    apt._generate_windows()
+                self._plan_apartment_interiors()
 
+        instrumentation.sample('section.restarts', restarts)
+        if best_iteration is not None:
+            instrumentation.sample('section.best_restart', best_iteration)
         total_time = time.time() - start_time
-        print(f"Section planning completed in {total_time:.2f} seconds.")
+        logger.info("Section planning completed in %.2f seconds.", total_time)
         return self.apartments
 
+    def _generate_section_planning_parallel(self, max_iterations, workers, seed):
+        """
+        Параллельный режим generate_section_planning: перезапуски выполняются пакетами по
+        RESTARTS_PER_BATCH в пуле процессов, у каждого пакета свой генератор случайных чисел
+        (засеянный seed и номером первого перезапуска) и свой RL-агент.
+
+        Пакет соответствует отрезку между проверками iteration % 4 == 0 последовательного режима,
+        а результаты пакетов разбираются строго по порядку, поэтому при заданном seed план не зависит
+        от числа процессов и порядка их завершения:
+        - в первом пакете, где есть план с верным числом квартир, берется лучший по
+          _rectangularity_score, и поиск завершается;
+        - план с оценкой < 0.01 завершает поиск сразу; оставшиеся пакеты отменяются,
+          а выполняющиеся прекращают работу после текущего перезапуска;
+        - если за перезапуски до ALTERNATIVE_PLAN_ITERATION плана нет и включен to_adjust,
+          берется альтернативный план (больше всего квартир среди этих перезапусков);
+        - перезапуски начиная с SIMPLE_PLAN_ITERATION всегда выполняются с simple_plan: их результаты
+          разбираются только тогда, когда в предыдущих пакетах плана не нашлось, как и в последовательном режиме.
+        """
+        start_time = time.time()
+        if seed is None:
+            seed = self.rng.getrandbits(32)
+        batches = [list(range(first, min(first + RESTARTS_PER_BATCH, max_iterations)))
+                   for first in range(0, max_iterations, RESTARTS_PER_BATCH)]
+        spec = (self.points, self.apartment_table, self.building_polygon, self.to_adjust, self.cell_size, self.agent)
+        cancel_event = multiprocessing.Event()
+        best_plan, best_score, early_exit = None, float('inf'), False
+        best_iteration = None
+        alternative_plan = []
+        use_alternative = False
+        restarts = 0
+        recording = instrumentation.active() is not None
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_restart_worker,
+                                 initargs=(spec, cancel_event)) as executor:
+            futures = [executor.submit(_restart_batch_worker, batch, seed, recording) for batch in batches]
+            for batch, future in zip(batches, futures):
+                logger.debug("Итерации %d-%d", batch[0], batch[-1])
+                results, recorded = future.result()
+                instrumentation.merge(recorded)
+                for iteration, plan, number_ok, score in results:
+                    restarts += 1
+                    if not plan:
+                        instrumentation.count('section.rejected.no_apartments')
+                    elif not number_ok:
+                        instrumentation.count('section.rejected.apartment_number')
+                    if self.to_adjust and iteration < ALTERNATIVE_PLAN_ITERATION and len(plan) > len(alternative_plan):
+                        alternative_plan = plan
+                    if plan and number_ok and score < best_score:
+                        best_plan, best_score, best_iteration = plan, score, iteration
+                    if best_score < 0.01:
+                        early_exit = True
+                        break
+                if best_plan is not None:
+                    break
+                if (batch[-1] + 1 == ALTERNATIVE_PLAN_ITERATION and alternative_plan
+                        and max_iterations > ALTERNATIVE_PLAN_ITERATION):
+                    use_alternative = True
+                    break
+            # Отменяем оставшиеся пакеты
+            cancel_event.set()
+            for future in futures:
+                future.cancel()
+        instrumentation.sample('section.restarts', restarts)
+        if best_iteration is not None:
+            instrumentation.sample('section.best_restart', best_iteration)
+
+        if best_plan is not None:
+            self._apply_plan(best_plan)
+            # Как и в последовательном режиме, свободные стороны проверяются при раннем выходе
+            if early_exit:
+                self.validate_apartment_connectivity(self.apartments, last_validation=True)
+            self._plan_apartment_interiors()
+            self.plan_done = True
+        elif use_alternative:
+            self._apply_plan(alternative_plan)
+            self._plan_apartment_interiors()
+            self.plan_done = True
+        else:
+            logger.warning("Не нашел планировку")
+
+        total_time = time.time() - start_time
+        logger.info("Section planning completed in %.2f seconds.", total_time)
+        return self.apartments
+
+    @instrumentation.timed('section.allocate_apartments')
+    def _plan_restart(self):
+        """Один случайный перезапуск: сбрасывает сетку к исходному состоянию и размещает квартиры."""
+        # Reset the cell assignments between iterations
+        self.restore_cell_state()
+        self.queue_corners_to_allocate = []
+        return self._allocate_apartments(self.cells)
+
+    def _run_restart_batch(self, iterations, seed, cancel_event=None, base_agent=None):
+        """
+        Выполняет пакет перезапусков в процессе-исполнителе. Агент пакета - копия base_agent
+        (агента основного процесса с его Q-таблицей), так что пакеты не зависят друг от друга.
+
+        Returns:
+            list: (номер перезапуска, план [(тип, индексы клеток)], верно ли число квартир, оценка прямоугольности).
+        """
+        self.rng = random.Random(f"{seed}:{iterations[0]}")
+        self.agent = copy.deepcopy(base_agent) if base_agent is not None else RLAgent()
+        self.agent.rng = self.rng
+        results = []
+        for iteration in iterations:
+            if cancel_event is not None and cancel_event.is_set():
+                break
+            self.simple_plan = iteration >= SIMPLE_PLAN_ITERATION
+            apartments = self._plan_restart()
+            plan = [(apt.type, [cell.index for cell in apt.cells]) for apt in apartments]
+            score = sum(self._rectangularity_score(apt.polygon) for apt in apartments) if apartments else float('inf')
+            results.append((iteration, plan, self._validate_apartment_number(apartments), score))
+        return results
+
+    def _apply_plan(self, plan):
+        """Восстанавливает квартиры и занятость клеток по плану [(тип, индексы клеток)] из процесса-исполнителя."""
+        self.restore_cell_state()
+        self.apartments = []
+        for apt_type, indices in plan:
+            self.grid.set_assigned(indices)
+            self.apartments.append(self._make_apartment(apt_type, [self.cells[k] for k in indices]))
+
+    def _make_apartment(self, apt_type, apartment_cells):
+        """Создает квартиру по ее клеткам."""
+        apartment_polygon = cells_outline(apartment_cells)
+        points = list(apartment_polygon.exterior.coords)
+        apartment = Apartment(points=points, apt_type=apt_type, building_polygon=self.building_polygon, rng=self.rng)
+        apartment.cells = apartment_cells
+        return apartment
+
+    @instrumentation.timed('section.plan_interiors')
+    def _plan_apartment_interiors(self):
+        """Планирует комнаты квартир и обрезает квартиры и комнаты по контуру секции."""
+        for apt in self.apartments:
+            apt.section_polygon = self.polygon
+            apt.room_layouts = self.room_layouts
+            # Сетку квартиры строит generate_apartment_planning (по упрощенному контуру)
+            apt.generate_apartment_planning()
+        for apt in self.apartments:
+            cutted_polygon = Polygon(apt.points).simplify(tolerance=0.01,
+                                                          preserve_topology=True).intersection(
+                self.polygon.simplify(tolerance=0.01, preserve_topology=True))
+            if isinstance(cutted_polygon, (MultiPolygon, GeometryCollection)):
+                # Пересечение по касанию может дать вместе с полигоном линии и точки
+                cutted_polygon = max((part for part in cutted_polygon.geoms if isinstance(part, Polygon)),
+                                     key=lambda a: a.area)
+            apt.points = list(cutted_polygon.exterior.coords)
+            apt.polygon = Polygon(apt.points)
+            for room in apt.rooms:
+                cutted_polygon = Polygon(room.points).simplify(tolerance=0.01,
+                                                               preserve_topology=True).intersection(
+                    self.polygon.simplify(tolerance=0.01, preserve_topology=True))
+                if isinstance(cutted_polygon, Polygon):
+                    room.points = list(cutted_polygon.exterior.coords)
+                    room.polygon = Polygon(room.points)
+            apt._generate_windows()
+
     def _rectangularity_score(self, poly):
         """
         Рассчитывает прямоугольность полигона.
@@ -200,15 +362,17 @@ class Section(GeometricFigure):
 
     def _reset_cell_assignments(self):
         """Resets the 'assigned' status of all cells in the grid."""
-        for cell in self.cells:
-            cell['assigned'] = False
+        self.grid.reset()
 
     def _allocate_apartments(self, cells):
         """Allocates cells to apartments according to the specified parameters."""
-        free_cells = [cell['polygon'] for cell in self.cells if not cell['assigned']]
         apartments = []
-        remaining_cells = [cell for cell in cells if not cell['assigned']]
-        self.initial_corner_cells = [cell for cell in cells if cell['is_corner'] and cell['polygon'].intersects(self.building_polygon.exterior)]
+        corner_indices = np.flatnonzero(self.grid.is_corner)
+        touches_building = shapely.intersects(self.grid.polygons(corner_indices), self.building_polygon.exterior)
+        self.initial_corner_cells = [self.cells[k] for k in corner_indices[touches_building]]
+        initial_corners = np.zeros(len(self.grid), dtype=bool)
+        initial_corners[corner_indices[touches_building]] = True
+        self.grid.add_free_category('initial_corner', initial_corners)
         self.otladka = self.initial_corner_cells
 
         # Создаем копию apartment_table
@@ -222,8 +386,9 @@ class Section(GeometricFigure):
             if iteration_count > max_iterations:
                 break
             # Выбираем случайный тип квартиры из доступных
+            # Состояние агента: оставшееся число квартир каждого типа, по типам в алфавитном порядке
             sorted_types = sorted(apartment_table_copy.keys())
-            state_tuple = tuple(apartment_table_copy[t]['number'] for t in sorted_types)
+            state_tuple = tuple((t, apartment_table_copy[t]['number']) for t in sorted_types)
             # 2) possible_actions = список apt_types
             possible_actions = list(apartment_table_copy.keys())
 
@@ -237,10 +402,11 @@ class Section(GeometricFigure):
 
 
             # Пытаемся разместить квартиру
-            apartment_cells = self._allocate_apartment_cells(remaining_cells, min_cells, max_cells, apartments)
+            apartment_cells = self._allocate_apartment_cells(min_cells, max_cells, apartments)
             if not apartment_cells:
+                instrumentation.count('section.rejected.no_cells')
                 new_sorted_types = sorted(apartment_table_copy.keys())
-                new_state_tuple = tuple(apartment_table_copy[t]['number'] for t in new_sorted_types)
+                new_state_tuple = tuple((t, apartment_table_copy[t]['number']) for t in new_sorted_types)
                 self.agent.store_transition(
                     reward=-1.0,  # карательный штраф
                     new_state=new_state_tuple,
@@ -249,31 +415,25 @@ class Section(GeometricFigure):
                 continue
 
             # apartment_cells = self.fill_section_perimeter(self.cells, apartment_cells, max_cells, min_cells)
-            remaining_cells = [cell for cell in remaining_cells if not cell['assigned']]
 
-            # Создаем полигон для квартиры
-            apartment_polygon = union_all([cell['polygon'] for cell in apartment_cells])
-            # Проверяем с учетом буфера
-            is_contained = self.polygon.contains(apartment_polygon)
-            if isinstance(apartment_polygon, Polygon):
-                points = list(apartment_polygon.exterior.coords)
-            elif isinstance(apartment_polygon, MultiPolygon):
+            # Несвязную квартиру отбрасываем, не строя ее полигон
+            if count_parts(self.grid, [cell.index for cell in apartment_cells]) > 1:
+                instrumentation.count('section.rejected.disconnected')
                 for cell in apartment_cells:
                     cell['assigned'] = False
-                remaining_cells = [cell for cell in remaining_cells if not cell['assigned']]
                 continue
-            # Создаем объект Apartment
-            apartment = Apartment(points=points, apt_type=apt_type, building_polygon=self.building_polygon)
-            apartment.cells = apartment_cells
+            # Создаем объект Apartment по контуру клеток
+            apartment = self._make_apartment(apt_type, apartment_cells)
             apartments.append(apartment)
             fail = False
             has_outsiders, outsiders = self.validate_apartment_connectivity(apartments)
             if has_outsiders and not self.simple_plan:
+                instrumentation.count('section.rejected.no_free_side')
                 self._update_cell_properties(apartment_cells)
                 for cell in apartment.cells:
                     cell['assigned'] = False
                 new_sorted_types = sorted(apartment_table_copy.keys())
-                new_state_tuple = tuple(apartment_table_copy[t]['number'] for t in new_sorted_types)
+                new_state_tuple = tuple((t, apartment_table_copy[t]['number']) for t in new_sorted_types)
                 self.agent.store_transition(
                     reward=-2.0,  # карательный штраф
                     new_state=new_state_tuple,
@@ -291,7 +451,7 @@ class Section(GeometricFigure):
             if apartment_table_copy[apt_type]['number'] == 0:
                 del apartment_table_copy[apt_type]
             new_sorted_types = sorted(apartment_table_copy.keys())
-            new_state_tuple = tuple(apartment_table_copy[t]['number'] for t in new_sorted_types)
+            new_state_tuple = tuple((t, apartment_table_copy[t]['number']) for t in new_sorted_types)
             self.agent.store_transition(
                 reward=reward,
                 new_state=new_state_tuple,
@@ -374,7 +534,7 @@ class Section(GeometricFigure):
             allocated_area_min = sum(total_area_min.values()) * percent / 100
             allocated_area_max = sum(total_area_max.values()) * percent / 100
             if allocated_area_min < allocated_area_max:
-                allocated_area = random.randint(allocated_area_min, allocated_area_max)
+                allocated_area = self.rng.randint(allocated_area_min, allocated_area_max)
             else:
                 allocated_area = allocated_area_min
             allocated_cell_count = int(allocated_area / cell_area)
@@ -389,116 +549,38 @@ class Section(GeometricFigure):
         max_cells = int(area_range[1] / cell_area)
         return min_cells, max_cells
 
-    def _allocate_apartment_cells(self, remaining_cells, min_cells, max_cells, apartments):
+    def _allocate_apartment_cells(self, min_cells, max_cells, apartments):
         """Allocates cells for a single apartment using BFS to ensure contiguity.
 
         Modification: Adds neighbors to the queue based on the number of their free neighbors.
-        Cells with more free neighbors are prioritized.
+        Cells with fewer free neighbors are prioritized.
         """
-
-        apt_cell_count = max_cells
-
-        # Выбираем случайную стартовую клетку из доступных угловых клеток
-        apartment_cells = []
-        visited_cells = set()
-
+        region = grow_region(self.grid, lambda: self._choose_apartment_start_cell(apartments),
+                             max_cells=max_cells, min_cells=min_cells,
+                             priority=fewest_free_neighbors, stop_when_rectangular=True)
+        return [self.cells[k] for k in region]
+
+    def _choose_apartment_start_cell(self, apartments):
+        """Стартовая клетка квартиры: угол в очереди, затем свободный исходный угол, затем клетка периметра."""
+        grid = self.grid
         if self.queue_corners_to_allocate:
-            temp_apartment_cells = []
             # self.process_corner_cell(self.queue_corners_to_allocate[-1], apartments)
-            # print(len(self.temporary_cells))
-            queue = [self.queue_corners_to_allocate.pop()]
-            while queue and len(temp_apartment_cells) < apt_cell_count:
-                current_cell = queue.pop(0)
-                if current_cell['assigned']:
-                    continue
-                visited_cells.add(current_cell['id'])
-                temp_apartment_cells.append(current_cell)
-
-                current_cell['assigned'] = True
-                remaining_cells = [cell for cell in remaining_cells if not cell['assigned']]
-
-                # Получаем не назначенные соседние клетки
-                neighbors = [neighbor for neighbor in current_cell['neighbors'] if not neighbor['assigned']]
-
-                # Сортируем соседей по убыванию количества их свободных соседей
-                neighbors_sorted = sorted(
-                    neighbors,
-                    key=lambda cell: len([n for n in cell['neighbors'] if not n['assigned']])
-                )
-
-                # Добавляем отсортированных соседей в очередь
-                queue.extend(neighbors_sorted)
-
-                if min_cells <= len(temp_apartment_cells) <= max_cells:
-                    apt_polygon = union_all([cell['polygon'] for cell in temp_apartment_cells])
-                    if self._rectangularity_score(apt_polygon) == 0:
-                        return temp_apartment_cells
-            return temp_apartment_cells
-
-
-        elif len([cell for cell in self.initial_corner_cells if not cell['assigned']]) > 0:
-            queue = [random.choice([cell for cell in self.initial_corner_cells if not cell['assigned']])]
-            while queue and len(apartment_cells) < apt_cell_count:
-                current_cell = queue.pop(0)
-                if current_cell['assigned']:
-                    continue
-                visited_cells.add(current_cell['id'])
-                apartment_cells.append(current_cell)
+            return self.queue_corners_to_allocate.pop().index
 
-                current_cell['assigned'] = True
-                remaining_cells = [cell for cell in remaining_cells if not cell['assigned']]
-
-                # Получаем не назначенные соседние клетки
-                neighbors = [neighbor for neighbor in current_cell['neighbors'] if not neighbor['assigned']]
-
-                # Сортируем соседей по убыванию количества их свободных соседей
-                neighbors_sorted = sorted(
-                    neighbors,
-                    key=lambda cell: len([n for n in cell['neighbors'] if not n['assigned']])
-                )
-                # Добавляем отсортированных соседей в очередь
-                queue.extend(neighbors_sorted)
-
-                if min_cells <= len(apartment_cells) <= max_cells:
-                    apt_polygon = union_all([cell['polygon'] for cell in apartment_cells])
-                    if self._rectangularity_score(apt_polygon) == 0:
-                        return apartment_cells
-            return apartment_cells
+        # Выбираем случайную стартовую клетку из доступных угловых клеток
+        if grid.free_sets['initial_corner']:
+            return grid.free_sets['initial_corner'].sample(self.rng)
 
-        elif len([cell for cell in self.cells if cell['on_perimeter'] and not cell['assigned']]) > 0:
+        if grid.free_sets['perimeter']:
+            free_perimeter = grid.free_sets['perimeter'].to_array()
+            free_perimeter_polygons = grid.polygons(free_perimeter)
             cells_to_choose = []
             for apart in apartments:
-                cells_to_choose.extend([cell for cell in self.cells if cell['on_perimeter'] and not cell['assigned']
-                                        and not cell['polygon'].intersects(apart.polygon)])
+                cells_to_choose.extend(free_perimeter[~shapely.intersects(free_perimeter_polygons, apart.polygon)])
             if cells_to_choose:
-                queue = [random.choice(cells_to_choose)]
-            else:
-                queue = [random.choice([cell for cell in self.cells if cell['on_perimeter'] and not cell['assigned']])]
-            while queue and len(apartment_cells) < apt_cell_count:
-                current_cell = queue.pop(0)
-                if current_cell['assigned']:
-                    continue
-                visited_cells.add(current_cell['id'])
-                apartment_cells.append(current_cell)
-
-                current_cell['assigned'] = True
-                remaining_cells = [cell for cell in remaining_cells if not cell['assigned']]
-
-                # Получаем не назначенные соседние клетки
-                neighbors = [neighbor for neighbor in current_cell['neighbors'] if not neighbor['assigned']]
-
-                # Сортируем соседей по убыванию количества их свободных соседей
-                neighbors_sorted = sorted(
-                    neighbors,
-                    key=lambda cell: len([n for n in cell['neighbors'] if not n['assigned']])
-                )
-                # Добавляем отсортированных соседей в очередь
-                queue.extend(neighbors_sorted)
-                if min_cells <= len(apartment_cells) <= max_cells:
-                    apt_polygon = union_all([cell['polygon'] for cell in apartment_cells])
-                    if self._rectangularity_score(apt_polygon) == 0:
-                        return apartment_cells
-            return apartment_cells
+                return int(self.rng.choice(cells_to_choose))
+            return int(self.rng.choice(free_perimeter))
+        return None
 
     def _update_cell_properties(self, apartment_cells):
         """Updates the properties of cells based on the allocated apartment cells."""
@@ -532,7 +614,7 @@ class Section(GeometricFigure):
         added_cells = []
         # Найдем стороны секции, пересекающиеся с apartment_cells
         intersecting_sides = []
-        apartment_cells_union = union_all([cell['polygon'] for cell in apartment_cells])
+        apartment_cells_union = cells_outline(apartment_cells)
 
         for side in section_sides:
             if apartment_cells_union.intersects(side) and not apartment_cells_union.touches(side):
@@ -550,7 +632,7 @@ class Section(GeometricFigure):
                     added_cells.append(cell)
 
         # Проверяем площадь envelope и добавляем клетки из envelope
-        apartment_cells_union = union_all([cell['polygon'] for cell in apartment_cells])
+        apartment_cells_union = cells_outline(apartment_cells)
         apartment_envelope = apartment_cells_union.envelope
 
         if apartment_envelope.area < max_area:
@@ -589,29 +671,36 @@ class Section(GeometricFigure):
             total += self.apartment_table[apt_type]['number']
         return total
 
+    @instrumentation.timed('section.validate_connectivity')
     def validate_apartment_connectivity(self, apartments: List[Apartment], last_validation=False):
         """
-        Проверяет, пересекается ли каждая квартира с полигоном оставшихся свободных клеток.
-        Если нет пересечения, квартира удаляется из списка, а в removed_apartments_table
-        добавляется одна удаленная квартира соответствующего типа.
+        Проверяет, граничит ли каждая квартира с самой большой связной областью свободных клеток.
+        Области находятся разметкой компонент сетки, а длина контакта считается по общим сторонам клеток,
+        поэтому геометрия строится только при last_validation (для free_sides квартир).
         """
-        # Проверяем тип self.free_polygon
-        free_polygon = union_all([cell['polygon'] for cell in self.cells if not cell['assigned']])
-        # Проверяем тип self.free_polygon
-        if isinstance(free_polygon, MultiPolygon):
-            # Выбираем самый большой полигон из MultiPolygon
-            free_polygon = max(free_polygon.geoms, key=lambda p: p.area)
-        # Генерируем список квартир, не пересекающихся с полигоном
+        grid = self.grid
+        free = ~grid.assigned
+        labels = grid.label_components(free)
+        free_labels = labels[free]
+        largest = np.zeros(len(grid), dtype=bool)
+        if len(free_labels):
+            # Выбираем самую большую свободную область
+            counts = np.bincount(free_labels)
+            largest = labels == np.argmax(counts)
+        free_polygon = None
+        # Генерируем список квартир, не граничащих с областью
         outsiders = []
         for apartment in apartments:
-            # Проверяем пересечение с self.free_polygon
-            inter = apartment.polygon.simplify(tolerance=0.01, preserve_topology=True).exterior.intersection(free_polygon)
-            if inter.is_empty or isinstance(inter, Point):
-                outsiders.append(apartment)
-            elif inter.length < 2:
+            apartment_indices = [cell.index for cell in apartment.cells]
+            contact_length = largest[grid.gather_neighbors(apartment_indices, connectivity=4)].sum() * grid.cell_size
+            if contact_length < 2:
                 outsiders.append(apartment)
-            elif (isinstance(inter, LineString) or isinstance(inter, MultiLineString)) and last_validation:
-                apartment.free_sides.append(inter)
+            elif last_validation:
+                if free_polygon is None:
+                    free_polygon = cells_outline([self.cells[k] for k in np.flatnonzero(largest)])
+                inter = apartment.polygon.simplify(tolerance=0.01, preserve_topology=True).exterior.intersection(free_polygon)
+                if isinstance(inter, LineString) or isinstance(inter, MultiLineString):
+                    apartment.free_sides.append(inter)
         if outsiders:
             return True, outsiders
         return False, outsiders
@@ -623,7 +712,7 @@ class Section(GeometricFigure):
         пытаемся убрать 'ряды' клеток вдоль стороны envelope, чтобы уменьшить площадь.
         Если не удается привести к нужному диапазону, откатываемся к initial_cells.
         """
-        union_poly = union_all([cell['polygon'] for cell in apartment_cells])
+        union_poly = cells_outline(apartment_cells)
         envelope_poly = union_poly.envelope
 
         iteration_count = 0
@@ -651,7 +740,7 @@ class Section(GeometricFigure):
                 apartment_cells.remove(c)
 
             # Пересчитываем envelope
-            union_poly = union_all([cell['polygon'] for cell in apartment_cells])
+            union_poly = cells_outline(apartment_cells)
             envelope_poly = union_poly.envelope
             iteration_count += 1
 
@@ -733,3 +822,24 @@ class Section(GeometricFigure):
                     cell['assigned'] = True
                     self.temporary_cells.append(cell)
 
+
+# Секция процесса-исполнителя параллельных перезапусков (создается один раз на процесс)
+_restart_section = None
+_restart_agent = None
+_restart_cancel_event = None
+
+
+def _init_restart_worker(spec, cancel_event):
+    global _restart_section, _restart_agent, _restart_cancel_event
+    points, apartment_table, building_polygon, to_adjust, cell_size, _restart_agent = spec
+    _restart_section = Section(points=points, apartment_table=apartment_table, building_polygon=building_polygon,
+                               to_adjust=to_adjust)
+    _restart_section.cell_size = cell_size
+    _restart_section.check_and_create_cell_grid(cell_size=1.0)
+    _restart_cancel_event = cancel_event
+
+
+def _restart_batch_worker(iterations, seed, recording=False):
+    """Точка входа процесса-исполнителя: пакет перезапусков секции, созданной _init_restart_worker."""
+    return instrumentation.run_recorded(recording, _restart_section._run_restart_batch,
+                                        iterations, seed, _restart_cancel_event, _restart_agent)
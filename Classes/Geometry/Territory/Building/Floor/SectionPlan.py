@@ -0,0 +1,198 @@
+from Classes.Geometry.Territory.Building.Apartment.Apartment import Apartment
+from Classes.Geometry.Territory.Building.Apartment.Room import Room
+from Classes.Geometry.Territory.Building.Apartment.Window import Window
+from shapely.geometry import Polygon, LineString, MultiLineString
+from typing import Callable, Dict, List, Tuple
+import json
+import random
+import struct
+import numpy as np
+
+# Длина JSON-заголовка в начале упакованного плана
+_HEADER_LENGTH = struct.Struct('<I')
+PLAN_FORMAT_VERSION = 2
+
+Path = List[Tuple[float, float]]
+
+
+class ApartmentPlan:
+    """
+    Готовая квартира без состояния планирования (сетки, клеток, генераторов):
+    тип, площадь, контур, комнаты, окна и свободные стороны.
+
+    Площадь хранится отдельно от контура: планировщик считает ее до обрезки квартиры по секции,
+    и таблицы территории должны получать то же значение, что и без упаковки плана.
+    """
+
+    def __init__(self, apt_type: str,
+                 outline: Path,
+                 rooms: List[Tuple[str, Path]] = None,
+                 windows: List[Path] = None,
+                 free_sides: List[List[Path]] = None,
+                 messages: List[str] = None,
+                 area: float = None):
+        self.type = apt_type
+        self.outline = outline
+        self.area = area if area is not None else Polygon(outline).area
+        self.rooms = rooms if rooms is not None else []  # (тип комнаты, контур)
+        self.windows = windows if windows is not None else []  # линии окон
+        self.free_sides = free_sides if free_sides is not None else []  # части каждой свободной стороны
+        self.messages = messages if messages is not None else []
+
+    @classmethod
+    def from_apartment(cls, apartment: Apartment) -> 'ApartmentPlan':
+        free_sides = []
+        for side in apartment.free_sides:
+            lines = side.geoms if isinstance(side, MultiLineString) else [side]
+            free_sides.append([list(line.coords) for line in lines])
+        return cls(apt_type=apartment.type,
+                   outline=list(apartment.points),
+                   rooms=[(room.type, list(room.points)) for room in apartment.rooms],
+                   windows=[list(window.line.coords) for window in apartment.windows],
+                   free_sides=free_sides,
+                   messages=list(apartment.messages),
+                   area=apartment.area)
+
+    def to_dict(self) -> Dict:
+        """Геометрия квартиры в виде словаря для JSON (точки - пары координат)."""
+        return {'type': self.type,
+                'area': self.area,
+                'outline': self.outline,
+                'rooms': [{'type': room_type, 'points': points} for room_type, points in self.rooms],
+                'windows': self.windows,
+                'free_sides': self.free_sides,
+                'messages': self.messages}
+
+    def to_apartment(self, building_polygon: Polygon) -> Apartment:
+        # Готовая квартира больше не планируется, поэтому генератор не берет состояние из модуля random
+        apartment = Apartment(points=self.outline, apt_type=self.type, building_polygon=building_polygon,
+                              rng=random.Random(0))
+        apartment.rooms = [Room(points=points, room_type=room_type) for room_type, points in self.rooms]
+        apartment.windows = [Window(LineString(line)) for line in self.windows]
+        apartment.free_sides = [LineString(parts[0]) if len(parts) == 1 else MultiLineString(parts)
+                                for parts in self.free_sides]
+        apartment.messages = list(self.messages)
+        apartment.area = self.area
+        return apartment
+
+
+class SectionPlan:
+    """
+    Компактное представление спланированной секции для передачи между процессами, кэша и экспорта.
+
+    to_bytes упаковывает план в JSON-заголовок со структурой квартир, массив длин всех ломаных
+    (int64) и общий буфер их координат (float64, по две на точку).
+    """
+
+    def __init__(self, apartments: List[ApartmentPlan],
+                 apartment_table: Dict = None,
+                 plan_done: bool = False,
+                 messages: List[str] = None):
+        self.apartments = apartments
+        self.apartment_table = apartment_table if apartment_table is not None else {}
+        self.plan_done = plan_done
+        self.messages = messages if messages is not None else []
+
+    @classmethod
+    def from_section(cls, section) -> 'SectionPlan':
+        return cls(apartments=[ApartmentPlan.from_apartment(apartment) for apartment in section.apartments],
+                   apartment_table=section.apartment_table,
+                   plan_done=section.plan_done,
+                   messages=list(section.messages))
+
+    def apply_to(self, section):
+        """Переносит план в секцию: квартиры, признак завершенной планировки и сообщения."""
+        section.apartments = [apartment.to_apartment(section.building_polygon) for apartment in self.apartments]
+        section.plan_done = self.plan_done
+        section.messages = list(self.messages)
+
+    def transformed(self, transform: Callable[[Tuple[float, float]], Tuple[float, float]]) -> 'SectionPlan':
+        """Возвращает копию плана, все точки которой преобразованы функцией transform (точка -> точка)."""
+        def path(points):
+            return [transform(point) for point in points]
+
+        apartments = [ApartmentPlan(apt_type=apartment.type,
+                                    outline=path(apartment.outline),
+                                    rooms=[(room_type, path(points)) for room_type, points in apartment.rooms],
+                                    windows=[path(line) for line in apartment.windows],
+                                    free_sides=[[path(part) for part in parts] for parts in apartment.free_sides],
+                                    messages=list(apartment.messages),
+                                    area=apartment.area)
+                      for apartment in self.apartments]
+        return SectionPlan(apartments, self.apartment_table, self.plan_done, list(self.messages))
+
+    def to_dict(self) -> Dict:
+        """План секции в виде словаря для JSON."""
+        return {'apartment_table': self.apartment_table,
+                'plan_done': self.plan_done,
+                'messages': self.messages,
+                'apartments': [apartment.to_dict() for apartment in self.apartments]}
+
+    def to_bytes(self) -> bytes:
+        paths = []
+        apartments = []
+        for apartment in self.apartments:
+            paths.append(apartment.outline)
+            paths.extend(points for _, points in apartment.rooms)
+            paths.extend(apartment.windows)
+            for parts in apartment.free_sides:
+                paths.extend(parts)
+            apartments.append({'type': apartment.type,
+                               'area': apartment.area,
+                               'rooms': [room_type for room_type, _ in apartment.rooms],
+                               'windows': len(apartment.windows),
+                               'free_sides': [len(parts) for parts in apartment.free_sides],
+                               'messages': apartment.messages})
+        header = {'version': PLAN_FORMAT_VERSION,
+                  'apartment_table': self.apartment_table,
+                  'plan_done': self.plan_done,
+                  'messages': self.messages,
+                  'apartments': apartments,
+                  'paths': len(paths)}
+        return _pack(header, paths)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> 'SectionPlan':
+        header, paths = _unpack(data)
+        if header['version'] != PLAN_FORMAT_VERSION:
+            raise ValueError(f"Неподдерживаемая версия плана: {header['version']}")
+        paths = iter(paths)
+        apartments = []
+        for info in header['apartments']:
+            outline = next(paths)
+            rooms = [(room_type, next(paths)) for room_type in info['rooms']]
+            windows = [next(paths) for _ in range(info['windows'])]
+            free_sides = [[next(paths) for _ in range(parts)] for parts in info['free_sides']]
+            apartments.append(ApartmentPlan(info['type'], outline, rooms, windows, free_sides, info['messages'],
+                                            info['area']))
+        return cls(apartments=apartments,
+                   apartment_table=table_from_json(header['apartment_table']),
+                   plan_done=header['plan_done'],
+                   messages=header['messages'])
+
+
+def table_from_json(apartment_table: Dict) -> Dict:
+    """Возвращает диапазонам площадей таблицы квартир вид кортежей после JSON."""
+    return {apt_type: dict(info, area_range=tuple(info['area_range'])) for apt_type, info in apartment_table.items()}
+
+
+def _pack(header: Dict, paths: List[Path]) -> bytes:
+    lengths = np.array([len(path) for path in paths], dtype=np.int64)
+    coords = np.zeros((0, 2), dtype=np.float64)
+    if paths:
+        coords = np.concatenate([np.asarray(path, dtype=np.float64).reshape(-1, 2) for path in paths])
+    head = json.dumps(header, ensure_ascii=False).encode('utf-8')
+    return _HEADER_LENGTH.pack(len(head)) + head + lengths.tobytes() + coords.tobytes()
+
+
+def _unpack(data: bytes) -> Tuple[Dict, List[Path]]:
+    (head_length,) = _HEADER_LENGTH.unpack_from(data)
+    position = _HEADER_LENGTH.size
+    header = json.loads(data[position:position + head_length].decode('utf-8'))
+    position += head_length
+    lengths = np.frombuffer(data, dtype=np.int64, count=header['paths'], offset=position)
+    position += lengths.nbytes
+    coords = np.frombuffer(data, dtype=np.float64, count=2 * int(lengths.sum()), offset=position).reshape(-1, 2)
+    offsets = np.concatenate(([0], np.cumsum(lengths)))
+    paths = [[tuple(point) for point in coords[offsets[k]:offsets[k + 1]].tolist()] for k in range(len(lengths))]
+    return header, paths
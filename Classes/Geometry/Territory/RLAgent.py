@@ -1,55 +1,69 @@
 import random
-from collections import defaultdict
-import os
+import json
+from typing import Dict, Hashable
+import numpy as np
+
+# Версия формата сохраненной Q-таблицы
+Q_TABLE_FORMAT_VERSION = 1
 
 class RLAgent:
     def __init__(self,
                  alpha=0.1,
                  gamma=0.9,
                  epsilon=0.2,
-                 log_filename="rlagent_log.txt"):
+                 log_filename: str = None,
+                 rng: random.Random = None,
+                 log_buffer_size: int = 1024):
         """
-        Простейший Q-Learning агент + логирование.
+        Простейший Q-Learning агент + необязательное логирование.
+        rng - генератор случайных чисел для eps-greedy (по умолчанию свой поток, засеянный из модуля random).
+        log_filename - файл лога (например, "rlagent_log.txt"); None (по умолчанию) отключает логирование.
+        Записи лога копятся в буфере в виде кортежей и форматируются только при сбросе в файл
+        пачками по log_buffer_size записей; файл открывается лишь на время записи пачки.
         """
         self.alpha = alpha
         self.gamma = gamma
         self.epsilon = epsilon
+        self.rng = rng if rng is not None else random.Random(random.getrandbits(64))
 
-        self.Q = defaultdict(float)
+        # Q-таблица по состояниям: state -> {action: Q(state, action)}, и кэш максимума Q по действиям состояния
+        self.Q: Dict[Hashable, Dict[Hashable, float]] = {}
+        self.max_q: Dict[Hashable, float] = {}
 
         self.last_state = None
         self.last_action = None
 
         # Логирование
         self.log_filename = log_filename
-
-        # --- Создаем/перезаписываем файл лога ---
-        # 'w' означает открыть файл на запись (и стереть содержимое, если он существует).
-        self.log_file = open(self.log_filename, "w", encoding="utf-8")
+        self.log_buffer_size = log_buffer_size
+        self._log_records = []
+        self._log_file_started = False  # первая пачка перезаписывает файл, следующие дописываются
+        self._closed = False
 
         # Шапка лога
-        self.log_file.write("==== New RLAgent session starts ====\n")
+        self._log('SESSION_START')
 
     def act(self, state, possible_actions):
         """
         Возвращаем одно из possible_actions методом eps-greedy
         и логируем выбор.
         """
-        if random.random() < self.epsilon:
-            action = random.choice(possible_actions)
+        if self.rng.random() < self.epsilon:
+            action = self.rng.choice(possible_actions)
         else:
             # поиск действия с макс. Q
             best_a = None
             best_q = float('-inf')
             for a in possible_actions:
-                q_val = self.Q[(state, a)]
+                q_val = self._get_q(state, a)
                 if q_val > best_q:
                     best_q = q_val
                     best_a = a
-            action = best_a if best_a is not None else random.choice(possible_actions)
+            action = best_a if best_a is not None else self.rng.choice(possible_actions)
 
         # Запишем в лог инфо о выборе
-        self.log_file.write(f"[ACT] state={state}, possible={possible_actions}, chosen={action}\n")
+        if self.log_filename is not None:
+            self._log('ACT', state, list(possible_actions), action)
 
         self.last_state = state
         self.last_action = action
@@ -64,26 +78,20 @@ class RLAgent:
 
         s = self.last_state
         a = self.last_action
-        old_q = self.Q[(s, a)]
+        old_q = self._get_q(s, a)
 
         # Считаем max Q(new_state, *)
         if done:
             max_q_next = 0.0
         else:
-            q_candidates = []
-            for (st, act), q_val in self.Q.items():
-                if st == new_state:
-                    q_candidates.append(q_val)
-            max_q_next = max(q_candidates) if q_candidates else 0.0
+            max_q_next = self.max_q.get(new_state, 0.0)
 
         new_q = old_q + self.alpha * (reward + self.gamma * max_q_next - old_q)
-        self.Q[(s, a)] = new_q
+        self._set_q(s, a, new_q)
 
         # Логируем
-        self.log_file.write(
-            f"[STORE] s={s}, a={a}, r={reward}, new_s={new_state}, done={done}, "
-            f"oldQ={old_q:.3f}, newQ={new_q:.3f}\n"
-        )
+        if self.log_filename is not None:
+            self._log('STORE', s, a, reward, new_state, done, old_q, new_q)
 
         if done:
             # сброс
@@ -93,17 +101,135 @@ class RLAgent:
             # продолжаем
             self.last_state = new_state
 
+    def _get_q(self, state, action) -> float:
+        """
+        Возвращает Q(state, action). Отсутствующее значение записывается нулем
+        (чтение создает запись, и она участвует в максимуме по состоянию).
+        """
+        actions = self.Q.get(state)
+        if actions is None:
+            actions = self.Q[state] = {}
+        if action not in actions:
+            actions[action] = 0.0
+            if self.max_q.get(state, float('-inf')) < 0.0:
+                self.max_q[state] = 0.0
+        return actions[action]
+
+    def _set_q(self, state, action, value: float):
+        """Записывает существующее значение Q(state, action), поддерживая кэш максимума за O(число действий)."""
+        actions = self.Q[state]
+        old_value = actions[action]
+        actions[action] = value
+        if value >= self.max_q[state]:
+            self.max_q[state] = value
+        elif old_value == self.max_q[state]:
+            self.max_q[state] = max(actions.values())
+
+    def save(self, filename: str):
+        """
+        Сохраняет Q-таблицу в сжатый .npz без pickle: состояния и действия кодируются строками JSON
+        (кортежи как списки), значения хранятся массивом float64.
+        """
+        states, actions, values = [], [], []
+        for state, state_actions in self.Q.items():
+            encoded_state = _encode(state)
+            for action, value in state_actions.items():
+                states.append(encoded_state)
+                actions.append(_encode(action))
+                values.append(value)
+        np.savez_compressed(filename,
+                            version=np.array(Q_TABLE_FORMAT_VERSION),
+                            states=np.array(states, dtype=str),
+                            actions=np.array(actions, dtype=str),
+                            values=np.array(values, dtype=np.float64))
+
+    def load_q_table(self, filename: str):
+        """Заменяет Q-таблицу сохраненной методом save (теплый старт)."""
+        with np.load(filename, allow_pickle=False) as data:
+            version = int(data['version'])
+            if version != Q_TABLE_FORMAT_VERSION:
+                raise ValueError(f"Неподдерживаемая версия Q-таблицы: {version}")
+            self.Q = {}
+            for state, action, value in zip(data['states'].tolist(), data['actions'].tolist(), data['values'].tolist()):
+                self.Q.setdefault(_decode(state), {})[_decode(action)] = value
+        self.max_q = {state: max(state_actions.values()) for state, state_actions in self.Q.items()}
+
+    @classmethod
+    def load(cls, filename: str, **kwargs) -> 'RLAgent':
+        """Создает агента (параметры как у конструктора) с Q-таблицей из файла."""
+        agent = cls(**kwargs)
+        agent.load_q_table(filename)
+        return agent
+
     def on_episode_end(self, final_reward):
         """
         Когда эпизод (планировка) закончился, делаем финальное обновление, если хотим.
         И логируем.
         """
         self.store_transition(final_reward, new_state=None, done=True)
-        self.log_file.write(f"[EPISODE_END] final_reward={final_reward}\n")
+        self._log('EPISODE_END', final_reward)
 
     def close(self):
         """
-        Закрываем файл лога.
+        Завершает сессию: дописывает в файл оставшиеся записи лога.
         """
-        self.log_file.write("==== RLAgent session ends ====\n")
-        self.log_file.close()
+        if self._closed:
+            return
+        self._closed = True
+        self._log('SESSION_END')
+        self.flush_log()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __getstate__(self):
+        # Несброшенные записи лога остаются в исходном процессе
+        state = self.__dict__.copy()
+        state['_log_records'] = []
+        return state
+
+    def _log(self, kind, *values):
+        if self.log_filename is None:
+            return
+        self._log_records.append((kind, values))
+        if len(self._log_records) >= self.log_buffer_size:
+            self.flush_log()
+
+    def flush_log(self):
+        """Форматирует накопленные записи и дописывает их в файл лога одной операцией."""
+        if self.log_filename is None or not self._log_records:
+            return
+        lines = [_LOG_FORMATS[kind].format(*values) for kind, values in self._log_records]
+        self._log_records = []
+        mode = "a" if self._log_file_started else "w"
+        with open(self.log_filename, mode, encoding="utf-8") as log_file:
+            log_file.write("\n".join(lines) + "\n")
+        self._log_file_started = True
+
+
+def _encode(value) -> str:
+    return json.dumps(value, ensure_ascii=False)
+
+
+def _decode(text: str):
+    return _to_tuples(json.loads(text))
+
+
+def _to_tuples(value):
+    # JSON возвращает списки, а ключи Q-таблицы - кортежи
+    if isinstance(value, list):
+        return tuple(_to_tuples(item) for item in value)
+    return value
+
+
+# Форматы строк лога по видам записей
+_LOG_FORMATS = {
+    'SESSION_START': "==== New RLAgent session starts ====",
+    'ACT': "[ACT] state={}, possible={}, chosen={}",
+    'STORE': "[STORE] s={}, a={}, r={}, new_s={}, done={}, oldQ={:.3f}, newQ={:.3f}",
+    'EPISODE_END': "[EPISODE_END] final_reward={}",
+    'SESSION_END': "==== RLAgent session ends ====",
+}
@@ -1,7 +1,16 @@
 from shapely.geometry import Polygon, MultiPolygon
 from Classes.Geometry.GeometricFigure import GeometricFigure
 from Classes.Geometry.Territory.Building.Building import Building
+from Classes.Geometry.Territory.Building.BuildingPlan import BuildingPlan
+from Classes.Geometry.Territory.Building.Floor.PlanCache import PlanCache
+from Classes.Geometry.Territory.RLAgent import RLAgent
+import Classes.Instrumentation as instrumentation
 from typing import List, Tuple, Dict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import random
+import logging
+
+logger = logging.getLogger(__name__)
 
 
 class Territory(GeometricFigure):
@@ -10,7 +19,9 @@ class Territory(GeometricFigure):
                  sections_coords: List[List[List[Tuple[float, float]]]],
                  num_floors: int,
                  apartment_table: list,
-                 to_adjust = False):
+                 to_adjust = False,
+                 agent: RLAgent = None,
+                 plan_cache: PlanCache = None):
         # Очистка apartment_table от типов квартир с number = 0
         self.apartment_table = apartment_table
         # Автоматически создаём envelope для территории на основе building_points
@@ -33,18 +44,43 @@ class Territory(GeometricFigure):
         self.output_tables = None
         self.to_adjust = to_adjust
         self.adjusted_tables = []
+        self.instrumentation = None  # Данные инструментирования последней генерации (instrument=True)
+        self.agent = agent  # Общий RL-агент всех секций, например загруженный RLAgent.load (None - у каждой секции свой)
+        self.plan_cache = plan_cache  # Постоянный кэш планов секций, общий для всех зданий (None - без кэша)
 
-    def generate_building_plannings(self):
+    def generate_building_plannings(self, workers=1, seed=None, on_building=None, instrument=False):
         """
         Генерирует планировки для всех зданий на территории.
+
+        Args:
+            workers: при workers > 1 здания генерируются одновременно в пуле процессов.
+            seed: если задан, генератор случайных чисел перед зданием i засевается seed + i,
+                поэтому результат одинаков с пулом и без него.
+            on_building: вызывается как on_building(i, building) сразу после готовности здания i
+                (в параллельном режиме в порядке завершения).
+            instrument: если True, время этапов, отказы проверок и число перезапусков секций (в том числе
+                из процессов-исполнителей) собираются в self.instrumentation (Instrumentation.Recorder):
+                report(), to_json(), to_chrome_trace().
+
+        В параллельном режиме каждое здание получает копию self.agent, и ее обучение в него не возвращается.
         """
+        if not instrument:
+            return self._generate_building_plannings(workers, seed, on_building)
+        with instrumentation.recording() as recorder:
+            with recorder.timer('territory.generate'):
+                self._generate_building_plannings(workers, seed, on_building)
+        self.instrumentation = recorder
+
+    def _generate_building_plannings(self, workers, seed, on_building):
         if not self.to_adjust:
             for i, points in enumerate(self.building_points):
-                # Создаем здание с распределенной таблицей
+                # Создаем здание с распределенной таблицей; оно только проверяется, поэтому генератор
+                # не берет состояние из модуля random
                 building = Building(points=points,
                                     sections=self.sections_coords[i],
                                     num_floors=self.num_floors,
-                                    apartment_table=self.apartment_table[i])
+                                    apartment_table=self.apartment_table[i],
+                                    rng=random.Random(0))
                 self.buildings.append(building)
             for i, building in enumerate(self.buildings):
                 if not building.validate_initial_planning():
@@ -57,18 +93,40 @@ class Territory(GeometricFigure):
                             f"увеличьте кол-во этажей или площадь здания №{i+1}.\n"
                             f"Для размещения при заданных параметров не хватает {area_to_reduce} кв.м."
                         )
-                        print(self.messages[0])
+                        logger.warning("%s", self.messages[0])
                     return
         self.buildings.clear()
-        for i, points in enumerate(self.building_points):
-            # Создаем здание с распределенной таблицей
-            building = Building(points=points,
-                                sections=self.sections_coords[i],
-                                num_floors=self.num_floors,
-                                apartment_table=self.apartment_table[i],
-                                to_adjust=self.to_adjust)
-            building.generate_floors()
-            self.buildings.append(building)
+        building_args = [(points, self.sections_coords[i], self.num_floors, self.apartment_table[i], self.to_adjust)
+                         for i, points in enumerate(self.building_points)]
+        if seed is not None:
+            seeds = [seed + i for i in range(len(building_args))]
+        elif workers and workers > 1:
+            seeds = [random.getrandbits(32) for _ in building_args]
+        else:
+            seeds = [None] * len(building_args)
+        if workers and workers > 1:
+            # Здания собираются по индексам, поэтому порядок зданий и сообщений не зависит от порядка завершения
+            buildings = [None] * len(building_args)
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                recording = instrumentation.active() is not None
+                futures = {executor.submit(_generate_building_in_worker, *args, building_seed,
+                                           self.agent, self.plan_cache, recording): i
+                           for i, (args, building_seed) in enumerate(zip(building_args, seeds))}
+                for future in as_completed(futures):
+                    i = futures[future]
+                    data, recorded = future.result()
+                    instrumentation.merge(recorded)
+                    buildings[i] = BuildingPlan.from_bytes(data).to_building(*building_args[i])
+                    if on_building is not None:
+                        on_building(i, buildings[i])
+            self.buildings.extend(buildings)
+        else:
+            for i, (args, building_seed) in enumerate(zip(building_args, seeds)):
+                building = _generate_building(*args, building_seed, self.agent, self.plan_cache)
+                self.buildings.append(building)
+                if on_building is not None:
+                    on_building(i, building)
+        for building in self.buildings:
             self.adjusted_tables.append(building.adjusted_table)
 
         if self.messages:
@@ -104,6 +162,7 @@ class Territory(GeometricFigure):
 
         return errors
 
+    @instrumentation.timed('territory.output_tables')
     def generate_output_table(self):
         """
         Генерирует выходную таблицу с фактическими данными после планирования территории,
@@ -167,3 +226,32 @@ class Territory(GeometricFigure):
                             for message in apartment.messages:
                                 self.messages.append(message)
 
+
+def _generate_building(points, sections, num_floors, apartment_table, to_adjust, seed=None, agent=None,
+                       plan_cache=None):
+    """
+    Создает здание с распределенной таблицей и генерирует его этажи.
+    С заданным seed здание получает свой генератор random.Random(seed), модуль random не засевается.
+    """
+    building = Building(points=points,
+                        sections=sections,
+                        num_floors=num_floors,
+                        apartment_table=apartment_table,
+                        to_adjust=to_adjust,
+                        agent=agent,
+                        plan_cache=plan_cache,
+                        rng=random.Random(seed) if seed is not None else None)
+    building.generate_floors()
+    return building
+
+
+def _generate_building_in_worker(points, sections, num_floors, apartment_table, to_adjust, seed, agent=None,
+                                 plan_cache=None, recording=False):
+    """
+    Генерирует здание в процессе-исполнителе и возвращает его упакованный BuildingPlan
+    и данные инструментирования процесса (None, если recording=False).
+    """
+    def generate():
+        building = _generate_building(points, sections, num_floors, apartment_table, to_adjust, seed, agent, plan_cache)
+        return BuildingPlan.from_building(building).to_bytes()
+    return instrumentation.run_recorded(recording, generate)
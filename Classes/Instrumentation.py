@@ -0,0 +1,170 @@
+from collections import defaultdict
+from contextlib import contextmanager, nullcontext
+from typing import Callable, Dict, Optional
+import functools
+import json
+import os
+import time
+
+_NO_TIMER = nullcontext()
+
+# Recorder of the current run in this process; None while nothing is being recorded
+_active = None
+
+
+class Recorder:
+    """Collects timings, counters and samples of one planning run.
+
+    Timers are nested spans (name, start, duration, process, depth), counters are named
+    integer totals (e.g. rejections at a validation gate) and samples are lists of values
+    (e.g. restarts per section). Worker processes record into their own recorder and the
+    parent merges its state, see run_recorded.
+
+    Args:
+        listener: optional callable listener(name, duration) invoked whenever a timer ends,
+            e.g. to report progress while the run is still going.
+    """
+
+    def __init__(self, listener: Optional[Callable[[str, float], None]] = None):
+        self.spans = []  # (name, start, duration, pid, depth), times in seconds of time.perf_counter
+        self.counters: Dict[str, int] = defaultdict(int)
+        self.samples: Dict[str, list] = defaultdict(list)
+        self.listener = listener
+        self._depth = 0
+
+    @contextmanager
+    def timer(self, name: str):
+        start = time.perf_counter()
+        self._depth += 1
+        try:
+            yield
+        finally:
+            self._depth -= 1
+            duration = time.perf_counter() - start
+            self.spans.append((name, start, duration, os.getpid(), self._depth))
+            if self.listener is not None:
+                self.listener(name, duration)
+
+    def count(self, name: str, value: int = 1):
+        self.counters[name] += value
+
+    def sample(self, name: str, value):
+        self.samples[name].append(value)
+
+    def state(self) -> Dict:
+        """Returns the recorded data as plain, picklable containers."""
+        return {'spans': list(self.spans), 'counters': dict(self.counters), 'samples': dict(self.samples)}
+
+    def merge(self, state: Optional[Dict]):
+        """Adds the data recorded by another recorder (e.g. in a worker process)."""
+        if not state:
+            return
+        self.spans.extend(tuple(span) for span in state['spans'])
+        for name, value in state['counters'].items():
+            self.counters[name] += value
+        for name, values in state['samples'].items():
+            self.samples[name].extend(values)
+
+    def report(self) -> Dict:
+        """Summarizes the run: totals per timer, counters and statistics of the samples.
+
+        Timer totals of nested or concurrent spans overlap, so they do not add up to the wall time.
+        """
+        timers = {}
+        for name, _, duration, _, _ in self.spans:
+            stats = timers.setdefault(name, {'count': 0, 'total': 0.0, 'max': 0.0})
+            stats['count'] += 1
+            stats['total'] += duration
+            stats['max'] = max(stats['max'], duration)
+        for stats in timers.values():
+            stats['mean'] = stats['total'] / stats['count']
+        samples = {name: {'count': len(values), 'min': min(values), 'max': max(values),
+                          'mean': sum(values) / len(values), 'values': list(values)}
+                   for name, values in self.samples.items() if values}
+        return {'timers': dict(sorted(timers.items(), key=lambda item: -item[1]['total'])),
+                'counters': dict(sorted(self.counters.items())),
+                'samples': samples}
+
+    def to_json(self, filename: str):
+        with open(filename, 'w', encoding='utf-8') as file:
+            json.dump(self.report(), file, ensure_ascii=False, indent=2)
+
+    def chrome_trace(self) -> Dict:
+        """Returns the spans in the Chrome trace event format (chrome://tracing, Perfetto)."""
+        origin = min((start for _, start, _, _, _ in self.spans), default=0.0)
+        events = [{'name': name, 'cat': 'planning', 'ph': 'X', 'pid': pid, 'tid': pid,
+                   'ts': (start - origin) * 1e6, 'dur': duration * 1e6}
+                  for name, start, duration, pid, _ in self.spans]
+        end = max((event['ts'] + event['dur'] for event in events), default=0.0)
+        events.extend({'name': name, 'cat': 'counters', 'ph': 'C', 'pid': os.getpid(), 'ts': end,
+                       'args': {'value': value}}
+                      for name, value in sorted(self.counters.items()))
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+    def to_chrome_trace(self, filename: str):
+        with open(filename, 'w', encoding='utf-8') as file:
+            json.dump(self.chrome_trace(), file)
+
+
+@contextmanager
+def recording(recorder: Recorder = None):
+    """Makes a recorder (a new one by default) the current one for the duration of the block."""
+    global _active
+    previous = _active
+    _active = recorder if recorder is not None else Recorder()
+    try:
+        yield _active
+    finally:
+        _active = previous
+
+
+def active() -> Optional[Recorder]:
+    """Returns the current recorder or None if nothing is being recorded."""
+    return _active
+
+
+def timer(name: str):
+    """Times a block into the current recorder; does nothing while nothing is being recorded."""
+    return _active.timer(name) if _active is not None else _NO_TIMER
+
+
+def count(name: str, value: int = 1):
+    if _active is not None:
+        _active.counters[name] += value
+
+
+def sample(name: str, value):
+    if _active is not None:
+        _active.samples[name].append(value)
+
+
+def run_recorded(enabled: bool, func: Callable, *args, **kwargs):
+    """Runs func and returns (result, recorder state or None); used by process-pool workers.
+
+    Args:
+        enabled: whether the parent process is recording; if not, nothing is recorded.
+    """
+    if not enabled:
+        return func(*args, **kwargs), None
+    with recording() as recorder:
+        result = func(*args, **kwargs)
+    return result, recorder.state()
+
+
+def merge(state: Optional[Dict]):
+    """Merges a worker's recorder state into the current recorder, if any."""
+    if _active is not None:
+        _active.merge(state)
+
+
+def timed(name: str):
+    """Decorator that times every call of a function under the given name."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if _active is None:
+                return func(*args, **kwargs)
+            with _active.timer(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
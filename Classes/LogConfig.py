@@ -0,0 +1,24 @@
+from typing import Iterable, Optional
+import logging
+import os
+
+# Переменная окружения со списком модулей (имен логгеров) через запятую, для которых включается DEBUG
+DEBUG_MODULES_ENV = 'FLATBUILDER_DEBUG'
+LOG_FORMAT = '%(asctime)s %(levelname)s [%(processName)s] %(name)s: %(message)s'
+
+
+def configure_logging(level: int = logging.WARNING, debug_modules: Optional[Iterable[str]] = None):
+    """
+    Настраивает логирование приложения: сообщения уровня level и выше (по умолчанию только
+    предупреждения и ошибки) выводятся в stderr.
+
+    Модули планировщика пишут в логгеры по своим именам (logging.getLogger(__name__)), поэтому DEBUG
+    можно включить для отдельного модуля или пакета, например 'Classes.Geometry.Territory.Building.Floor.Section'
+    или 'GUI'. Список берется из debug_modules, а если он не задан - из переменной окружения FLATBUILDER_DEBUG.
+    """
+    logging.basicConfig(level=level, format=LOG_FORMAT)
+    if debug_modules is None:
+        debug_modules = [name.strip() for name in os.environ.get(DEBUG_MODULES_ENV, '').split(',')]
+    for name in debug_modules:
+        if name:
+            logging.getLogger(name).setLevel(logging.DEBUG)
@@ -6,6 +6,9 @@ from PyQt5.QtWidgets import QGraphicsScene, QMainWindow, QPushButton, QWidget, Q
     QCheckBox, QGraphicsPolygonItem, QGraphicsRectItem, QGraphicsTextItem
 from GUI.Painter.Painter import Painter
 from GUI.Painter.RotationHandle import RotationHandle
+import logging
+
+logger = logging.getLogger(__name__)
 
 apt_colors = {
     'studio': '#fa6b6b',
@@ -178,6 +181,12 @@ class MainWindow(QMainWindow):
         self.generate_button.setFont(button_font)
         self.generate_button.clicked.connect(self.generate_clicked)
 
+        self.cancel_button = QPushButton("Отменить генерацию")
+        self.cancel_button.setFixedHeight(50)
+        self.cancel_button.setFont(button_font)
+        self.cancel_button.setVisible(False)
+        self.cancel_button.clicked.connect(self.cancel_clicked)
+
         self.save_button = QPushButton("Сохранить как PDF")
         self.save_button.setFixedHeight(50)
         self.save_button.setFont(button_font)
@@ -197,6 +206,7 @@ class MainWindow(QMainWindow):
         self.error_text.setFixedHeight(60)
 
         self.right_layout.addWidget(self.generate_button)
+        self.right_layout.addWidget(self.cancel_button)
         self.right_layout.addWidget(self.error_text)
 
         self.output_label = QLabel("Результирующая таблица")
@@ -284,6 +294,8 @@ class MainWindow(QMainWindow):
         self.right_layout.addLayout(bottom_buttons, Qt.AlignTop)
 
         self.graphics_view.apartmentsGenerated.connect(self.after_generated)
+        self.graphics_view.generationProgress.connect(self.show_progress)
+        self.graphics_view.generationCancelled.connect(self.after_cancelled)
 
         help_text = QLabel(
             "ПКМ - Перемещение, Delete - Удалить выбранную точку. Для добавления деформационного шва выберите две точки")
@@ -459,7 +471,32 @@ class MainWindow(QMainWindow):
     def toggle_floors(self):
         self.graphics_view.show_floor(self.combo.currentIndex(), self.checkbox.isChecked())
 
+    def show_progress(self, progress):
+        if progress['buildings_done'] == progress['buildings']:
+            self.error_text.setText("Генерация...\nПодготовка результата")
+        else:
+            self.error_text.setText(f"Генерация... здание {progress['buildings_done'] + 1} из {progress['buildings']}\n"
+                                    f"Готово этажей: {progress['floors']}, секций: {progress['sections']} "
+                                    f"({progress['elapsed']:.0f} с)")
+
+    def cancel_clicked(self):
+        self.graphics_view.cancelGeneration()
+
+    def after_cancelled(self):
+        self.cancel_button.setVisible(False)
+        self.generate_button.setDisabled(False)
+        self.graphics_view.interactive = True
+        self.error_text.setText("Генерация отменена")
+        if self.done:
+            # Возвращаем предыдущий вариант планировки
+            self.clear_button.setDisabled(False)
+            self.save_button.setDisabled(False)
+            self.elevator_button.setDisabled(False)
+            self.stairs_button.setDisabled(False)
+            self.graphics_view.show_floor(self.combo.currentIndex(), self.checkbox.isChecked())
+
     def after_generated(self):
+        self.cancel_button.setVisible(False)
         if self.graphics_view.generator_error != "":
             self.generate_button.setDisabled(False)
             self.graphics_view.interactive = True
@@ -598,6 +635,7 @@ class MainWindow(QMainWindow):
                         for window in self.graphics_view.window_items:
                             self.scene.removeItem(window)
                     self.error_text.setText("Генерация...")
+                    self.cancel_button.setVisible(True)
                     self.graphics_view.fillApartments(apartment_tables, int(self.floor_edit.text()),
                                                       self.auto_check.isChecked())
 
@@ -684,7 +722,7 @@ class MainWindow(QMainWindow):
                 painter.restore()
 
             painter.end()
-            print(f"Saved as {file_path}")
+            logger.info("Saved as %s", file_path)
             self.generate_button.setDisabled(False)
             self.clear_button.setDisabled(False)
             self.save_button.setDisabled(False)
@@ -743,7 +781,7 @@ class MainWindow(QMainWindow):
             if size:
                 self.graphics_view.set_preview_rectangle(*size, mode)
             else:
-                print("Неверный размер")
+                logger.warning("Неверный размер")
 
 
 class RectangleDialog(QDialog):
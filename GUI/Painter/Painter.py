@@ -3,7 +3,6 @@ from PyQt5.QtWidgets import QGraphicsView, QGraphicsPolygonItem, QGraphicsEllips
     QWidget, QHBoxLayout, QLabel
 from PyQt5.QtCore import Qt, QPointF, pyqtSignal, QPoint, QLineF
 import math
-from threading import Thread
 
 from shapely import Polygon, LineString
 from shapely.ops import split
@@ -15,6 +14,9 @@ from GUI.Painter.MovablePoint import MovablePoint
 from GUI.Painter.Outline import Outline
 from GUI.Painter.StairsRect import StairsRect
 from GUI.Threads.BuildingGenerator import BuildingGenerator
+import logging
+
+logger = logging.getLogger(__name__)
 
 apt_colors = {
     'studio': '#fa6b6b',
@@ -122,6 +124,8 @@ class RoomLegendWidget(QWidget):
 
 class Painter(QGraphicsView):
     apartmentsGenerated = pyqtSignal()
+    generationProgress = pyqtSignal(object)
+    generationCancelled = pyqtSignal()
     point_added = pyqtSignal()
     building_added = pyqtSignal()
     section_added = pyqtSignal()
@@ -132,6 +136,11 @@ class Painter(QGraphicsView):
         self.setRenderHints(QPainter.Antialiasing | QPainter.SmoothPixmapTransform)
         self.setScene(self.scene)
         self.setSceneRect(-1000, -1000, 2000, 2000)
+        # Генерация идет в отдельном процессе, с прогрессом и отменой
+        self.generator = BuildingGenerator(self)
+        self.generator.finished.connect(self.onApartmentsGenerated)
+        self.generator.progress.connect(self.generationProgress.emit)
+        self.generator.cancelled.connect(self.generationCancelled.emit)
         self.preview_rect = None
         self.rect_width = 0
         self.rect_height = 0
@@ -498,16 +507,16 @@ class Painter(QGraphicsView):
                 sections.append([building])
         self.sections = sections
         for section in sections:
-            print("Секция: ", section)
+            logger.debug("Секция: %s", section)
         territory = Territory(building_points=buildings, sections_coords=sections,
                               num_floors=num_floors, apartment_table=apartment_table,
                               to_adjust=adjust_apts)
-        worker = BuildingGenerator(territory)
-        worker_thread = Thread(target=worker.run)
-        worker.finished.connect(self.onApartmentsGenerated)
-        worker_thread.start()
+        self.generator.start(territory)
         self.points = []
 
+    def cancelGeneration(self):
+        self.generator.cancel()
+
     def onApartmentsGenerated(self, error, buildings, floors, messages, output_tables):
         self.generator_error = error
         self.output_tables = output_tables
@@ -560,19 +569,17 @@ class Painter(QGraphicsView):
             building = self.floors[i]
             floor = building[floor_num]
             for section in floor.sections:
-                print(section.polygon)
+                logger.debug("Секция: %s", section.polygon)
                 for apt in section.apartments:
                     poly = apt.polygon
                     x, y = poly.exterior.xy
-                    print("точки выхода", [(x[i], y[i]) for i in range(len(x))])
                     poly_points = [QPointF(x[i], y[i]) for i in range(len(x))]
-                    print("квартира", poly_points)
                     polygon = QPolygonF(poly_points)
                     area = calculate_polygon_area(polygon)
                     filled_shape = QGraphicsPolygonItem(polygon)
-                    points = [(point.x(), point.y()) for point in filled_shape.polygon()]
-                    print("точки qgraphicsitem", points)
-                    print()
+                    if logger.isEnabledFor(logging.DEBUG):
+                        logger.debug("Квартира: точки выхода %s, точки QGraphicsItem %s",
+                                     list(zip(x, y)), [(point.x(), point.y()) for point in filled_shape.polygon()])
 
                     filled_shape.setToolTip(f"Площадь: {area}м^2")
                     filled_shape.setPen(QPen(Qt.black, 0.3))
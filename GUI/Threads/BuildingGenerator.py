@@ -1,23 +1,94 @@
-from PyQt5.QtCore import QObject, pyqtSignal
+from PyQt5.QtCore import QObject, QTimer, pyqtSignal
+import multiprocessing
+import queue
+
+from GUI.Threads.GenerationProcess import generate_territory, apply_result
 
 
 class BuildingGenerator(QObject):
-    finished = pyqtSignal(object, object, object, object, object)
-
-    def __init__(self, territory):
-        super().__init__()
-        self.floors = []
-        self.territory = territory
-        self.error = ""
-
-    def run(self):
-        try:
-            self.territory.generate_building_plannings()
-            for building in self.territory.buildings:
-                floors_per_building = []
-                for floor in building.floors:
-                    floors_per_building.append(floor)
-                self.floors.append(floors_per_building)
-        except Exception:
-            self.error = f"Ошибка генерации"
-        self.finished.emit(self.error, self.territory.buildings, self.floors, self.territory.messages, self.territory.output_tables)
\ No newline at end of file
+    """
+    Генерирует планировки территории в отдельном процессе, чтобы расчет не занимал GIL
+    и не останавливал цикл событий Qt.
+
+    Процесс сообщает о готовности секций, этажей и зданий (сигнал progress), а готовый результат
+    передает в упакованном виде (BuildingPlan); здания восстанавливаются в исходной территории
+    и отдаются сигналом finished. cancel прерывает генерацию, повторный start - перезапускает ее.
+    """
+    finished = pyqtSignal(object, object, object, object, object)  # ошибка, здания, этажи, сообщения, таблицы
+    progress = pyqtSignal(object)  # словарь прогресса, см. GenerationProcess.generate_territory
+    cancelled = pyqtSignal()
+
+    POLL_INTERVAL_MS = 50
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        # spawn: дочерний процесс не наследует потоки и состояние Qt
+        self._context = multiprocessing.get_context('spawn')
+        self._process = None
+        self._events = None
+        self._territory = None
+        self._timer = QTimer(self)
+        self._timer.setInterval(self.POLL_INTERVAL_MS)
+        self._timer.timeout.connect(self._poll)
+
+    def is_running(self):
+        return self._process is not None
+
+    def start(self, territory):
+        """Запускает генерацию территории; идущая генерация при этом прерывается."""
+        self._stop()
+        self._territory = territory
+        self._events = self._context.Queue()
+        self._process = self._context.Process(target=generate_territory, args=(territory, self._events),
+                                              daemon=True)
+        self._process.start()
+        self._timer.start()
+
+    def cancel(self):
+        """Прерывает идущую генерацию и сообщает об этом сигналом cancelled."""
+        if self._process is None:
+            return
+        self._stop()
+        self.cancelled.emit()
+
+    def _stop(self):
+        self._timer.stop()
+        if self._process is not None:
+            if self._process.is_alive():
+                self._process.terminate()
+            self._process.join()
+            self._process = None
+        if self._events is not None:
+            self._events.close()
+            self._events = None
+
+    def _poll(self):
+        # Состояние процесса проверяется до чтения очереди: завершившийся процесс уже передал все события
+        alive = self._process.is_alive()
+        while True:
+            try:
+                kind, payload = self._events.get_nowait()
+            except queue.Empty:
+                break
+            if kind == 'progress':
+                self.progress.emit(payload)
+            else:
+                self._finish(kind, payload)
+                return
+        if not alive:
+            # Процесс завершился без результата, например из-за нехватки памяти
+            self._finish('error', "Ошибка генерации")
+
+    def _finish(self, kind, payload):
+        self._stop()
+        territory = self._territory
+        self._territory = None
+        error = ""
+        floors = []
+        if kind == 'done':
+            apply_result(territory, payload)
+            for building in territory.buildings:
+                floors.append(list(building.floors))
+        else:
+            error = payload
+        self.finished.emit(error, territory.buildings, floors, territory.messages, territory.output_tables)
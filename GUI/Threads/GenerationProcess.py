@@ -0,0 +1,66 @@
+from Classes.Geometry.Territory.Building.BuildingPlan import BuildingPlan
+import Classes.Instrumentation as instrumentation
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+# Замеры инструментирования, по окончании которых процесс генерации сообщает о прогрессе
+PROGRESS_STAGES = {'section.plan': 'sections', 'floor.plan': 'floors'}
+
+
+def generate_territory(territory, events):
+    """
+    Точка входа процесса генерации (без Qt): планирует территорию и кладет в очередь events
+    события ('progress', прогресс) по мере готовности секций, этажей и зданий, а в конце
+    ('done', упакованный результат - см. pack_result) или ('error', текст ошибки).
+
+    Прогресс - словарь: stage ('sections', 'floors' или 'buildings'), buildings_done и buildings
+    (готово и всего зданий), floors и sections (готово в текущем здании), elapsed (секунды с начала).
+    """
+    start = time.perf_counter()
+    progress = {'buildings_done': 0, 'buildings': len(territory.building_points), 'floors': 0, 'sections': 0}
+
+    def send(stage):
+        events.put(('progress', dict(progress, stage=stage, elapsed=time.perf_counter() - start)))
+
+    def on_span(name, duration):
+        stage = PROGRESS_STAGES.get(name)
+        if stage is not None:
+            progress[stage] += 1
+            send(stage)
+
+    def on_building(i, building):
+        progress.update(buildings_done=progress['buildings_done'] + 1, floors=0, sections=0)
+        send('buildings')
+
+    try:
+        with instrumentation.recording(instrumentation.Recorder(listener=on_span)):
+            territory.generate_building_plannings(on_building=on_building)
+        events.put(('done', pack_result(territory)))
+    except Exception:
+        logger.exception("Ошибка генерации")
+        events.put(('error', "Ошибка генерации"))
+
+
+def pack_result(territory):
+    """Результат генерации для передачи между процессами: здания в виде упакованных BuildingPlan."""
+    return {'buildings': [BuildingPlan.from_building(building).to_bytes() for building in territory.buildings],
+            'messages': territory.messages,
+            'total_error': territory.total_error,
+            'output_tables': territory.output_tables,
+            'adjusted_tables': territory.adjusted_tables}
+
+
+def apply_result(territory, result):
+    """Переносит результат pack_result в территорию, из которой был запущен процесс генерации."""
+    territory.buildings = [BuildingPlan.from_bytes(data).to_building(territory.building_points[i],
+                                                                     territory.sections_coords[i],
+                                                                     territory.num_floors,
+                                                                     territory.apartment_table[i],
+                                                                     territory.to_adjust)
+                           for i, data in enumerate(result['buildings'])]
+    territory.messages = result['messages']
+    territory.total_error = result['total_error']
+    territory.output_tables = result['output_tables']
+    territory.adjusted_tables = result['adjusted_tables']
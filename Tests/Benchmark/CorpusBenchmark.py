@@ -0,0 +1,234 @@
+"""
+Сквозной бенчмарк планировщика на корпусе сценариев (scenarios.json): время и качество планировок.
+
+Запуск из корня репозитория:
+    python -m Tests.Benchmark.CorpusBenchmark                        # сравнить с сохраненной базой
+    python -m Tests.Benchmark.CorpusBenchmark --save-baseline        # записать новую базу
+    python -m Tests.Benchmark.CorpusBenchmark --scenarios l_shape u_shape --seeds 1 2 --output runs.json
+
+Каждый сценарий планируется для каждого seed в отдельном свежем процессе. Для каждого запуска записываются:
+- время генерации территории;
+- пиковый размер процесса (RSS, где доступен модуль resource) и его прирост за генерацию;
+- доля перезапусков секций, прошедших _validate_apartment_number (и отказы по проверкам);
+- Territory.total_error по типам квартир и сообщения территории;
+- перезапуск, на котором в каждой секции найден лучший план.
+
+Сравнение с базой отмечает сценарии, у которых медиана времени выросла больше чем в (1 + time_tolerance) раз,
+средняя ошибка выросла больше чем на error_tolerance процентных пунктов или доля успешных перезапусков
+упала больше чем на rate_tolerance. Время сравнимо только на той же машине: если база записана в другом
+окружении (python, machine, processor), замедление печатается, но регрессией не считается.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import statistics
+import sys
+import time
+
+from Classes.Geometry.Territory.Territory import Territory
+from Classes.Geometry.Territory.Building.Floor.SectionPlan import table_from_json
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+BENCHMARK_VERSION = 1
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_CORPUS = os.path.join(BENCHMARK_DIR, 'scenarios.json')
+DEFAULT_BASELINE = os.path.join(BENCHMARK_DIR, 'corpus_baseline.json')
+DEFAULT_SEEDS = (1, 2, 3)
+
+
+def load_corpus(filename):
+    with open(filename, encoding='utf-8') as file:
+        return json.load(file)
+
+
+def _peak_rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux возвращает килобайты, macOS - байты
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def run_scenario(scenario, seed):
+    """Планирует сценарий с заданным seed и возвращает метрики запуска."""
+    tables = [table_from_json(table) for table in scenario['apartment_tables']]
+    buildings = [[tuple(point) for point in building] for building in scenario['buildings']]
+    sections = [[[tuple(point) for point in section] for section in building] for building in scenario['sections']]
+    rss_before = _peak_rss_mb()
+    start = time.perf_counter()
+    territory = Territory(buildings, sections, scenario['num_floors'], tables, to_adjust=scenario['to_adjust'])
+    messages = []
+    try:
+        territory.generate_building_plannings(seed=seed, instrument=True)
+    except Exception as error:
+        # Сбой генерации - неудачный запуск сценария, а не остановка всего бенчмарка
+        messages.append(f"{type(error).__name__}: {error}")
+    wall_time = time.perf_counter() - start
+    rss_after = _peak_rss_mb()
+
+    report = territory.instrumentation.report() if territory.instrumentation is not None else {}
+    counters = report.get('counters', {})
+    samples = report.get('samples', {})
+    restarts = samples.get('section.restarts', {}).get('values', [])
+    total_restarts = sum(restarts)
+    rejected_number = counters.get('section.rejected.no_apartments', 0) + counters.get(
+        'section.rejected.apartment_number', 0)
+    errors = territory_errors(territory.total_error) if not messages else []
+    return {'scenario': scenario['name'],
+            'seed': seed,
+            'wall_time': wall_time,
+            'peak_rss_mb': rss_after,
+            'rss_growth_mb': rss_after - rss_before if rss_after is not None else None,
+            'restarts': restarts,
+            'number_success_rate': (total_restarts - rejected_number) / total_restarts if total_restarts else None,
+            'rejections': {name: value for name, value in counters.items() if '.rejected.' in name},
+            'best_restart': samples.get('section.best_restart', {}).get('values', []),
+            'total_error': errors,
+            'mean_error': statistics.mean(errors) if errors else None,
+            'messages': [str(message) for message in territory.messages] + messages}
+
+
+def territory_errors(total_error):
+    """Ошибки по типам квартир; при пустом плане calculate_territory_error возвращает inf вместо списка."""
+    if not isinstance(total_error, list):
+        return []
+    return [float(error) for error in total_error]
+
+
+def _run_job(job):
+    return run_scenario(*job)
+
+
+def summarize(runs):
+    """Сводка по сценариям: распределения времени, ошибки, доли успешных перезапусков и лучшего перезапуска."""
+    summary = {}
+    for name in dict.fromkeys(run['scenario'] for run in runs):
+        scenario_runs = [run for run in runs if run['scenario'] == name]
+        times = [run['wall_time'] for run in scenario_runs]
+        errors = [run['mean_error'] for run in scenario_runs if run['mean_error'] is not None]
+        rates = [run['number_success_rate'] for run in scenario_runs if run['number_success_rate'] is not None]
+        best = [value for run in scenario_runs for value in run['best_restart']]
+        peaks = [run['peak_rss_mb'] for run in scenario_runs if run['peak_rss_mb'] is not None]
+        summary[name] = {'runs': len(scenario_runs),
+                         'failed_runs': sum(1 for run in scenario_runs if run['mean_error'] is None),
+                         'wall_time': _distribution(times),
+                         'mean_error': _distribution(errors),
+                         'number_success_rate': statistics.mean(rates) if rates else None,
+                         'best_restart': _distribution(best),
+                         'peak_rss_mb': max(peaks) if peaks else None}
+    return summary
+
+
+def _distribution(values):
+    if not values:
+        return None
+    return {'min': min(values), 'median': statistics.median(values), 'mean': statistics.mean(values),
+            'max': max(values)}
+
+
+def environment():
+    """Описание машины, на которой сравнимо время запусков."""
+    return {'python': platform.python_version(),
+            'machine': platform.machine(),
+            'processor': platform.processor()}
+
+
+def compare(summary, baseline, time_tolerance, error_tolerance, rate_tolerance):
+    """Печатает сравнение с базой и возвращает список найденных регрессий."""
+    regressions = []
+    same_environment = baseline.get('environment') == environment()
+    if not same_environment:
+        print("База записана в другом окружении: время сравнивается только для сведения")
+    for name, current in summary.items():
+        base = baseline['summary'].get(name)
+        if base is None:
+            print(f"{name:28s} нет в базе")
+            continue
+        notes = []
+        if current['wall_time'] and base['wall_time']:
+            ratio = current['wall_time']['median'] / base['wall_time']['median']
+            notes.append(f"время {ratio:5.2f}x")
+            if ratio > 1 + time_tolerance and same_environment:
+                regressions.append(f"{name}: время")
+        if current['mean_error'] and base['mean_error']:
+            delta = current['mean_error']['mean'] - base['mean_error']['mean']
+            notes.append(f"ошибка {delta:+6.2f}")
+            if delta > error_tolerance:
+                regressions.append(f"{name}: ошибка")
+        if current['number_success_rate'] is not None and base['number_success_rate'] is not None:
+            delta = current['number_success_rate'] - base['number_success_rate']
+            notes.append(f"успешные перезапуски {delta:+5.2f}")
+            if delta < -rate_tolerance:
+                regressions.append(f"{name}: успешные перезапуски")
+        if current['failed_runs'] > base['failed_runs']:
+            notes.append(f"неудачных запусков {current['failed_runs']} (было {base['failed_runs']})")
+            regressions.append(f"{name}: неудачные запуски")
+        print(f"{name:28s} " + ', '.join(notes))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Сквозной бенчмарк планировщика на корпусе сценариев')
+    parser.add_argument('--corpus', default=DEFAULT_CORPUS)
+    parser.add_argument('--scenarios', nargs='+', help='имена сценариев (по умолчанию все)')
+    parser.add_argument('--seeds', type=int, nargs='+', default=list(DEFAULT_SEEDS))
+    parser.add_argument('--workers', type=int, default=1,
+                        help='одновременных запусков (больше 1 искажает время и память)')
+    parser.add_argument('--output', help='файл JSON для запусков и сводки')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+    parser.add_argument('--save-baseline', action='store_true', help='записать результаты как новую базу')
+    parser.add_argument('--time-tolerance', type=float, default=0.25)
+    parser.add_argument('--error-tolerance', type=float, default=1.0)
+    parser.add_argument('--rate-tolerance', type=float, default=0.1)
+    args = parser.parse_args(argv)
+
+    corpus = load_corpus(args.corpus)
+    scenarios = [scenario for scenario in corpus['scenarios']
+                 if not args.scenarios or scenario['name'] in args.scenarios]
+    jobs = [(scenario, seed) for scenario in scenarios for seed in args.seeds]
+    # Каждый запуск в свежем процессе: пиковый RSS относится к одному запуску, а кэши не переходят между ними
+    with multiprocessing.Pool(processes=args.workers, maxtasksperchild=1) as pool:
+        runs = []
+        for run in pool.imap(_run_job, jobs):
+            runs.append(run)
+            error = f"{run['mean_error']:.2f}" if run['mean_error'] is not None else '-'
+            print(f"{run['scenario']:28s} seed {run['seed']:3d}  {run['wall_time']:7.2f} с  ошибка {error:>6s}  "
+                  f"перезапуски {run['restarts']}")
+
+    result = {'version': BENCHMARK_VERSION,
+              'corpus_version': corpus['version'],
+              'seeds': args.seeds,
+              'environment': environment(),
+              'summary': summarize(runs),
+              'runs': runs}
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as file:
+            json.dump(result, file, ensure_ascii=False, indent=2)
+    if args.save_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as file:
+            json.dump(result, file, ensure_ascii=False, indent=2)
+        return 0
+    if not os.path.exists(args.baseline):
+        print(f"База {args.baseline} не найдена; запустите с --save-baseline")
+        return 0
+    with open(args.baseline, encoding='utf-8') as file:
+        baseline = json.load(file)
+    if baseline.get('version') != BENCHMARK_VERSION or baseline.get('corpus_version') != corpus['version']:
+        print("База записана другой версией бенчмарка или корпуса; перезапишите ее с --save-baseline")
+        return 0
+    regressions = compare(result['summary'], baseline, args.time_tolerance, args.error_tolerance,
+                          args.rate_tolerance)
+    if regressions:
+        print("Регрессии: " + '; '.join(regressions))
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
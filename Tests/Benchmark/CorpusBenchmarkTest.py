@@ -0,0 +1,41 @@
+"""
+Проверка того, что неудачные запуски сценариев учитываются бенчмарком корпуса как failed_runs,
+а не прерывают его.
+
+Запуск из корня репозитория:
+    python -m Tests.Benchmark.CorpusBenchmarkTest
+"""
+from Tests.Benchmark.CorpusBenchmark import run_scenario, summarize, territory_errors
+
+AREA_RANGES = {'studio': [25, 35], '1 room': [43, 60], '2 room': [65, 82], '3 room': [85, 105], '4 room': [110, 145]}
+SMALL = [[0, 0], [8, 0], [8, 8], [0, 8]]
+
+
+def scenario(name, to_adjust, number):
+    return {'name': name, 'buildings': [SMALL], 'sections': [[SMALL]], 'num_floors': 1, 'to_adjust': to_adjust,
+            'apartment_tables': [{apt_type: {'area_range': area_range, 'percent': 20, 'number': number}
+                                  for apt_type, area_range in AREA_RANGES.items()}]}
+
+
+def test_territory_errors_without_plan():
+    assert territory_errors(float('inf')) == []
+    assert territory_errors([1, 2.5]) == [1.0, 2.5]
+
+
+def test_failed_runs_are_counted():
+    # Здание 8x8 не вмещает ни одной квартиры: без подгонки - сообщение о нехватке площади,
+    # с подгонкой - пустой план (total_error = inf)
+    runs = [run_scenario(scenario('overfull', False, 2), seed=1),
+            run_scenario(scenario('no_area_adjust', True, 1), seed=1)]
+    for run in runs:
+        assert run['mean_error'] is None and run['total_error'] == [], run
+        assert run['messages'], run
+    summary = summarize(runs)
+    assert summary['overfull']['failed_runs'] == 1
+    assert summary['no_area_adjust']['failed_runs'] == 1
+
+
+if __name__ == '__main__':
+    test_territory_errors_without_plan()
+    test_failed_runs_are_counted()
+    print("OK")
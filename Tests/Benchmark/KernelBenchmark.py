@@ -0,0 +1,225 @@
+"""
+Микробенчмарк ядер планировщика на секциях разного размера (от 20x20 до 200x200 клеток).
+
+Запуск из корня репозитория:
+    python -m Tests.Benchmark.KernelBenchmark                    # сравнить с сохраненной базой
+    python -m Tests.Benchmark.KernelBenchmark --save-baseline    # записать новую базу
+    python -m Tests.Benchmark.KernelBenchmark --sizes 20 50 --repeat 3 --output results.json
+
+Каждое ядро запускается repeat раз с одинаковыми seed; в результат идут минимум и медиана времени.
+Ядро считается регрессией, если его медиана больше базовой в (1 + tolerance) раз. База (kernel_baseline.json)
+хранится в репозитории вместе с окружением, в котором она записана (python, machine, processor), чтобы
+изменения времени были видны при ревью. Время зависит от машины, поэтому сравнение с базой из другого
+окружения только печатается и не считается провалом; для строгого сравнения базу перезаписывают
+с --save-baseline на своей машине.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import time
+
+from shapely.geometry import Polygon
+
+from Classes.Geometry.Territory.Building.Floor.Section import Section
+
+BENCHMARK_VERSION = 2
+DEFAULT_SIZES = (20, 50, 100, 200)
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'kernel_baseline.json')
+SEED = 12345
+# Сколько квартир плана используется в бенчмарках планировки комнат и окон
+APARTMENTS_PER_SIZE = 3
+
+# Диапазоны площадей квартир; число квартир подбирается по площади секции
+AREA_RANGES = {
+    'studio': (25, 35),
+    '1 room': (43, 60),
+    '2 room': (65, 82),
+    '3 room': (85, 105),
+    '4 room': (110, 145),
+}
+
+
+def section_points(size):
+    """Г-образная секция size x size клеток: прямоугольник без угла 0.4 x 0.4."""
+    notch = round(size * 0.6)
+    return [(0, 0), (size, 0), (size, notch), (notch, notch), (notch, size), (0, size)]
+
+
+def apartment_table(area):
+    """Таблица квартир, занимающих около 75% площади секции, поровну по типам."""
+    mean_area = sum(sum(area_range) / 2 for area_range in AREA_RANGES.values()) / len(AREA_RANGES)
+    number = max(1, round(0.75 * area / (mean_area * len(AREA_RANGES))))
+    return {apt_type: {'area_range': area_range, 'percent': 20, 'number': number}
+            for apt_type, area_range in AREA_RANGES.items()}
+
+
+def make_section(size):
+    random.seed(SEED)
+    points = section_points(size)
+    polygon = Polygon(points)
+    return Section(points=points, apartment_table=apartment_table(polygon.area), building_polygon=polygon,
+                   rng=random.Random(SEED))
+
+
+def measure(func, setup, repeat):
+    """Время func() после setup() в каждом из repeat запусков."""
+    times = []
+    for _ in range(repeat):
+        setup()
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return {'min': min(times), 'median': statistics.median(times), 'repeat': repeat}
+
+
+def bench_size(size, repeat):
+    results = {}
+    section = make_section(size)
+    section.cell_size = 1
+
+    def rebuild_grid():
+        section.cells = None
+
+    results['check_and_create_cell_grid'] = measure(lambda: section.check_and_create_cell_grid(cell_size=1.0),
+                                                    rebuild_grid, repeat)
+    results['_process_cells'] = measure(section._process_cells, lambda: None, repeat)
+
+    # Полный перезапуск размещения дает квартиры для остальных ядер
+    section.rng.seed(SEED)
+    section.simple_plan = True
+    apartments = section._plan_restart()
+    state = section.snapshot_cell_state()
+
+    # Один рост квартиры из свежего состояния сетки
+    min_cells, max_cells = section._get_apartment_cell_range(AREA_RANGES['2 room'], cell_size=1)
+
+    def reset_growth():
+        section.restore_cell_state()
+        section.queue_corners_to_allocate = []
+        section.rng.seed(SEED)
+
+    results['_allocate_apartment_cells'] = measure(
+        lambda: section._allocate_apartment_cells(min_cells, max_cells, []), reset_growth, repeat)
+
+    def restore_plan():
+        section.restore_cell_state(state)
+        section.apartments = apartments
+
+    results['validate_apartment_connectivity'] = measure(
+        lambda: section.validate_apartment_connectivity(apartments), restore_plan, repeat)
+    results['_validate_apartments_free_sides'] = measure(section._validate_apartments_free_sides, restore_plan,
+                                                         repeat)
+
+    # Свободные стороны квартир нужны планировке комнат
+    restore_plan()
+    section.validate_apartment_connectivity(apartments, last_validation=True)
+    chosen = sorted(apartments, key=lambda apt: (apt.type, apt.polygon.bounds))[:APARTMENTS_PER_SIZE]
+
+    def prepare_apartments():
+        for apt in chosen:
+            apt.section_polygon = section.polygon
+            apt.room_layouts = None  # Время самой планировки, без памяти планировок
+            apt.rng.seed(SEED)
+
+    def plan_rooms():
+        for apt in chosen:
+            apt.generate_apartment_planning()
+
+    results['Apartment.generate_apartment_planning'] = measure(plan_rooms, prepare_apartments, repeat)
+
+    def reset_windows():
+        for apt in chosen:
+            apt.windows = []
+
+    def generate_windows():
+        for apt in chosen:
+            apt._generate_windows()
+
+    results['Apartment._generate_windows'] = measure(generate_windows, reset_windows, repeat)
+    return results, {'cells': len(section.grid), 'apartments': len(apartments), 'measured_apartments': len(chosen)}
+
+
+def run(sizes, repeat):
+    results = {}
+    sizes_info = {}
+    for size in sizes:
+        kernel_results, info = bench_size(size, repeat)
+        sizes_info[str(size)] = info
+        for kernel, timing in kernel_results.items():
+            results[f'{kernel}@{size}'] = timing
+            print(f"{kernel:40s} {size:4d}  min {timing['min'] * 1000:10.2f} мс  "
+                  f"медиана {timing['median'] * 1000:10.2f} мс")
+    return {'version': BENCHMARK_VERSION,
+            'seed': SEED,
+            'environment': environment(),
+            'sizes': sizes_info,
+            'results': results}
+
+
+def environment():
+    """Описание машины, на которой сравнимы времена ядер."""
+    return {'python': platform.python_version(),
+            'machine': platform.machine(),
+            'processor': platform.processor()}
+
+
+def compare(report, baseline, tolerance):
+    """Печатает сравнение с базой и возвращает список ядер, ставших медленнее допуска."""
+    regressions = []
+    for name, timing in report['results'].items():
+        base = baseline['results'].get(name)
+        if base is None:
+            print(f"{name:45s} нет в базе")
+            continue
+        ratio = timing['median'] / base['median'] if base['median'] > 0 else float('inf')
+        mark = ''
+        if ratio > 1 + tolerance:
+            mark = '  РЕГРЕССИЯ'
+            regressions.append(name)
+        print(f"{name:45s} {ratio:6.2f}x{mark}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Микробенчмарк ядер планировщика')
+    parser.add_argument('--sizes', type=int, nargs='+', default=list(DEFAULT_SIZES))
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--output', help='файл JSON для результатов')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+    parser.add_argument('--save-baseline', action='store_true', help='записать результаты как новую базу')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='допустимое замедление медианы (доля)')
+    args = parser.parse_args(argv)
+
+    report = run(args.sizes, args.repeat)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as file:
+            json.dump(report, file, ensure_ascii=False, indent=2)
+    if args.save_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as file:
+            json.dump(report, file, ensure_ascii=False, indent=2)
+        return 0
+    if not os.path.exists(args.baseline):
+        print(f"База {args.baseline} не найдена; запустите с --save-baseline")
+        return 0
+    with open(args.baseline, encoding='utf-8') as file:
+        baseline = json.load(file)
+    if baseline.get('version') != BENCHMARK_VERSION:
+        print("База записана другой версией бенчмарка; перезапишите ее с --save-baseline")
+        return 0
+    regressions = compare(report, baseline, args.tolerance)
+    if regressions:
+        print(f"Регрессий: {len(regressions)}")
+        if baseline.get('environment') != environment():
+            print(f"База записана в другом окружении ({baseline.get('environment')}), сравнение только "
+                  f"для сведения; перезапишите ее с --save-baseline")
+            return 0
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
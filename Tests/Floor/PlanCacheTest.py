@@ -0,0 +1,129 @@
+"""
+Проверка PlanCache: план, сохраненный для секции, находится для той же секции, повернутой на 90° и сдвинутой,
+и переводится в ее координаты; площади квартир и выходные таблицы территории при попадании в кэш те же,
+что и при свежей планировке; при переполнении вытесняется давно не использовавшийся ключ.
+
+Запуск из корня репозитория:
+    python -m Tests.Floor.PlanCacheTest
+"""
+import json
+import os
+import random
+import tempfile
+
+from shapely.geometry import Polygon
+
+from Classes.Geometry.Territory.Territory import Territory
+from Classes.Geometry.Territory.Building.Floor.PlanCache import PlanCache
+from Classes.Geometry.Territory.Building.Floor.Section import Section
+from Classes.Geometry.Territory.Building.Floor.SectionPlan import table_from_json
+
+CORPUS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'Benchmark', 'scenarios.json')
+
+TABLE = {
+    'studio': {'area_range': (25, 35), 'percent': 40, 'number': 2},
+    '1 room': {'area_range': (43, 60), 'percent': 60, 'number': 2},
+}
+POINTS = [(0, 0), (20, 0), (20, 12), (0, 12)]
+BUILDING = [(0, 0), (20, 0), (20, 12), (0, 12)]
+ITERATIONS = 8
+
+
+def make_section(points, building):
+    return Section(points=points, apartment_table=TABLE, building_polygon=Polygon(building), rng=random.Random(1))
+
+
+def quarter_turn(point):
+    """Поворот на 90° против часовой стрелки и сдвиг."""
+    x, y = point
+    return -y + 100, x + 50
+
+
+def planned_section():
+    section = make_section(POINTS, BUILDING)
+    section.generate_section_planning(max_iterations=ITERATIONS, seed=1)
+    assert section.apartments, "секция не спланирована"
+    return section
+
+
+def cache_path(directory):
+    return os.path.join(directory, 'plans.sqlite')
+
+
+def test_hit_under_quarter_turn():
+    with tempfile.TemporaryDirectory() as directory:
+        check_hit_under_quarter_turn(cache_path(directory))
+
+
+def check_hit_under_quarter_turn(path):
+    section = planned_section()
+    cache = PlanCache(path)
+    cache.store(section, ITERATIONS, seed=1)
+
+    rotated = make_section([quarter_turn(point) for point in POINTS], [quarter_turn(point) for point in BUILDING])
+    assert cache.key(rotated, ITERATIONS, seed=1)[0] == cache.key(section, ITERATIONS, seed=1)[0]
+    assert not cache.load(rotated, ITERATIONS, seed=2)
+    assert cache.load(rotated, ITERATIONS, seed=1)
+    assert [apartment.type for apartment in rotated.apartments] == [apartment.type for apartment in section.apartments]
+    for apartment, other in zip(section.apartments, rotated.apartments):
+        expected = Polygon([quarter_turn(point) for point in apartment.polygon.exterior.coords])
+        assert other.polygon.equals(expected)
+        assert abs(other.area - apartment.area) < 1e-9
+        assert len(other.rooms) == len(apartment.rooms)
+    cache.close()
+
+
+def test_hit_keeps_areas_and_output_tables():
+    # Косая секция обрезает квартиры: площадь планировщика отличается от площади контура
+    with open(CORPUS, encoding='utf-8') as file:
+        scenario = next(item for item in json.load(file)['scenarios'] if item['name'] == 'skew_quad')
+    with tempfile.TemporaryDirectory() as directory:
+        # Один план на ключ: уже второй запуск без seed секции берет план из кэша
+        cache = PlanCache(cache_path(directory), plans_per_key=1)
+        territories = []
+        for _ in range(2):
+            territory = Territory(scenario['buildings'], scenario['sections'], scenario['num_floors'],
+                                  [table_from_json(table) for table in scenario['apartment_tables']],
+                                  to_adjust=scenario['to_adjust'], plan_cache=cache)
+            territory.generate_building_plannings(seed=3, instrument=True)
+            territories.append(territory)
+        cache.close()
+    fresh, cached = territories
+    assert 'section.cache_hits' not in fresh.instrumentation.report()['counters']
+    assert cached.instrumentation.report()['counters']['section.cache_hits'] == 1
+    assert [apartment.area for apartment in apartments(cached)] == [apartment.area for apartment in apartments(fresh)]
+    assert cached.total_error == fresh.total_error
+    assert cached.output_tables == fresh.output_tables
+
+
+def apartments(territory):
+    return [apartment for building in territory.buildings for floor in building.floors
+            for section in floor.sections for apartment in section.apartments]
+
+
+def test_least_recently_used_key_is_evicted():
+    with tempfile.TemporaryDirectory() as directory:
+        check_least_recently_used_key_is_evicted(cache_path(directory))
+
+
+def check_least_recently_used_key_is_evicted(path):
+    section = planned_section()
+    cache = PlanCache(path, max_keys=2)
+    keys = {seed: cache.key(section, ITERATIONS, seed)[0] for seed in (1, 2, 3)}
+    cache.store(section, ITERATIONS, seed=1)
+    cache.store(section, ITERATIONS, seed=2)
+    # Ключ seed=1 использован позже ключа seed=2 - вытеснен должен быть seed=2
+    assert cache.load(make_section(POINTS, BUILDING), ITERATIONS, seed=1)
+    cache.store(section, ITERATIONS, seed=3)
+    assert cache._plans(keys[1]) and cache._plans(keys[3])
+    assert not cache._plans(keys[2])
+    stored_keys = {row[0] for row in cache._connect().execute("SELECT key FROM plan_keys")}
+    assert stored_keys == {keys[1], keys[3]}
+    cache.close()
+
+
+if __name__ == '__main__':
+    test_hit_under_quarter_turn()
+    test_hit_keeps_areas_and_output_tables()
+    test_least_recently_used_key_is_evicted()
+    print("OK")
@@ -0,0 +1,118 @@
+"""
+Проверка упаковки SectionPlan: to_bytes/from_bytes сохраняют квартиры, комнаты, окна, свободные стороны,
+площади, таблицу и сообщения - и для плана, собранного вручную, и для спланированной секции; таблицы
+территории после упаковки ее зданий не меняются.
+
+Запуск из корня репозитория:
+    python -m Tests.Floor.SectionPlanTest
+"""
+import json
+import os
+import random
+import struct
+
+from shapely.geometry import Polygon
+
+from Classes.Geometry.Territory.Territory import Territory
+from Classes.Geometry.Territory.Building.BuildingPlan import BuildingPlan
+from Classes.Geometry.Territory.Building.Floor.Section import Section
+from Classes.Geometry.Territory.Building.Floor.SectionPlan import (ApartmentPlan, SectionPlan, table_from_json,
+                                                                   PLAN_FORMAT_VERSION)
+
+CORPUS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'Benchmark', 'scenarios.json')
+
+TABLE = {
+    'studio': {'area_range': (25, 35), 'percent': 40, 'number': 2},
+    '1 room': {'area_range': (43, 60), 'percent': 60, 'number': 2},
+}
+
+
+def assert_same(plan, restored):
+    assert restored.apartment_table == plan.apartment_table
+    assert restored.plan_done == plan.plan_done
+    assert restored.messages == plan.messages
+    assert len(restored.apartments) == len(plan.apartments)
+    for apartment, other in zip(plan.apartments, restored.apartments):
+        assert other.type == apartment.type
+        assert other.area == apartment.area
+        assert other.outline == [tuple(point) for point in apartment.outline]
+        assert other.rooms == [(room_type, [tuple(point) for point in points]) for room_type, points in apartment.rooms]
+        assert other.windows == [[tuple(point) for point in line] for line in apartment.windows]
+        assert other.free_sides == [[[tuple(point) for point in part] for part in parts]
+                                    for parts in apartment.free_sides]
+        assert other.messages == apartment.messages
+
+
+def test_round_trip_by_hand():
+    apartments = [
+        ApartmentPlan('studio', [(0, 0), (5, 0), (5, 6), (0, 6), (0, 0)],
+                      rooms=[('kitchen', [(0, 0), (5, 0), (5, 3), (0, 3), (0, 0)]),
+                             ('hall', [(0, 3), (5, 3), (5, 6), (0, 6), (0, 3)])],
+                      windows=[[(1, 0), (2, 0)]],
+                      free_sides=[[[(0, 6), (5, 6)]], [[(5, 0), (5, 2)], [(5, 4), (5, 6)]]],
+                      messages=['сообщение']),
+        ApartmentPlan('1 room', [(5, 0), (12.5, 0), (12.5, 6), (5, 6), (5, 0)]),
+    ]
+    plan = SectionPlan(apartments, TABLE, plan_done=True, messages=['секция'])
+    data = plan.to_bytes()
+    restored = SectionPlan.from_bytes(data)
+    assert_same(plan, restored)
+    assert restored.to_bytes() == data
+    assert SectionPlan.from_bytes(SectionPlan([]).to_bytes()).apartments == []
+
+
+def test_round_trip_of_planned_section():
+    points = [(0, 0), (20, 0), (20, 12), (0, 12)]
+    section = Section(points=points, apartment_table=TABLE, building_polygon=Polygon(points), rng=random.Random(1))
+    section.generate_section_planning(max_iterations=8, seed=1)
+    plan = SectionPlan.from_section(section)
+    assert plan.apartments, "секция не спланирована"
+    restored = SectionPlan.from_bytes(plan.to_bytes())
+    assert_same(plan, restored)
+
+    target = Section(points=points, apartment_table=TABLE, building_polygon=Polygon(points))
+    restored.apply_to(target)
+    assert [apartment.type for apartment in target.apartments] == [apartment.type for apartment in section.apartments]
+    for apartment, other in zip(section.apartments, target.apartments):
+        assert other.area == apartment.area
+        assert len(apartment.rooms) == len(other.rooms) and len(apartment.windows) == len(other.windows)
+
+
+def test_territory_tables_survive_round_trip():
+    # Косая секция обрезает квартиры: площадь планировщика отличается от площади контура
+    for name in ('skew_quad', 'rect_58x44_rot30'):
+        with open(CORPUS, encoding='utf-8') as file:
+            scenario = next(item for item in json.load(file)['scenarios'] if item['name'] == name)
+        tables = [table_from_json(table) for table in scenario['apartment_tables']]
+        territory = Territory(scenario['buildings'], scenario['sections'], scenario['num_floors'], tables,
+                              to_adjust=scenario['to_adjust'])
+        territory.generate_building_plannings(seed=3)
+        total_error, output_tables = territory.total_error, territory.output_tables
+
+        territory.buildings = [
+            BuildingPlan.from_bytes(BuildingPlan.from_building(building).to_bytes()).to_building(
+                scenario['buildings'][i], scenario['sections'][i], scenario['num_floors'], tables[i],
+                scenario['to_adjust'])
+            for i, building in enumerate(territory.buildings)]
+        territory.total_error = territory.calculate_territory_error(territory.buildings, tables)
+        assert territory.total_error == total_error, name
+        assert territory.generate_output_table() == output_tables, name
+
+
+def test_unknown_version_is_rejected():
+    data = bytearray(SectionPlan([]).to_bytes())
+    (head_length,) = struct.unpack_from('<I', data)
+    head = bytes(data[4:4 + head_length]).replace(f'"version": {PLAN_FORMAT_VERSION}'.encode(), b'"version": 0')
+    try:
+        SectionPlan.from_bytes(struct.pack('<I', len(head)) + head + bytes(data[4 + head_length:]))
+    except ValueError:
+        return
+    raise AssertionError("план другой версии должен отклоняться")
+
+
+if __name__ == '__main__':
+    test_round_trip_by_hand()
+    test_round_trip_of_planned_section()
+    test_territory_tables_survive_round_trip()
+    test_unknown_version_is_rejected()
+    print("OK")
@@ -0,0 +1,85 @@
+"""
+Регрессионный тест воспроизводимости: этаж, спланированный с одним и тем же seed, должен давать
+один и тот же план при любом состоянии глобального модуля random - и последовательно, и в пуле процессов.
+В пуле сравниваются не только упакованные планы, но и площади квартир и сводная таблица этажа.
+
+Запуск из корня репозитория:
+    python -m Tests.Floor.SeedDeterminismTest
+"""
+from concurrent.futures import ProcessPoolExecutor
+import json
+import os
+import random
+
+from shapely.geometry import Polygon
+
+from Classes.Geometry.Territory.Building.Floor.Floor import Floor
+from Classes.Geometry.Territory.Building.Floor.SectionPlan import SectionPlan, table_from_json
+
+CORPUS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'Benchmark', 'scenarios.json')
+# Косая, дельтоидная и вогнутая секции доходят до выбора случайной клетки периметра квартиры
+SCENARIOS = ('skew_quad', 'kite_quad', 'ramp_concave')
+SEED = 7
+GLOBAL_SEEDS = (1, 12345)
+
+
+def load_scenario(name):
+    with open(CORPUS, encoding='utf-8') as file:
+        return next(scenario for scenario in json.load(file)['scenarios'] if scenario['name'] == name)
+
+
+def plan_floor(scenario, global_seed, executor=None):
+    """Планирует этаж сценария с SEED после random.seed(global_seed) и возвращает этаж."""
+    points = [tuple(point) for point in scenario['buildings'][0]]
+    sections = [[tuple(point) for point in section] for section in scenario['sections'][0]]
+    random.seed(global_seed)
+    floor = Floor(points=points, sections_list=sections,
+                  apartment_table=table_from_json(scenario['apartment_tables'][0]),
+                  building_polygon=Polygon(points), single_floor=True)
+    floor.generate_floor_planning(seed=SEED, executor=executor)
+    return floor
+
+
+def plan_bytes(floor):
+    return [SectionPlan.from_section(section).to_bytes() for section in floor.sections]
+
+
+def apartment_areas(floor):
+    return [[apartment.area for apartment in section.apartments] for section in floor.sections]
+
+
+def floor_table(floor):
+    """Число, суммарная и средняя площадь квартир каждого типа - как в выходной таблице территории."""
+    table = {}
+    for section in floor.sections:
+        for apartment in section.apartments:
+            info = table.setdefault(apartment.type, {'number': 0, 'area': 0})
+            info['number'] += 1
+            info['area'] += apartment.area
+    for info in table.values():
+        info['average_area'] = round(info['area'] / info['number'], 1)
+    return table
+
+
+def test_seeded_floor_ignores_global_random():
+    for name in SCENARIOS:
+        scenario = load_scenario(name)
+        plans = [plan_bytes(plan_floor(scenario, global_seed)) for global_seed in GLOBAL_SEEDS]
+        assert plans[0] == plans[1], f"{name}: план зависит от глобального random"
+        assert any(plan for plan in plans[0]), f"{name}: пустой план"
+
+
+def test_seeded_floor_same_in_executor():
+    scenario = load_scenario(SCENARIOS[0])
+    sequential = plan_floor(scenario, GLOBAL_SEEDS[0])
+    with ProcessPoolExecutor(max_workers=2) as executor:
+        in_pool = plan_floor(scenario, GLOBAL_SEEDS[1], executor)
+    assert plan_bytes(sequential) == plan_bytes(in_pool), "план в пуле отличается от последовательного"
+    assert apartment_areas(sequential) == apartment_areas(in_pool), "площади квартир в пуле другие"
+    assert floor_table(sequential) == floor_table(in_pool), "таблица этажа в пуле другая"
+
+
+if __name__ == '__main__':
+    test_seeded_floor_ignores_global_random()
+    test_seeded_floor_same_in_executor()
+    print("OK")
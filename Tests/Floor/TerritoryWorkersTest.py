@@ -0,0 +1,55 @@
+"""
+Регрессионный тест пула зданий: территория, спланированная с одним и тем же seed последовательно (workers=1)
+и в пуле процессов (workers=2), дает одинаковые total_error и выходные таблицы, а последовательная
+генерация не меняет состояние глобального модуля random.
+
+Запуск из корня репозитория:
+    python -m Tests.Floor.TerritoryWorkersTest
+"""
+import json
+import os
+import random
+
+from Classes.Geometry.Territory.Territory import Territory
+from Classes.Geometry.Territory.Building.Floor.SectionPlan import table_from_json
+
+CORPUS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'Benchmark', 'scenarios.json')
+# Косые секции обрезают квартиры; в two_buildings пул действительно планирует два здания одновременно
+SCENARIOS = ('skew_quad', 'rect_58x44_rot30', 'two_buildings')
+SEED = 3
+
+
+def load_scenario(name):
+    with open(CORPUS, encoding='utf-8') as file:
+        return next(scenario for scenario in json.load(file)['scenarios'] if scenario['name'] == name)
+
+
+def plan_territory(scenario, workers):
+    territory = Territory(scenario['buildings'], scenario['sections'], scenario['num_floors'],
+                          [table_from_json(table) for table in scenario['apartment_tables']],
+                          to_adjust=scenario['to_adjust'])
+    territory.generate_building_plannings(workers=workers, seed=SEED)
+    return territory
+
+
+def test_pool_matches_sequential():
+    for name in SCENARIOS:
+        scenario = load_scenario(name)
+        sequential = plan_territory(scenario, workers=1)
+        in_pool = plan_territory(scenario, workers=2)
+        assert sequential.output_tables, f"{name}: нет выходных таблиц"
+        assert in_pool.total_error == sequential.total_error, name
+        assert in_pool.output_tables == sequential.output_tables, name
+
+
+def test_seeded_generation_keeps_global_random():
+    random.seed(99)
+    state = random.getstate()
+    plan_territory(load_scenario(SCENARIOS[0]), workers=1)
+    assert random.getstate() == state, "генерация с seed изменила состояние модуля random"
+
+
+if __name__ == '__main__':
+    test_pool_matches_sequential()
+    test_seeded_generation_keeps_global_random()
+    print("OK")
@@ -0,0 +1,91 @@
+"""
+Проверка инвариантов CellGrid и FreeCellSet: множество свободных клеток совпадает с перебором,
+выборка берет только его элементы, счетчики свободных соседей соответствуют маске assigned.
+
+Запуск из корня репозитория:
+    python -m Tests.Geometry.CellGridTest
+"""
+import random
+
+import numpy as np
+
+from Classes.Geometry.CellGrid import CellGrid, FreeCellSet
+
+
+def make_grid():
+    """Г-образная сетка 6x5 без угла 3x2."""
+    mask = np.ones((5, 6), dtype=bool)
+    mask[3:, 3:] = False
+    return CellGrid(np.arange(6.0), np.arange(5.0), 1.0, mask)
+
+
+def check_free_sets(grid):
+    free = set(np.flatnonzero(~grid.assigned).tolist())
+    assert set(grid.free_sets['all']) == free
+    assert set(grid.free_sets['perimeter']) == free & set(np.flatnonzero(grid.on_perimeter).tolist())
+    for k in range(len(grid)):
+        neighbors = grid.neighbors(k)
+        assert grid.free_degree[k] == int((~grid.assigned[neighbors]).sum())
+
+
+def test_free_cell_set():
+    rng = random.Random(1)
+    free_set = FreeCellSet(20)
+    reference = set()
+    for _ in range(500):
+        index = rng.randrange(20)
+        if rng.random() < 0.5:
+            free_set.add(index)
+            reference.add(index)
+        else:
+            free_set.discard(index)
+            reference.discard(index)
+        assert len(free_set) == len(reference)
+        assert set(free_set) == reference
+        assert all((index in free_set) == (index in reference) for index in range(20))
+        if reference:
+            assert free_set.sample(rng) in reference
+    free_set.fill([3, 5, 7])
+    assert set(free_set) == {3, 5, 7} and 4 not in free_set
+    assert sorted(free_set.to_array().tolist()) == [3, 5, 7]
+    free_set.fill(np.array([9, 2]))
+    assert set(free_set) == {9, 2} and 3 not in free_set and len(free_set) == 2
+
+
+def test_sample_requires_rng():
+    free_set = FreeCellSet(3)
+    free_set.add(1)
+    try:
+        free_set.sample()
+    except TypeError:
+        return
+    raise AssertionError("sample() без генератора не должен брать глобальный random")
+
+
+def test_grid_free_sets_follow_assignments():
+    grid = make_grid()
+    assert len(grid) == 24
+    grid.on_perimeter[:] = [len(grid.neighbors(k)) < 8 for k in range(len(grid))]
+    grid.refresh_free_sets()
+    check_free_sets(grid)
+    rng = random.Random(2)
+    for _ in range(200):
+        index = rng.randrange(len(grid))
+        if not grid.assigned[index] and rng.random() < 0.5:
+            grid.assign_cell(index)
+        else:
+            grid.set_assigned([index], rng.random() < 0.5)
+        check_free_sets(grid)
+
+    state = grid.snapshot()
+    grid.set_assigned(np.arange(len(grid)), False)
+    check_free_sets(grid)
+    grid.restore(state)
+    check_free_sets(grid)
+
+
+if __name__ == '__main__':
+    test_free_cell_set()
+    test_sample_requires_rng()
+    test_grid_free_sets_follow_assignments()
+    print("OK")
@@ -0,0 +1,65 @@
+"""
+Проверка trace_outline и count_parts: контур набора клеток совпадает с union_all(клетки).simplify(0.01),
+включая дырки, части, касающиеся только углом, и случайные наборы клеток.
+
+Запуск из корня репозитория:
+    python -m Tests.Geometry.CellOutlineTest
+"""
+import random
+
+import numpy as np
+import shapely
+
+from Classes.Geometry.CellGrid import CellGrid
+from Classes.Geometry.CellOutline import trace_outline, count_parts
+
+SIZE = 8
+
+
+def make_grid():
+    return CellGrid(np.arange(SIZE, dtype=float), np.arange(SIZE, dtype=float), 1.0,
+                    np.ones((SIZE, SIZE), dtype=bool))
+
+
+def indices(grid, cells):
+    return [grid.index(i, j) for i, j in cells]
+
+
+def check(grid, cell_indices):
+    expected = shapely.union_all(grid.polygons(cell_indices)).simplify(0.01)
+    outline = trace_outline(grid, cell_indices)
+    assert outline.geom_type == expected.geom_type, (outline.geom_type, expected.geom_type)
+    assert outline.equals(expected)
+    # simplify оставляет лишнюю вершину в начале кольца, контур - нет
+    assert len(shapely.get_coordinates(outline)) <= len(shapely.get_coordinates(expected))
+    parts = len(expected.geoms) if expected.geom_type == 'MultiPolygon' else 1
+    assert count_parts(grid, cell_indices) == parts
+
+
+def test_shapes():
+    grid = make_grid()
+    ring = [(i, j) for i in range(1, 5) for j in range(1, 5) if not (i in (2, 3) and j in (2, 3))]
+    shapes = {
+        'square': [(i, j) for i in range(3) for j in range(3)],
+        'l_shape': [(0, 0), (1, 0), (2, 0), (0, 1), (0, 2)],
+        'ring_with_hole': ring,
+        'corner_touch': [(0, 0), (1, 1)],
+        'two_parts': [(0, 0), (0, 1), (4, 4), (5, 4)],
+    }
+    for name, cells in shapes.items():
+        check(grid, indices(grid, cells))
+    assert trace_outline(grid, []).is_empty
+
+
+def test_random_sets():
+    grid = make_grid()
+    rng = random.Random(3)
+    for _ in range(200):
+        cell_indices = rng.sample(range(len(grid)), rng.randint(1, len(grid)))
+        check(grid, cell_indices)
+
+
+if __name__ == '__main__':
+    test_shapes()
+    test_random_sets()
+    print("OK")
@@ -0,0 +1,169 @@
+"""
+Пакетная генерация планировок без графического интерфейса.
+
+Запуск из корня репозитория:
+    python batch.py specs.jsonl results.jsonl
+    python batch.py specs.jsonl - --workers 4 --seed 1 --no-geometry > results.jsonl
+    python batch.py specs.jsonl results.jsonl --plan-cache plans.sqlite
+
+Каждая строка входного файла - описание территории в формате сценариев Tests/Benchmark/scenarios.json:
+    {"name": "...", "buildings": [[[x, y], ...], ...], "sections": [[[[x, y], ...], ...], ...],
+     "num_floors": 3, "apartment_tables": [{"studio": {"area_range": [25, 35], "percent": 20, "number": 3}, ...}],
+     "to_adjust": false, "seed": 1}
+sections (по умолчанию здание - одна секция), to_adjust и seed необязательны.
+
+Территории планируются в пуле процессов; каждая строка результата пишется сразу после готовности
+территории (в порядке завершения) и содержит номер строки входа, имя, статус ('ok', 'failed' - планировка
+не удалась и есть сообщения, 'error' - ошибка в описании или при генерации), время, сообщения,
+Territory.total_error, выходные таблицы и геометрию зданий (BuildingPlan.to_dict).
+
+Память ограничена: в работе не больше 2 * workers территорий, а процесс-исполнитель заменяется новым
+после max_tasks_per_child территорий.
+"""
+import argparse
+import json
+import logging
+import math
+import multiprocessing
+import os
+import queue
+import sys
+import time
+
+from Classes.Geometry.Territory.Building.BuildingPlan import BuildingPlan
+from Classes.Geometry.Territory.Building.Floor.PlanCache import PlanCache
+from Classes.Geometry.Territory.Building.Floor.SectionPlan import table_from_json
+from Classes.Geometry.Territory.Territory import Territory
+from Classes.LogConfig import configure_logging
+
+logger = logging.getLogger(__name__)
+
+RESULT_FORMAT_VERSION = 1
+
+
+def plan_territory(spec, seed=None, plan_cache=None, geometry=True):
+    """Планирует территорию по описанию и возвращает результат в виде словаря для JSON."""
+    tables = [table_from_json(table) for table in spec['apartment_tables']]
+    buildings = [[tuple(point) for point in building] for building in spec['buildings']]
+    sections = spec.get('sections')
+    if sections is not None:
+        sections = [[[tuple(point) for point in section] for section in building] for building in sections]
+    else:
+        sections = [[building] for building in buildings]
+    start = time.perf_counter()
+    territory = Territory(buildings, sections, spec['num_floors'], tables, to_adjust=spec.get('to_adjust', False),
+                          plan_cache=plan_cache)
+    territory.generate_building_plannings(seed=seed)
+    result = {'status': 'failed' if territory.messages or territory.output_tables is None else 'ok',
+              'time': time.perf_counter() - start,
+              'messages': [str(message) for message in territory.messages],
+              # При пустом плане calculate_territory_error возвращает inf вместо списка ошибок
+              'total_error': [float(error) for error in territory.total_error]
+              if isinstance(territory.total_error, list) else [],
+              'output_tables': territory.output_tables}
+    if geometry:
+        result['buildings'] = [BuildingPlan.from_building(building).to_dict() for building in territory.buildings]
+    return result
+
+
+def _plan_line(job):
+    """Разбирает строку входа и планирует ее территорию; ошибки не прерывают пакет, а попадают в результат."""
+    line_number, line, base_seed, plan_cache, geometry = job
+    record = {'version': RESULT_FORMAT_VERSION, 'line': line_number, 'name': None, 'seed': None}
+    try:
+        spec = json.loads(line)
+        record['name'] = spec.get('name')
+        seed = spec.get('seed')
+        if seed is None and base_seed is not None:
+            seed = base_seed + line_number
+        record['seed'] = seed
+        record.update(plan_territory(spec, seed, plan_cache, geometry))
+    except Exception as error:
+        logger.exception("Строка %d: ошибка генерации", line_number)
+        record.update({'status': 'error', 'messages': [f"{type(error).__name__}: {error}"]})
+    return record
+
+
+def _finite(value):
+    """Заменяет inf и nan (недопустимые в JSON) на None."""
+    if isinstance(value, float) and not math.isfinite(value):
+        return None
+    if isinstance(value, dict):
+        return {key: _finite(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_finite(item) for item in value]
+    return value
+
+
+def run_batch(input_file, output_file, workers=None, seed=None, plan_cache=None, geometry=True,
+              max_tasks_per_child=20):
+    """
+    Планирует все территории входного JSONL-файла в пуле процессов и пишет результаты в output_file
+    по мере готовности. Возвращает число территорий по статусам.
+    """
+    workers = workers or os.cpu_count() or 1
+    statuses = {'ok': 0, 'failed': 0, 'error': 0}
+    # Готовые результаты приходят из потока пула; исключение (например, ошибка передачи задачи) тоже
+    results = queue.Queue()
+
+    def write_next():
+        record = results.get()
+        if isinstance(record, BaseException):
+            raise record
+        output_file.write(json.dumps(_finite(record), ensure_ascii=False, default=str) + '\n')
+        output_file.flush()
+        statuses[record['status']] += 1
+        logger.info("Строка %d (%s): %s за %.1f с", record['line'], record['name'], record['status'],
+                    record.get('time', 0.0))
+
+    with multiprocessing.Pool(processes=workers, maxtasksperchild=max_tasks_per_child) as pool:
+        # Вход читается по мере готовности результатов: в работе не больше 2 * workers территорий
+        in_flight = 0
+        for line_number, line in enumerate(input_file, start=1):
+            if not line.strip():
+                continue
+            if in_flight >= 2 * workers:
+                write_next()
+                in_flight -= 1
+            pool.apply_async(_plan_line, ((line_number, line, seed, plan_cache, geometry),),
+                             callback=results.put, error_callback=results.put)
+            in_flight += 1
+        for _ in range(in_flight):
+            write_next()
+    return statuses
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Пакетная генерация планировок территорий из JSONL')
+    parser.add_argument('input', help="входной JSONL-файл с описаниями территорий ('-' - stdin)")
+    parser.add_argument('output', help="выходной JSONL-файл с результатами ('-' - stdout)")
+    parser.add_argument('--workers', type=int, default=None, help='число процессов (по умолчанию число ядер)')
+    parser.add_argument('--seed', type=int, default=None,
+                        help='базовый seed: территория в строке n без своего seed получает seed + n')
+    parser.add_argument('--plan-cache', help='файл SQLite постоянного кэша планов секций')
+    parser.add_argument('--no-geometry', action='store_true', help='не записывать геометрию зданий')
+    parser.add_argument('--max-tasks-per-child', type=int, default=20,
+                        help='после скольких территорий процесс-исполнитель заменяется новым')
+    parser.add_argument('--verbose', action='store_true', help='сообщать о каждой готовой территории')
+    args = parser.parse_args(argv)
+
+    configure_logging()
+    if args.verbose:
+        logger.setLevel(logging.INFO)
+    plan_cache = PlanCache(args.plan_cache) if args.plan_cache else None
+    input_file = sys.stdin if args.input == '-' else open(args.input, encoding='utf-8')
+    output_file = sys.stdout if args.output == '-' else open(args.output, 'w', encoding='utf-8')
+    try:
+        statuses = run_batch(input_file, output_file, args.workers, args.seed, plan_cache, not args.no_geometry,
+                             args.max_tasks_per_child)
+    finally:
+        if input_file is not sys.stdin:
+            input_file.close()
+        if output_file is not sys.stdout:
+            output_file.close()
+    logger.info("Готово: %s", statuses)
+    return 1 if statuses['error'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
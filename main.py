@@ -2,6 +2,7 @@ from pathlib import Path
 
 from PyQt5.QtWidgets import QApplication
 
+from Classes.LogConfig import configure_logging
 from GUI.MainWindow import MainWindow
 
 
@@ -12,6 +13,7 @@ def except_hook(cls, exception, traceback):
 if __name__ == "__main__":
     import sys
 
+    configure_logging()
     app = QApplication(sys.argv)
     app.setStyleSheet(Path('GUI/Themes/light.qss').read_text())
     mainWin = MainWindow()